@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Time of the filters and lookups of an option chain
+
+Compares the Dict[str, Option] chain converted to a DataFrame by to_df,
+as the strategies filtered it, with the columns and the strike and delta
+index of an OptionChain.
+
+Usage: python -m benchmarks.chain_filters [--strikes 200] [--repeat 100]
+"""
+import argparse
+import datetime
+import time
+import numpy as np
+import pandas as pd
+from optopus.asset import AssetId
+from optopus.common import AssetType, Currency
+from optopus.option import RightType
+from optopus.option_chain import OptionChain
+from optopus.pricing import black_scholes
+from optopus.utils import options_to_df
+
+UNDERLYING_PRICE = 100.0
+EXPIRATION = datetime.date(2018, 10, 19)
+
+
+def make_chain(strikes: int) -> OptionChain:
+    k = np.linspace(80.0, 120.0, strikes)
+    strike = np.concatenate((k, k))
+    call = np.repeat([False, True], strikes)
+    g = black_scholes(call, UNDERLYING_PRICE, strike, 30 / 365, 0.25)
+    return OptionChain.from_columns(
+        AssetId("SPY", AssetType.ETF, Currency.USDollar, None),
+        EXPIRATION,
+        call,
+        {
+            "strike": strike, "bid": g.price - 0.05, "ask": g.price + 0.05,
+            "volume": np.arange(2 * strikes), "delta": g.delta, "iv": np.full(2 * strikes, 0.25),
+        },
+        multiplier=["100"] * (2 * strikes),
+    )
+
+
+def timed(f, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        f()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--strikes", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+
+    chain = make_chain(args.strikes)
+    options = {f"{o.id.strike}{o.id.right.value}": o for o in chain}
+    strike = float(chain.strike[args.strikes // 2])
+
+    def dict_filter():
+        df = pd.DataFrame(options_to_df(options.values()))
+        return df[(df["right"] == "P") & (df["strike"] <= UNDERLYING_PRICE) & (df["volume"] > 10)]
+
+    def chain_filter():
+        puts = chain.puts
+        return puts[(puts.strike <= UNDERLYING_PRICE) & (puts.volume > 10)]
+
+    df = pd.DataFrame(options_to_df(options.values()))
+
+    def df_nearest_put():
+        puts = df[(df["right"] == "P") & (df["strike"] <= UNDERLYING_PRICE)]
+        return puts.iloc[-1]
+
+    def df_delta_put():
+        puts = df[df["right"] == "P"]
+        return puts.loc[(puts["delta"] + 0.3).abs().idxmin()]
+
+    def df_between():
+        return df[(df["strike"] >= 95.0) & (df["strike"] <= 105.0)]
+
+    print(f"{'operation':<22} {'dict ms':>10} {'chain ms':>10}")
+    rows = (
+        ("filter OTM puts", dict_filter, chain_filter),
+        ("lookup strike", lambda: options[f"{strike}P"], lambda: chain.option(strike, RightType.Put)),
+        ("to DataFrame", lambda: pd.DataFrame(options_to_df(options.values())), chain.to_df),
+        # the next queries reuse the DataFrame built above, as a screening loop would
+        ("nearest ATM put", df_nearest_put, lambda: chain.nearest_index(UNDERLYING_PRICE, RightType.Put)),
+        ("put delta -0.30", df_delta_put, lambda: chain.delta_index(-0.3)),
+        ("strikes 95 to 105", df_between, lambda: chain.between(95.0, 105.0)),
+    )
+    for name, legacy, columnar in rows:
+        print(f"{name:<22} {timed(legacy, args.repeat) * 1e3:>10.3f} "
+              f"{timed(columnar, args.repeat) * 1e3:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Wall time of IBDataAdapter.create_assets for a large watch list
+
+Usage: python -m benchmarks.create_assets [--symbols 2000] [--unknown 0.02]
+"""
+import argparse
+from pathlib import Path
+import tempfile
+import time
+from optopus.common import AssetDefinition, AssetType
+from optopus.contract_cache import ContractCache
+from optopus.ib_adapter import IBDataAdapter, IBTranslator
+from benchmarks.fake_ib import FakeIB
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--symbols", type=int, default=2000)
+    parser.add_argument("--unknown", type=float, default=0.02,
+                        help="fraction of symbols the fake IB doesn't know")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="seconds the fake IB takes to answer a request")
+    args = parser.parse_args()
+
+    codes = [f"S{i:05d}" for i in range(args.symbols)]
+    step = int(1 / args.unknown) if args.unknown else 0
+    unknown = frozenset(codes[::step]) if step else frozenset()
+    watchlist = tuple(AssetDefinition(code, AssetType.Stock) for code in codes)
+
+    ib = FakeIB(latency=args.latency, unknown_symbols=unknown)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ContractCache(Path(tmp) / "contracts.db")
+        adapter = IBDataAdapter(ib, IBTranslator(), cache)
+
+        start = time.perf_counter()
+        assets, failures = adapter.create_assets(watchlist)
+        cold = time.perf_counter() - start
+        messages = ib.messages
+
+        start = time.perf_counter()
+        adapter.create_assets(watchlist)
+        warm = time.perf_counter() - start
+        cache.close()
+    ib.close()
+
+    print(f"symbols     {args.symbols}")
+    print(f"assets      {len(assets)}")
+    print(f"failures    {len(failures)}")
+    print(f"messages    {messages}")
+    print(f"violations  {ib.violations}")
+    print(f"cold        {cold:.3f} s ({args.symbols / cold:.1f} symbols/s)")
+    print(f"warm        {warm:.3f} s (unknown symbols are qualified again)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for ib_insync.IB used by the benchmarks
+
+Every request answers after a fixed latency. The messages sent are
+recorded so the benchmarks can check the IB limit of 50 messages per
+second was honored.
+"""
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import datetime
+import itertools
+import time
+from typing import Any, List, NamedTuple
+
+
+class FakeOptionChain(NamedTuple):
+    exchange: str
+    underlyingConId: int
+    tradingClass: str
+    multiplier: str
+    expirations: List[str]
+    strikes: List[float]
+
+
+@dataclass
+class FakeGreeks:
+    impliedVol: float
+    delta: float
+    optPrice: float
+    pvDividend: float
+    gamma: float
+    vega: float
+    theta: float
+    undPrice: float
+
+
+@dataclass
+class FakeBar:
+    date: datetime.date
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    average: float
+    barCount: int
+
+
+@dataclass
+class FakeTicker:
+    contract: Any
+    time: datetime.datetime
+    bid: float
+    bidSize: float
+    ask: float
+    askSize: float
+    last: float
+    lastSize: float
+    volume: float
+    high: float
+    low: float
+    close: float
+    modelGreeks: FakeGreeks = None
+
+
+class FakeIB:
+    """Answers contract and market data requests after a fixed latency"""
+
+    def __init__(self, latency: float = 0.05, max_messages: int = 50,
+                 period: float = 1.0, unknown_symbols: frozenset = frozenset(),
+                 strikes: List[float] = ()) -> None:
+        self.latency = latency
+        self.max_messages = max_messages
+        self.period = period
+        self.unknown_symbols = unknown_symbols
+        self.strikes = list(strikes)
+        self.messages = 0
+        self.violations = 0
+        self.requests = {}
+        self._sent = deque()
+        self._con_ids = itertools.count(1)
+        self._loop = asyncio.new_event_loop()
+
+    def close(self) -> None:
+        self._loop.close()
+
+    def run(self, awaitable):
+        return self._loop.run_until_complete(awaitable)
+
+    def sleep(self, seconds: float) -> bool:
+        self.run(asyncio.sleep(seconds))
+        return True
+
+    def _send(self, request: str, n: int) -> None:
+        now = time.monotonic()
+        self.requests[request] = self.requests.get(request, 0) + 1
+        self.messages += n
+        self._sent.extend([now] * n)
+        while now - self._sent[0] >= self.period:
+            self._sent.popleft()
+        if len(self._sent) > self.max_messages:
+            self.violations += 1
+
+    def _qualify(self, contracts) -> list:
+        q_contracts = []
+        for c in contracts:
+            if c.symbol in self.unknown_symbols:
+                continue
+            c.conId = next(self._con_ids)
+            if c.secType == "OPT":
+                c.multiplier = "100"
+                c.tradingClass = c.symbol
+            q_contracts.append(c)
+        return q_contracts
+
+    def _ticker(self, contract) -> FakeTicker:
+        price = contract.strike / 20 if contract.secType == "OPT" else 100.0
+        greeks = None
+        if contract.secType == "OPT":
+            greeks = FakeGreeks(impliedVol=0.2, delta=-0.3, optPrice=price,
+                                pvDividend=0.0, gamma=0.05, vega=0.1,
+                                theta=-0.02, undPrice=100.0)
+        return FakeTicker(contract=contract, time=datetime.datetime.now(),
+                          bid=price - 0.05, bidSize=10, ask=price + 0.05,
+                          askSize=10, last=price, lastSize=1, volume=100,
+                          high=price + 1, low=price - 1, close=price,
+                          modelGreeks=greeks)
+
+    async def qualifyContractsAsync(self, *contracts) -> list:
+        self._send("qualifyContracts", len(contracts))
+        await asyncio.sleep(self.latency)
+        return self._qualify(contracts)
+
+    async def reqTickersAsync(self, *contracts) -> list:
+        self._send("reqTickers", len(contracts))
+        await asyncio.sleep(self.latency)
+        return [self._ticker(c) for c in contracts]
+
+    def reqSecDefOptParams(self, *args) -> list:
+        return self.run(self.reqSecDefOptParamsAsync(*args))
+
+    async def reqHistoricalDataAsync(self, contract, endDateTime, durationStr: str,
+                                     barSizeSetting: str, whatToShow: str,
+                                     useRTH: bool, formatDate: int = 1) -> list:
+        self._send("reqHistoricalData", 1)
+        await asyncio.sleep(self.latency)
+        n, unit = durationStr.split()
+        days = int(n) * (365 if unit == "Y" else 1)
+        today = datetime.date.today()
+        bars = []
+        for i in range(days, -1, -1):
+            day = today - datetime.timedelta(days=i)
+            if day.weekday() < 5:
+                price = 100.0 + (day.toordinal() % 17)
+                bars.append(FakeBar(date=day, open=price, high=price + 1,
+                                    low=price - 1, close=price, volume=1000,
+                                    average=price, barCount=100))
+        return bars
+
+    def qualifyContracts(self, *contracts) -> list:
+        return self.run(self.qualifyContractsAsync(*contracts))
+
+    def reqTickers(self, *contracts) -> list:
+        return self.run(self.reqTickersAsync(*contracts))
+
+    async def reqSecDefOptParamsAsync(self, symbol: str, exchange: str,
+                                      secType: str, conId: int) -> list:
+        self._send("reqSecDefOptParams", 1)
+        await asyncio.sleep(self.latency)
+        return [FakeOptionChain(exchange="SMART", underlyingConId=conId,
+                                tradingClass=symbol, multiplier="100",
+                                expirations=["20181019", "20181116"],
+                                strikes=self.strikes)]
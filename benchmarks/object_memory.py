@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Memory and construction time of options, quotes and bars
+
+Compares the slotted Option, Current and Bar with the same frozen
+dataclasses with a __dict__, as they were before.
+
+Usage: python -m benchmarks.object_memory [--objects 100000]
+"""
+import argparse
+import dataclasses
+import datetime
+import time
+import tracemalloc
+from optopus.asset import AssetId, Bar, Current
+from optopus.common import AssetType, Currency
+from optopus.option import Option, OptionId, RightType
+
+
+def with_dict(cls: type) -> type:
+    """Frozen dataclass with the fields and properties of cls and a __dict__"""
+    namespace = {
+        name: value for name, value in vars(cls).items() if isinstance(value, property)
+    }
+    return dataclasses.make_dataclass(
+        cls.__name__,
+        [(f.name, f.type) for f in dataclasses.fields(cls)],
+        namespace=namespace,
+        frozen=True,
+    )
+
+
+def options(option: type, option_id: type, n: int) -> list:
+    underlying = AssetId("SPY", AssetType.ETF, Currency.USDollar, None)
+    expiration = datetime.date(2018, 10, 19)
+    now = datetime.datetime(2018, 9, 19, 15, 0)
+    return [
+        option(
+            option_id(underlying, AssetType.Option, expiration, 100.0 + i, RightType.Put, "100", None),
+            None, None, None, 1.0 + i, 10, 1.1 + i, 10, None, None, None, 100,
+            -0.3, 0.01, -0.05, 0.1, 0.2 + i, 100.0 + i, 0.0, now,
+        )
+        for i in range(n)
+    ]
+
+
+def quotes(current: type, n: int) -> list:
+    return [current(1.0 + i, 1.0, 1.0, 1.0, 10, 1.1, 10, 1.05, 1, 100, 0.0) for i in range(n)]
+
+
+def bars(bar: type, n: int) -> list:
+    day = datetime.date(2018, 1, 1)
+    return [bar(1, 1.0 + i, 1.0, 1.0, 1.0, 1.0, 100.0, day) for i in range(n)]
+
+
+def measure(make, n: int) -> tuple:
+    start = time.perf_counter()
+    objects = make(n)
+    elapsed = time.perf_counter() - start
+    del objects
+    # tracing slows the construction down, it is timed apart
+    tracemalloc.start()
+    objects = make(n)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return size / n, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--objects", type=int, default=100000)
+    args = parser.parse_args()
+    n = args.objects
+
+    cases = (
+        ("Option", lambda n: options(with_dict(Option), with_dict(OptionId), n),
+         lambda n: options(Option, OptionId, n)),
+        ("Current", lambda n: quotes(with_dict(Current), n), lambda n: quotes(Current, n)),
+        ("Bar", lambda n: bars(with_dict(Bar), n), lambda n: bars(Bar, n)),
+    )
+    print(f"{n} objects, bytes per object including its float values")
+    print(f"{'':<8} {'dict B':>8} {'slots B':>8} {'dict s':>8} {'slots s':>8}")
+    for name, before, after in cases:
+        size_before, time_before = measure(before, n)
+        size_after, time_after = measure(after, n)
+        print(f"{name:<8} {size_before:>8.0f} {size_after:>8.0f} {time_before:>8.3f} {time_after:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Wall time of IBDataAdapter.get_optionchain per chain size
+
+Usage: python -m benchmarks.option_chain [--sizes 50 100 200 400] [--legacy]
+"""
+import argparse
+import datetime
+from pathlib import Path
+import tempfile
+import time
+from ib_insync.contract import Option as IBOption, Stock as IBStock
+from optopus.asset import AssetId, Current, ETF
+from optopus.common import AssetType, Currency
+from optopus.contract_cache import ContractCache
+from optopus.ib_adapter import IBDataAdapter, IBTranslator
+from optopus.ib_pipeline import chunks
+from optopus.utils import format_ib_date
+from benchmarks.fake_ib import FakeIB
+
+UNDERLYING_PRICE = 100.0
+EXPIRATION = datetime.date(2018, 10, 19)
+
+
+def make_asset() -> ETF:
+    contract = IBStock("SPY", exchange="SMART", currency="USD")
+    contract.conId = 756733
+    asset = ETF(AssetId("SPY", AssetType.ETF, Currency.USDollar, contract))
+    asset.current = Current(high=101.0, low=99.0, close=UNDERLYING_PRICE,
+                            bid=UNDERLYING_PRICE - 0.01, bid_size=100,
+                            ask=UNDERLYING_PRICE + 0.01, ask_size=100,
+                            last=UNDERLYING_PRICE, last_size=1, volume=1000,
+                            time=datetime.datetime.now())
+    return asset
+
+
+def make_strikes(size: int) -> list:
+    # size contracts, puts and calls, inside the +-10% strike window
+    n = size // 2
+    step = 19.0 / n
+    return [round(90.5 + i * step, 4) for i in range(n)]
+
+
+def legacy_optionchain(ib: FakeIB, asset: ETF) -> int:
+    """The serial algorithm, sleeping one second after every chunk"""
+    contracts = [IBOption("SPY", format_ib_date(EXPIRATION), s, r, "SMART")
+                 for r in ("P", "C") for s in ib.strikes]
+    q_contracts = []
+    for c in chunks(contracts, 50):
+        q_contracts += ib.qualifyContracts(*c)
+        ib.sleep(1)
+    for _ in range(2):
+        tickers = []
+        for q in chunks(q_contracts, 50):
+            tickers += ib.reqTickers(*q)
+            ib.sleep(1)
+    return len(tickers)
+
+
+def run(size: int, latency: float, legacy: bool) -> None:
+    asset = make_asset()
+    ib = FakeIB(latency=latency, strikes=make_strikes(size))
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ContractCache(Path(tmp) / "contracts.db")
+        adapter = IBDataAdapter(ib, IBTranslator(), cache)
+        start = time.perf_counter()
+        options = adapter.get_optionchain(asset, EXPIRATION)
+        elapsed = time.perf_counter() - start
+        messages = ib.messages
+        # the second pull finds every contract in the cache
+        start = time.perf_counter()
+        adapter.get_optionchain(asset, EXPIRATION)
+        warm = time.perf_counter() - start
+        cache.close()
+    line = (f"{size:>6} {len(options):>8} {elapsed:>10.3f} {warm:>10.3f} "
+            f"{messages:>9} {ib.violations:>11}")
+    ib.close()
+
+    if legacy:
+        ib = FakeIB(latency=latency, strikes=make_strikes(size))
+        start = time.perf_counter()
+        legacy_optionchain(ib, asset)
+        line += f" {time.perf_counter() - start:>10.3f}"
+        ib.close()
+    print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 100, 200, 400])
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="seconds the fake IB takes to answer a request")
+    parser.add_argument("--legacy", action="store_true",
+                        help="also time the serial chunk and sleep algorithm")
+    args = parser.parse_args()
+
+    header = (f"{'size':>6} {'options':>8} {'seconds':>10} {'warm':>10} "
+              f"{'messages':>9} {'violations':>11}")
+    if args.legacy:
+        header += f" {'legacy':>10}"
+    print(header)
+    for size in args.sizes:
+        run(size, args.latency, args.legacy)
+
+
+if __name__ == "__main__":
+    main()
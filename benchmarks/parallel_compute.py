@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Scaling of the indicators computed from the start across processes
+
+Times the indicators of every asset computed from the whole history, as
+the first compute and compute(full=True) do, in this process and in a
+pool of every number of workers.
+
+Usage: python -m benchmarks.parallel_compute [--assets 2000] [--workers 1 2 4 8]
+"""
+import argparse
+import logging
+import os
+import time
+from optopus.indicators import IndicatorEngine
+from optopus.parallel import ParallelIndicators
+from optopus.synthetic_adapter import SyntheticDataAdapter, synthetic_watch_list
+
+
+def histories(n: int) -> dict:
+    adapter = SyntheticDataAdapter()
+    assets, _ = adapter.create_assets(synthetic_watch_list(n))
+    return {code: adapter.get_price_history(a).values for code, a in assets.items()}
+
+
+def timed(engine: IndicatorEngine, bars: dict, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine.update_many(bars, full=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    bars = histories(args.assets)
+    print(f"{args.assets} assets x {len(next(iter(bars.values())))} bars, {os.cpu_count()} CPUs")
+    single = timed(IndicatorEngine(), bars, args.repeat)
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+    for workers in args.workers:
+        if workers == 1:
+            elapsed = single
+        else:
+            pool = ParallelIndicators(workers, min_assets=0)
+            try:
+                # the first run starts the processes
+                engine = IndicatorEngine(pool=pool)
+                engine.update_many(bars, full=True)
+                elapsed = timed(engine, bars, args.repeat)
+            finally:
+                pool.close()
+        print(f"{workers:>8} {elapsed:>10.3f} {single / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Time and memory of the vector measures with and without the price panel
+
+The legacy path builds a dict of lists with assets_matrix twice and a
+DataFrame in every calc function, as compute did before the panel.
+
+Usage: python -m benchmarks.price_panel [--assets 500] [--years 5]
+"""
+import argparse
+import datetime
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from optopus.asset import AssetId, Bar, ETF, History
+from optopus.common import AssetType, Currency
+from optopus.computation import (
+    assets_matrix,
+    assets_panel,
+    calc_beta,
+    calc_correlation,
+    calc_diff,
+    calc_pct_change,
+    calc_rsi,
+    calc_sma,
+    calc_stdev,
+)
+from optopus.settings import (
+    MARKET_BENCHMARK,
+    BETA_WINDOW,
+    CORRELATION_WINDOW,
+    STDEV_WINDOW,
+    RSI_WINDOW,
+    FAST_SMA_WINDOW,
+    SLOW_SMA_WINDOW,
+    VERY_SLOW_SMA_WINDOW,
+)
+
+
+def make_assets(n: int, years: int) -> dict:
+    rng = np.random.default_rng(0)
+    start = datetime.date.today() - datetime.timedelta(days=365 * years)
+    days = [start + datetime.timedelta(days=i) for i in range(365 * years)]
+    days = [d for d in days if d.weekday() < 5]
+    assets = {}
+    for i in range(n):
+        code = MARKET_BENCHMARK if i == 0 else f"SYN{i:04d}"
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(days))))
+        a = ETF(AssetId(code, AssetType.ETF, Currency.USDollar, None))
+        a.price_history = History(tuple(
+            Bar(count=1, open=c, high=c, low=c, close=c, average=c, volume=1, time=d)
+            for c, d in zip(closes.tolist(), days)
+        ))
+        assets[code] = a
+    return assets
+
+
+def legacy(assets: dict) -> None:
+    values = assets_matrix(assets, "close")
+    frame = lambda v: pd.DataFrame(data=v)
+    fast = frame(values).rolling(FAST_SMA_WINDOW).mean()
+    frame(values).rolling(SLOW_SMA_WINDOW).mean()
+    frame(values).rolling(VERY_SLOW_SMA_WINDOW).mean()
+    frame(values).pct_change(1)
+    fast_values = {c: tuple(fast[c].values) for c in fast.columns}
+    speed = frame(fast_values).rolling(FAST_SMA_WINDOW).mean().pct_change(FAST_SMA_WINDOW)
+    speed_values = {c: tuple(speed[c].values) for c in speed.columns}
+    frame(speed_values).diff(1)
+
+    values = assets_matrix(assets, "close")
+    for window in (BETA_WINDOW, CORRELATION_WINDOW, STDEV_WINDOW):
+        df = frame(values).pct_change().dropna()
+        df.insert(0, "benchmark", df[MARKET_BENCHMARK])
+        r = df.values[0:window, :]
+        np.cov(r, rowvar=False) if window == BETA_WINDOW else np.std(r, axis=0)
+    delta = frame(values).diff()
+    delta.rolling(RSI_WINDOW).mean()
+
+
+def panel(assets: dict) -> None:
+    p = assets_panel(assets)
+    fast = calc_sma(p, FAST_SMA_WINDOW)
+    calc_sma(p, SLOW_SMA_WINDOW)
+    calc_sma(p, VERY_SLOW_SMA_WINDOW)
+    calc_pct_change(p, 1)
+    calc_diff(calc_pct_change(fast, FAST_SMA_WINDOW), 1)
+    calc_beta(p)
+    calc_correlation(p)
+    calc_stdev(p)
+    calc_rsi(p, RSI_WINDOW)
+
+
+def measure(f, assets: dict, repeat: int) -> tuple:
+    f(assets)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        f(assets)
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    f(assets)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, default=500)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    assets = make_assets(args.assets, args.years)
+    bars = len(assets[MARKET_BENCHMARK].price_history.values)
+    print(f"{args.assets} assets x {bars} bars")
+    for name, f in (("legacy", legacy), ("panel", panel)):
+        elapsed, peak = measure(f, assets, args.repeat)
+        print(f"{name:<8} {elapsed:8.3f} s  peak {peak / 2 ** 20:8.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
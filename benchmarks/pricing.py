@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""Time of the vectorized Black-Scholes pricing and implied volatility solver
+
+Prices random options, solves their implied volatility back from the
+prices and reports the largest error against the volatility used, for
+the options whose price changes at least a cent for a point of volatility.
+Deeper in the money, the time value is lost in the rounding of the price.
+
+Usage: python -m benchmarks.pricing [--options 100000]
+"""
+import argparse
+import time
+import numpy as np
+from optopus.pricing import black_scholes, implied_volatility
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--options", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    n = args.options
+    call = rng.random(n) < 0.5
+    s = rng.uniform(20, 500, n)
+    k = s * rng.uniform(0.8, 1.2, n)
+    t = rng.uniform(7, 365, n) / 365
+    sigma = rng.uniform(0.1, 1.0, n)
+
+    start = time.perf_counter()
+    g = black_scholes(call, s, k, t, sigma)
+    priced = time.perf_counter() - start
+    start = time.perf_counter()
+    iv = implied_volatility(call, g.price, s, k, t)
+    solved = time.perf_counter() - start
+
+    ok = ~np.isnan(iv)
+    sensitive = ok & (g.vega >= 0.01)
+    print(f"{n} options")
+    print(f"black_scholes      {priced:8.3f} s")
+    print(f"implied_volatility {solved:8.3f} s  solved {ok.mean():.2%}")
+    print(f"max iv error       {np.abs(iv[sensitive] - sigma[sensitive]).max():.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Wall time of the Optopus runtime on synthetic market data
+
+Runs start and a number of loop iterations for every universe size and
+reports the time of start, compute and a loop iteration. With --chains
+every iteration also retrieves the option chain of that many assets, as
+the screening algorithms do.
+
+Usage: python -m benchmarks.runtime [--assets 10 100 1000] [--iterations 5]
+"""
+import argparse
+import logging
+import os
+import statistics
+import tempfile
+import time
+from optopus.optopus import Optopus
+from optopus.synthetic_adapter import (
+    SyntheticBroker,
+    SyntheticDataAdapter,
+    synthetic_watch_list,
+)
+
+
+def timed(f) -> float:
+    start = time.perf_counter()
+    f()
+    return time.perf_counter() - start
+
+
+def run(n: int, iterations: int, chains: int, latency: float) -> dict:
+    adapter = SyntheticDataAdapter(latency=latency)
+    opt = Optopus(SyntheticBroker(adapter), synthetic_watch_list(n))
+
+    if chains:
+        def screen() -> None:
+            for code in list(opt.etfs)[:chains]:
+                opt.option_chain(code, None)
+
+        opt.register_algorithm(screen)
+
+    result = {"start": timed(opt.start)}
+    compute = [timed(opt._data_manager.compute) for _ in range(iterations)]
+    loop = [timed(opt.iterate) for _ in range(iterations)]
+    result["compute"] = statistics.median(compute)
+    result["iteration"] = statistics.median(loop)
+    result["requests"] = adapter.requests
+    opt.stop()
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--assets", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--chains", type=int, default=0,
+                        help="option chains retrieved per iteration")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the synthetic adapter takes per request")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    cwd = os.getcwd()
+    print(f"{'assets':>8} {'start s':>10} {'compute s':>10} {'iteration s':>12} {'requests':>9}")
+    for n in args.assets:
+        # bars and strategies are stored below the working directory
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                r = run(n, args.iterations, args.chains, args.latency)
+            finally:
+                os.chdir(cwd)
+        print(f"{n:>8} {r['start']:>10.3f} {r['compute']:>10.3f} "
+              f"{r['iteration']:>12.3f} {r['requests']:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
-from dataclasses import dataclass
+import collections.abc
+from dataclasses import dataclass, field
 import datetime
-from typing import Any, Tuple
-from optopus.common import AssetType, Currency, Direction
+from typing import Any, Dict, Iterator, Sequence, Tuple
+import numpy as np
+from optopus.common import AssetType, Currency, Direction, FrozenSlots
 
 
 @dataclass(frozen=True)
@@ -13,7 +15,12 @@ class AssetId:
 
 
 @dataclass(frozen=True)
-class Current:
+class Current(FrozenSlots):
+    __slots__ = (
+        "high", "low", "close", "bid", "bid_size", "ask", "ask_size",
+        "last", "last_size", "volume", "time",
+    )
+
     high: float
     low: float
     close: float
@@ -43,7 +50,9 @@ class Current:
 
 
 @dataclass(frozen=True)
-class Bar:
+class Bar(FrozenSlots):
+    __slots__ = ("count", "open", "high", "low", "close", "average", "volume", "time")
+
     count: int
     open: float
     high: float
@@ -54,10 +63,182 @@ class Bar:
     time: datetime.date
 
 
-@dataclass(frozen=True)
-class History:
-    values: Tuple[Bar]
-    created: datetime.datetime = datetime.datetime.now()
+# Bars are stored by column, one record per bar
+BAR_DTYPE = np.dtype(
+    [
+        ("time", "M8[D]"),
+        ("open", "f8"),
+        ("high", "f8"),
+        ("low", "f8"),
+        ("close", "f8"),
+        ("average", "f8"),
+        ("volume", "f8"),
+        ("count", "i8"),
+    ]
+)
+# bars with a time of the day
+INTRADAY_BAR_DTYPE = np.dtype([("time", "M8[us]")] + BAR_DTYPE.descr[1:])
+
+
+def _naive(t: datetime.date) -> datetime.date:
+    # numpy has no time zones, aware times are stored in UTC
+    if isinstance(t, datetime.datetime) and t.tzinfo is not None:
+        return t.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return t
+
+
+def to_records(bars: Sequence[Bar]) -> np.ndarray:
+    """Read only records of the bars, by day unless a bar has a time of the day
+
+    Records and Bars views are returned as they are.
+    """
+    if isinstance(bars, Bars):
+        return bars.records
+    if isinstance(bars, np.ndarray):
+        return bars
+    intraday = any(isinstance(b.time, datetime.datetime) for b in bars)
+    records = np.empty(len(bars), dtype=INTRADAY_BAR_DTYPE if intraday else BAR_DTYPE)
+    records["time"] = [_naive(b.time) for b in bars]
+    for name in BAR_DTYPE.names[1:]:
+        records[name] = [getattr(b, name) for b in bars]
+    records.flags.writeable = False
+    return records
+
+
+class _BarColumns:
+    """Read only views of the columns of the records"""
+
+    records: np.ndarray
+
+    @property
+    def time(self) -> np.ndarray:
+        return self.records["time"]
+
+    @property
+    def open(self) -> np.ndarray:
+        return self.records["open"]
+
+    @property
+    def high(self) -> np.ndarray:
+        return self.records["high"]
+
+    @property
+    def low(self) -> np.ndarray:
+        return self.records["low"]
+
+    @property
+    def close(self) -> np.ndarray:
+        return self.records["close"]
+
+    @property
+    def average(self) -> np.ndarray:
+        return self.records["average"]
+
+    @property
+    def volume(self) -> np.ndarray:
+        return self.records["volume"]
+
+    @property
+    def count(self) -> np.ndarray:
+        return self.records["count"]
+
+
+class Bars(_BarColumns, collections.abc.Sequence):
+    """Sequence of the Bar objects of bar records, built when accessed
+
+    Slices are views of the same records.
+    """
+
+    __slots__ = ("records",)
+
+    def __init__(self, records: np.ndarray) -> None:
+        self.records = records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return Bars(self.records[i])
+        r = self.records[i]
+        return Bar(
+            count=int(r["count"]),
+            open=float(r["open"]),
+            high=float(r["high"]),
+            low=float(r["low"]),
+            close=float(r["close"]),
+            average=float(r["average"]),
+            volume=float(r["volume"]),
+            time=r["time"].item(),
+        )
+
+    def __iter__(self) -> Iterator[Bar]:
+        columns = [self.records[name].tolist() for name in BAR_DTYPE.names]
+        for time, open, high, low, close, average, volume, count in zip(*columns):
+            yield Bar(count, open, high, low, close, average, volume, time)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Bars) and other.records.dtype == self.records.dtype:
+            return np.array_equal(self.records, other.records)
+        if isinstance(other, Sequence):
+            return len(self) == len(other) and tuple(self) == tuple(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __add__(self, other: Sequence[Bar]) -> Tuple[Bar]:
+        return tuple(self) + tuple(other)
+
+    def __radd__(self, other: Sequence[Bar]) -> Tuple[Bar]:
+        return tuple(other) + tuple(self)
+
+    def __repr__(self) -> str:
+        return f"Bars({len(self)} bars)"
+
+
+@dataclass(frozen=True, init=False, eq=False)
+class History(_BarColumns):
+    """Bars sorted by time, stored by column in read only records
+
+    The columns are read only views of the records, history.close for
+    instance, and values the bars as Bar objects built when accessed.
+    History accepts Bar objects, a Bars view or bar records.
+    """
+
+    records: np.ndarray
+    created: datetime.datetime
+
+    def __init__(self, values: Sequence[Bar] = (), created: datetime.datetime = None) -> None:
+        records = to_records(values)
+        if records.flags.writeable:
+            records = records.view()
+            records.flags.writeable = False
+        object.__setattr__(self, "records", records)
+        object.__setattr__(self, "created", created if created else datetime.datetime.now())
+
+    @property
+    def values(self) -> Bars:
+        return Bars(self.records)
+
+    @property
+    def last_time(self) -> datetime.date:
+        return self.records["time"][-1].item() if len(self.records) else None
+
+    def append(self, bars: Sequence[Bar]) -> "History":
+        """New history with the bars added
+
+        Stored bars from the time of the first new bar are replaced, the
+        last stored bar could be incomplete when it was retrieved.
+        """
+        new = to_records(bars)
+        if not len(new):
+            return self
+        records = self.records
+        if new.dtype != records.dtype:
+            new = new.astype(INTRADAY_BAR_DTYPE)
+            records = records.astype(INTRADAY_BAR_DTYPE)
+        i = int(np.searchsorted(records["time"], new["time"][0]))
+        return History(np.concatenate((records[:i], new)))
 
 # TODO: expected_range > Tuple(,)
 # https://www.optionsanimal.com/using-implied-volatility-determine-expected-range-stock/
@@ -78,18 +259,42 @@ class Measures:
     very_slow_sma: Tuple
     fast_sma_speed: Tuple
     fast_sma_speed_diff: Tuple
-    
+    # series of the registered indicators without a field
+    indicators: Dict[str, np.ndarray] = field(default_factory=dict)
+
+# int8 codes of the forecast directions
+DIRECTION_CODES = {Direction.Bullish: 1, Direction.Neutral: 0, Direction.Bearish: -1}
+NO_DIRECTION = -128
+_DIRECTIONS = {code: d for d, code in DIRECTION_CODES.items()}
+
+
 @dataclass(frozen=True)
 class Forecast:
-    direction: Tuple
+    """direction holds the DIRECTION_CODES of every bar, NO_DIRECTION
+    where it can't be forecasted"""
+    direction: np.ndarray
+
+    def directions(self) -> Tuple:
+        """Direction values of every bar, NaN where there isn't a direction"""
+        return tuple(
+            _DIRECTIONS[c].value if c != NO_DIRECTION else np.nan
+            for c in self.direction.tolist()
+        )
+
+    @property
+    def last_direction(self) -> Direction:
+        if not len(self.direction) or self.direction[-1] == NO_DIRECTION:
+            return None
+        return _DIRECTIONS[int(self.direction[-1])]
 
 
 class Asset:
     def __init__(self, id: AssetId):
         self._id = id
-        self.current: Current = None
-        self.price_history: History = None
-        self.iv_history: History = None
+        self._versions = {"current": 0, "price_history": 0, "iv_history": 0}
+        self._current: Current = None
+        self._price_history: History = None
+        self._iv_history: History = None
         self.measures: Measures = None
         self.forecast: Forecast = None
 
@@ -97,6 +302,40 @@ class Asset:
     def id(self):
         return self._id
 
+    def version(self, attribute: str) -> int:
+        """Number of times the current values or a history were replaced"""
+        return self._versions[attribute]
+
+    @property
+    def current(self) -> Current:
+        return self._current
+
+    @current.setter
+    def current(self, value: Current) -> None:
+        if value is not self._current:
+            self._current = value
+            self._versions["current"] += 1
+
+    @property
+    def price_history(self) -> History:
+        return self._price_history
+
+    @price_history.setter
+    def price_history(self, value: History) -> None:
+        if value is not self._price_history:
+            self._price_history = value
+            self._versions["price_history"] += 1
+
+    @property
+    def iv_history(self) -> History:
+        return self._iv_history
+
+    @iv_history.setter
+    def iv_history(self, value: History) -> None:
+        if value is not self._iv_history:
+            self._iv_history = value
+            self._versions["iv_history"] += 1
+
 
 class Stock(Asset):
     def __init__(self, id: AssetId):
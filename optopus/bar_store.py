@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Columnar on disk store of daily bars"""
+import datetime
+import logging
+from pathlib import Path
+from typing import Sequence
+import numpy as np
+from optopus.asset import BAR_DTYPE, Bar, History, to_records
+from optopus.settings import DATA_DIR, BARS_DIR
+
+class BarStore:
+    """Daily bars stored as one file of fixed size records per symbol and
+    bar type, sorted by time
+
+    The files are memory mapped, reads return views of the file without
+    copying the bars.
+    """
+
+    def __init__(self, path: Path = None) -> None:
+        self._path = Path(path) if path else Path.cwd() / DATA_DIR / BARS_DIR
+        self._path.mkdir(parents=True, exist_ok=True)
+        self._log = logging.getLogger(__name__)
+
+    def _file(self, code: str, kind: str) -> Path:
+        return self._path / f"{code.replace('/', '_')}_{kind}.bars"
+
+    def _map(self, code: str, kind: str) -> np.ndarray:
+        file_name = self._file(code, kind)
+        if not file_name.exists() or not file_name.stat().st_size:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.memmap(file_name, dtype=BAR_DTYPE, mode="r")
+
+    def read(
+        self,
+        code: str,
+        kind: str,
+        start: datetime.date = None,
+        end: datetime.date = None,
+    ) -> np.ndarray:
+        """Bars with start <= time <= end, as a read only view"""
+        bars = self._map(code, kind)
+        times = bars["time"]
+        i = np.searchsorted(times, np.datetime64(start, "D")) if start else 0
+        j = (
+            np.searchsorted(times, np.datetime64(end, "D"), side="right")
+            if end
+            else len(bars)
+        )
+        return bars[i:j]
+
+    def last_time(self, code: str, kind: str) -> datetime.date:
+        bars = self._map(code, kind)
+        return bars["time"][-1].astype(datetime.date) if len(bars) else None
+
+    def write(self, code: str, kind: str, bars: Sequence[Bar]) -> None:
+        """Replaces the stored bars"""
+        with open(self._file(code, kind), "wb") as file:
+            file.write(_daily_records(bars).tobytes())
+
+    def append(self, code: str, kind: str, bars: Sequence[Bar]) -> None:
+        """Adds the bars replacing the stored ones from the first new bar"""
+        if not len(bars):
+            return
+        records = _daily_records(bars)
+        stored = self._map(code, kind)
+        position = int(np.searchsorted(stored["time"], records["time"][0]))
+        del stored
+        with open(self._file(code, kind), "ab") as file:
+            file.truncate(position * BAR_DTYPE.itemsize)
+            file.write(records.tobytes())
+
+    def load(self, code: str, kind: str, start: datetime.date = None) -> History:
+        """History with the stored bars from start, None if there are no bars
+
+        The bars are copied out of the file, later appends don't change
+        the history. The history was created when the file was last
+        written, the time the bars were fetched.
+        """
+        bars = self.read(code, kind, start)
+        if not len(bars):
+            return None
+        written = datetime.datetime.fromtimestamp(self._file(code, kind).stat().st_mtime)
+        return History(np.array(bars), written)
+
+
+def _daily_records(bars: Sequence[Bar]) -> np.ndarray:
+    records = to_records(bars)
+    return records if records.dtype == BAR_DTYPE else records.astype(BAR_DTYPE)
@@ -38,3 +38,21 @@ class Direction(Enum):
     Bullish = "Bullish"
     Neutral = "Neutral"
     Bearish = "Bearish"
+
+
+class FrozenSlots:
+    """State of frozen dataclasses with __slots__ and without __dict__
+
+    Frozen instances can't be restored setting their attributes, the state
+    is set bypassing the frozen __setattr__. States pickled before the
+    class had slots are dicts as well.
+    """
+
+    __slots__ = ()
+
+    def __getstate__(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state: dict) -> None:
+        for name, value in state.items():
+            object.__setattr__(self, name, value)
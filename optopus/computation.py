@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
-from typing import Dict, List, Tuple, Any
+from typing import Dict, Any
 import pandas as pd
 import numpy as np
 from optopus.settings import (MARKET_BENCHMARK, STDEV_WINDOW, BETA_WINDOW,
-                              CORRELATION_WINDOW, HISTORICAL_YEARS,
-                              PRICE_WINDOW, IV_WINDOW, RSI_WINDOW,
-                              FAST_SMA_WINDOW, SLOW_SMA_WINDOW, VERY_SLOW_SMA_WINDOW)
-from optopus.asset import Asset, AssetType
+                              CORRELATION_WINDOW)
+from optopus.asset import Asset, AssetType, DIRECTION_CODES, NO_DIRECTION
 from optopus.common import Direction
+from optopus.indicators import IndicatorEngine
+from optopus.covariance import CovarianceMatrix, covariance_matrix
+from optopus.panel import PricePanel
+from optopus.percentiles import HistoryPercentiles
+from optopus.rolling_moments import UniverseMoments
 from optopus.data_objects import (OwnershipType, 
                                   Position)
 from optopus.strategy import Strategy
@@ -23,192 +26,234 @@ def assets_matrix(assets: Asset, field: str) -> dict:
         """
         d = {}
         for a in assets.values():
-            d[a.id.code] = [getattr(bar, field) for bar in a.price_history.values]
+            d[a.id.code] = a.price_history.records[field].tolist()
         return d
 
 
-def calc_beta(values: Dict[str, Tuple]) -> Dict[str, float]:
-    # calculate daily returns
-    df = pd.DataFrame(data=values).pct_change().dropna()
-    # SPY represents the market
-    df.insert(0, 'benchmark', df[MARKET_BENCHMARK])
-    np_array = df.values[0:BETA_WINDOW, :]
+def assets_panel(assets: Dict[str, Asset], field: str = "close") -> PricePanel:
+    """Date aligned panel of a bar attribute of every asset
+    """
+    return PricePanel.from_histories({code: a.price_history for code, a in assets.items()}, field)
+
 
-    covariance = np.cov(np_array, rowvar=False)
-    beta = covariance[0, :]/covariance[0, 0]
+def window_returns(panel: PricePanel, window: int) -> np.ndarray:
+    """Daily returns of the last window dates every asset has a price
+    """
+    return panel.complete_returns()[-window:, :]
 
-    d = {}
-    for i, col in enumerate(df.columns.values.tolist()):
-        d[col] = beta[i]
-    return d
 
+def calc_covariance(panel: PricePanel) -> CovarianceMatrix:
+    """Covariance and correlation of every pair of assets over the correlation window
+    """
+    return covariance_matrix(panel, window_returns(panel, CORRELATION_WINDOW))
 
-def calc_correlation(values: Dict[str, Tuple]) -> Dict[str, float]:
-    # calculate daily returns
-    df = pd.DataFrame(data=values).pct_change().dropna()
-    df.insert(0, 'benchmark', df[MARKET_BENCHMARK])
-    np_array = df.values[0:CORRELATION_WINDOW, :]
-    correlation = np.corrcoef(np_array, rowvar=False)
 
-    d = {}
-    for i, col in enumerate(df.columns.values.tolist()):
-        d[col] = correlation[0, i]
-    return d
+def calc_beta(panel: PricePanel, matrix: CovarianceMatrix = None) -> Dict[str, float]:
+    if matrix is None or BETA_WINDOW != CORRELATION_WINDOW:
+        matrix = covariance_matrix(panel, window_returns(panel, BETA_WINDOW))
+    # SPY represents the market
+    return dict(zip(matrix.codes, matrix.beta(MARKET_BENCHMARK)))
 
 
-def calc_stdev(values: Dict[str, Tuple]) -> Dict[str, float]:
-    df = pd.DataFrame(data=values).pct_change().dropna()
-    np_array = df.values[0:STDEV_WINDOW, :]
-    stdev = np.std(np_array, axis=0)
+def calc_correlation(panel: PricePanel, matrix: CovarianceMatrix = None) -> Dict[str, float]:
+    if matrix is None:
+        matrix = calc_covariance(panel)
+    benchmark = matrix.index(MARKET_BENCHMARK)
+    return dict(zip(matrix.codes, matrix.correlation[benchmark, :]))
 
-    d = {}
-    for i, col in enumerate(df.columns.values.tolist()):
-        d[col] = stdev[i]
-    return d
 
-def calc_rsi(values: Dict[str, Tuple], window_length:int = 14) -> Dict[str, Tuple]:
-    df = pd.DataFrame(data=values).diff()
+def calc_stdev(panel: PricePanel) -> Dict[str, float]:
+    np_array = window_returns(panel, STDEV_WINDOW)
+    stdev = np.std(np_array, axis=0)
+    return dict(zip(panel.codes, stdev))
+
+def calc_rsi(panel: PricePanel, window_length:int = 14, wilder: bool = False) -> PricePanel:
+    df = pd.DataFrame(panel.values).diff()
     # delta=delta.dropna()
     up, down = df.copy(), df.copy()
     up[up < 0] = 0
     down[down > 0] = 0
     
-    roll_up = up.rolling(window=window_length).mean()
-    roll_down = down.rolling(window=window_length).mean().abs()
+    if wilder:
+        roll_up = up.ewm(alpha=1 / window_length, adjust=False, min_periods=window_length).mean()
+        roll_down = down.ewm(alpha=1 / window_length, adjust=False, min_periods=window_length).mean().abs()
+    else:
+        roll_up = up.rolling(window=window_length).mean()
+        roll_down = down.rolling(window=window_length).mean().abs()
 
     rs = roll_up / roll_down
     rsi = 100.0 - (100.0 / (1.0 + rs))
+    return panel.replace(rsi.to_numpy())
 
-    d = {}
-    for i, col in enumerate(df.columns.values.tolist()):
-        d[col] = tuple(rsi[col].values)
-    return d
-
-def calc_sma(values: Dict[str, Tuple], window_length: int) -> Dict[str, Tuple]:
-    df = pd.DataFrame(data=values).rolling(window_length).mean()
-    d = {}
-    for _, col in enumerate(df.columns.values.tolist()):
-        d[col] = tuple(df[col].values)
-    return d
+def calc_sma(panel: PricePanel, window_length: int) -> PricePanel:
+    df = pd.DataFrame(panel.values).rolling(window_length).mean()
+    return panel.replace(df.to_numpy())
 
-def calc_pct_change(values: Dict[str, Tuple], window_length: int) -> Dict[str, Tuple]:
-    df = pd.DataFrame(data=values).rolling(window_length).mean()
+def calc_pct_change(panel: PricePanel, window_length: int) -> PricePanel:
+    df = pd.DataFrame(panel.values).rolling(window_length).mean()
     df = df.pct_change(window_length)
-    d = {}
-    for _, col in enumerate(df.columns.values.tolist()):
-        d[col] = tuple(df[col].values)
-    return d
+    return panel.replace(df.to_numpy())
 
-def calc_diff(values: Dict[str, Tuple], window_length: int) -> Dict[str, Tuple]:
-    df = pd.DataFrame(data=values).rolling(window_length).mean()
+def calc_diff(panel: PricePanel, window_length: int) -> PricePanel:
+    df = pd.DataFrame(panel.values).rolling(window_length).mean()
     df = df.diff(window_length)
-    d = {}
-    for _, col in enumerate(df.columns.values.tolist()):
-        d[col] = tuple(df[col].values)
-    return d
+    return panel.replace(df.to_numpy())
 
-def _iv_rank(asset: Asset, iv_value: float) -> float:
-    min_iv_values = [b.low for b in asset.iv_history.values]
-    max_iv_values = [b.high for b in asset.iv_history.values]
-    iv_min = min(min_iv_values)
-    iv_max = max(max_iv_values)
-    iv_rank = (iv_value - iv_min) / (iv_max - iv_min)
-    return iv_rank
-
-def _iv_percentile(asset: Asset, iv_value: float) -> float:
-    iv_values = [b.low for b in asset.iv_history.values if b.low < iv_value]
-    return len(iv_values) / (HISTORICAL_YEARS * 252)
-
-
-def _price_percentile(asset: Asset, value: float) -> float:
-    values = [b.low for b in asset.price_history.values if b.low < value]
-    return len(values) / (HISTORICAL_YEARS * 252)
-
-
-def assets_loop_computation(assets: Dict[str, Asset], measures: Dict[str, Any]) -> Dict[str, Dict]:
-    computable_assets = {
+def computable(assets: Dict[str, Asset]) -> Dict[str, Asset]:
+    """Stocks and ETFs, the assets with IV measures
+    """
+    return {
             a.id.code: a
             for a in assets.values()
             if a.id.asset_type == AssetType.Stock or a.id.asset_type == AssetType.ETF
         }
-    
-    for a in computable_assets.values():
-        measures[a.id.code]['volume'] = a.price_history.values[-1].volume
-        # TODO: get price_pct from vector calculation
-        #measures[a.id.code]['price_pct'] = (a.price_history.values[-1].close - a.price_history.values[-1 * PRICE_PERIOD].close) / a.price_history.values[-1 * PRICE_PERIOD].close
-        measures[a.id.code]['price_percentile'] = _price_percentile(a, a.current.market_price)
-        # TODO: get iv_pct from vector calculation
-        measures[a.id.code]['iv_pct'] = (a.iv_history.values[-1].close - a.iv_history.values[-1 * IV_WINDOW].close) / a.iv_history.values[-1 * IV_WINDOW].close
-        measures[a.id.code]['iv'] = a.iv_history.values[-1].close
-        measures[a.id.code]['iv_rank'] = _iv_rank(a, measures[a.id.code]['iv'])
-        measures[a.id.code]['iv_percentile'] = _iv_percentile(a, measures[a.id.code]['iv'])
+
+
+def assets_price_percentile(assets: Dict[str, Asset], measures: Dict[str, Any],
+                            percentiles: HistoryPercentiles) -> Dict[str, Dict]:
+    """Percentile of the current price, percentiles must be updated with the universe
+    """
+    codes = list(assets)
+    prices = np.array([a.current.market_price for a in assets.values()], dtype=float)
+    price_percentile = percentiles.price_percentile(codes, prices)
+    for i, code in enumerate(codes):
+        measures[code]['price_percentile'] = float(price_percentile[i])
     return measures
 
 
-def assets_vector_computation(assets: Dict[str, Asset], measures: Dict[str, Any]) -> Dict[str, Dict]:
-    computable_assets = assets
-    close_values = assets_matrix(computable_assets, "close")
-    fast_sma = calc_sma(close_values, FAST_SMA_WINDOW)
-    slow_sma = calc_sma(close_values, SLOW_SMA_WINDOW)
-    very_slow_sma = calc_sma(close_values, VERY_SLOW_SMA_WINDOW)
-    price_pct = calc_pct_change(close_values, 1)
-    fast_sma_speed = calc_pct_change(fast_sma, FAST_SMA_WINDOW)
-    fast_sma_speed_diff = calc_diff(fast_sma_speed, 1)
+def assets_iv_computation(assets: Dict[str, Asset], measures: Dict[str, Any],
+                          percentiles: HistoryPercentiles) -> Dict[str, Dict]:
+    """IV, IV rank and IV percentile, percentiles must be updated with the universe
+    """
+    codes = list(assets)
+    iv = percentiles.iv(codes)
+    iv_pct = percentiles.iv_pct(codes)
+    iv_rank = percentiles.iv_rank(codes, iv)
+    iv_percentile = percentiles.iv_percentile(codes, iv)
+    for i, code in enumerate(codes):
+        m = measures[code]
+        m['volume'] = float(assets[code].price_history.volume[-1])
+        m['iv_pct'] = float(iv_pct[i])
+        m['iv'] = float(iv[i])
+        m['iv_rank'] = float(iv_rank[i])
+        m['iv_percentile'] = float(iv_percentile[i])
+    return measures
 
 
-    for code in close_values.keys():
-        measures[code]['fast_sma'] = fast_sma[code]
-        measures[code]['slow_sma'] = slow_sma[code]
-        measures[code]['very_slow_sma'] = very_slow_sma[code]
-        measures[code]['price_pct'] = price_pct[code][-1]
-        measures[code]['fast_sma_speed'] = fast_sma_speed[code]
-        measures[code]['fast_sma_speed_diff'] = fast_sma_speed_diff[code]
+def assets_loop_computation(assets: Dict[str, Asset], measures: Dict[str, Any],
+                            percentiles: HistoryPercentiles = None) -> Dict[str, Dict]:
+    """IV, IV rank and percentiles of every asset at once
+    """
+    computable_assets = computable(assets)
+    if percentiles is None:
+        percentiles = HistoryPercentiles()
+    percentiles.update(computable_assets)
+    assets_price_percentile(computable_assets, measures, percentiles)
+    return assets_iv_computation(computable_assets, measures, percentiles)
+
+
+def assets_indicator_computation(assets: Dict[str, Asset], measures: Dict[str, Any],
+                                 engine: IndicatorEngine, full: bool = False) -> Dict[str, Dict]:
+    """Measures of the indicators of the engine registry, only the bars added
+    since the last call are computed
+    """
+    registry = engine.registry
+    names = registry.measures()
+    updated = engine.update_many({code: a.price_history.values for code, a in assets.items()}, full)
+    for a in assets.values():
+        indicators = updated[a.id.code]
+        m = measures[a.id.code]
+        for name in names:
+            # only stocks and ETFs have an RSI
+            if name == 'rsi' and a.id.asset_type not in (AssetType.Stock, AssetType.ETF):
+                continue
+            m[name] = indicators.last(name) if registry[name].last else indicators.series(name)
+    return measures
+
 
+def assets_vector_computation(assets: Dict[str, Asset], measures: Dict[str, Any],
+                              panel: PricePanel = None,
+                              matrix: CovarianceMatrix = None) -> Dict[str, Dict]:
+    """Beta, correlation and standard deviation from the close price panel
+    """
     computable_assets = {
             a.id.code: a
             for a in assets.values()
             if a.id.asset_type == AssetType.Stock or a.id.asset_type == AssetType.ETF
         }
 
-    close_values = assets_matrix(computable_assets, "close")
-    beta = calc_beta(close_values)
-    correlation = calc_correlation(close_values)
-    stdev = calc_stdev(close_values)
-    rsi = calc_rsi(close_values, RSI_WINDOW)
+    if panel is None:
+        panel = assets_panel(computable_assets)
+    panel = panel.select(computable_assets.keys())
+    if matrix is None or matrix.codes != panel.codes:
+        matrix = calc_covariance(panel)
+    beta = calc_beta(panel, matrix)
+    correlation = calc_correlation(panel, matrix)
+    stdev = calc_stdev(panel)
 
-    for code in close_values.keys():
+    for code in panel.codes:
         measures[code]['beta'] = beta[code]
         measures[code]['correlation'] = correlation[code]
         measures[code]['stdev'] = stdev[code]
-        measures[code]['rsi'] = rsi[code]
 
     return measures
 
 
 
-def assets_directional_assumption(assets: Dict[str, Asset]) -> Dict[str, Dict]:
+def assets_moments_computation(assets: Dict[str, Asset], measures: Dict[str, Any],
+                               panel: PricePanel, moments: UniverseMoments) -> Dict[str, Dict]:
+    """Beta, correlation and standard deviation from rolling moments, only the
+    dates added to the panel since the last call are computed
+    """
+    moments.update(panel.select(computable(assets).keys()))
+    beta = moments.beta()
+    correlation = moments.correlation()
+    stdev = moments.stdev()
+
+    for code in moments.codes:
+        measures[code]['beta'] = float(beta[code])
+        measures[code]['correlation'] = float(correlation[code])
+        measures[code]['stdev'] = float(stdev[code])
+
+    return measures
+
+
+def encode_direction(fast_sma: np.ndarray, slow_sma: np.ndarray) -> np.ndarray:
+    """Bullish when the fast SMA is above the slow one, bearish otherwise
+    """
+    directions = np.where(fast_sma > slow_sma,
+                          np.int8(DIRECTION_CODES[Direction.Bullish]),
+                          np.int8(DIRECTION_CODES[Direction.Bearish]))
+    directions[np.isnan(fast_sma) | np.isnan(slow_sma)] = NO_DIRECTION
+    return directions
+
+
+def assets_directional_assumption(assets: Dict[str, Asset],
+                                  engine: IndicatorEngine = None) -> Dict[str, np.ndarray]:
+    """Direction codes of every asset bar from the SMAs of the indicator engine
 
+    The SMAs are those of the asset own bars, the directions line up with
+    its price history. They are encoded at once and are read only views
+    of a single array.
+    """
     computable_assets = {
             a.id.code: a
             for a in assets.values()
             if a.id.asset_type == AssetType.Stock or a.id.asset_type == AssetType.ETF
         }
 
-    asset_directions = {}
-    for a in computable_assets.values():
-        fast_sma = a.measures.fast_sma
-        slow_sma = a.measures.slow_sma
-        directions = []
-        for i in (range(len(fast_sma))):
-            if np.isnan(fast_sma[i]) or np.isnan(slow_sma[i]):
-                directions.append(np.nan)
-            elif fast_sma[i] > slow_sma[i]:
-                directions.append(Direction.Bullish.value)
-            else:
-                directions.append(Direction.Bearish.value)
-        asset_directions[a.id.code] = tuple(directions)
-
-    return asset_directions
+    engine = engine if engine is not None else IndicatorEngine()
+    # the indicators of the measures are already up to date, nothing is computed again
+    indicators = engine.update_many({code: a.price_history.values for code, a in computable_assets.items()})
+    codes = list(indicators)
+    if not codes:
+        return {}
+    fast_sma = np.concatenate([indicators[c].series("fast_sma") for c in codes])
+    slow_sma = np.concatenate([indicators[c].series("slow_sma") for c in codes])
+    directions = encode_direction(fast_sma, slow_sma)
+    directions.flags.writeable = False
+    ends = np.cumsum([len(indicators[c]) for c in codes])
+    return {code: directions[end - len(indicators[code]):end] for code, end in zip(codes, ends)}
 
 
 def portfolio_bwd(strategies: Dict[str, Strategy], ads: Dict[str, Asset], benchmark_price: float) -> float:
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""On disk cache of qualified IB contracts"""
+import datetime
+import logging
+from pathlib import Path
+import pickle
+import sqlite3
+from typing import Any, Dict, List, Tuple
+from optopus.settings import DATA_DIR, CONTRACTS_FILE
+from optopus.utils import format_ib_date
+
+
+class ContractCache:
+    """Qualified contracts stored in a SQLite file
+
+    The contracts are keyed by the fields used to request them: security
+    type, symbol, expiration, strike, right, exchange and currency.
+    Options are evicted once their expiration date has passed.
+    """
+
+    def __init__(self, path: Path = None) -> None:
+        if path is None:
+            path = Path.cwd() / DATA_DIR / CONTRACTS_FILE
+        self._log = logging.getLogger(__name__)
+        self._db = sqlite3.connect(str(path))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS contracts "
+            "(key TEXT PRIMARY KEY, expiration TEXT, contract BLOB)"
+        )
+        self._db.commit()
+        self._contracts = {}
+        self.evict()
+        self._contracts = {
+            key: pickle.loads(contract)
+            for key, contract in self._db.execute("SELECT key, contract FROM contracts")
+        }
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._contracts)
+
+    @staticmethod
+    def key(contract: Any) -> str:
+        return "|".join(
+            (
+                contract.secType,
+                contract.symbol,
+                contract.lastTradeDateOrContractMonth,
+                str(float(contract.strike)),
+                contract.right,
+                contract.exchange,
+                contract.currency,
+            )
+        )
+
+    def evict(self, today: datetime.date = None) -> None:
+        """Deletes the contracts expired before today"""
+        self._evicted = today if today else datetime.date.today()
+        today = format_ib_date(self._evicted)
+        cursor = self._db.execute(
+            "DELETE FROM contracts WHERE expiration != '' AND expiration < ?", (today,)
+        )
+        self._db.commit()
+        if cursor.rowcount:
+            self._log.debug(f"Evicted {cursor.rowcount} expired contracts")
+        self._contracts = {
+            k: c
+            for k, c in self._contracts.items()
+            if not c.lastTradeDateOrContractMonth
+            or c.lastTradeDateOrContractMonth >= today
+        }
+
+    def split(self, contracts: List[Any]) -> Tuple[List[Any], List[Any]]:
+        """Returns the cached qualified contracts and the unknown ones"""
+        if self._evicted != datetime.date.today():
+            self.evict()
+        cached = []
+        missing = []
+        for c in contracts:
+            qc = self._contracts.get(self.key(c))
+            if qc is None:
+                missing.append(c)
+            else:
+                cached.append(qc)
+        self.hits += len(cached)
+        self.misses += len(missing)
+        return cached, missing
+
+    def add(self, qualified: Dict[str, Any]) -> None:
+        """Stores the qualified contracts by the key of their request"""
+        if not qualified:
+            return
+        self._contracts.update(qualified)
+        self._db.executemany(
+            "INSERT OR REPLACE INTO contracts VALUES (?, ?, ?)",
+            [
+                (key, c.lastTradeDateOrContractMonth, pickle.dumps(c))
+                for key, c in qualified.items()
+            ],
+        )
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""Pairwise covariance and correlation of the returns of the universe"""
+from dataclasses import dataclass, field
+from typing import Sequence, Tuple
+import numpy as np
+from optopus.panel import PricePanel
+from optopus.settings import MARKET_BENCHMARK
+
+
+@dataclass(frozen=True)
+class CovarianceMatrix:
+    """Covariance and correlation of the daily returns of every pair of assets"""
+
+    codes: Tuple[str]
+    covariance: np.ndarray
+    correlation: np.ndarray
+    observations: int
+    _positions: dict = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_positions", {c: i for i, c in enumerate(self.codes)})
+
+    def index(self, code: str) -> int:
+        return self._positions[code]
+
+    def stdev(self) -> np.ndarray:
+        """Sample standard deviation of the returns of every asset"""
+        return np.sqrt(np.diag(self.covariance))
+
+    def beta(self, benchmark: str = MARKET_BENCHMARK) -> np.ndarray:
+        """Beta of every asset against the benchmark"""
+        b = self.index(benchmark)
+        return self.covariance[b, :] / self.covariance[b, b]
+
+    def submatrix(self, codes: Sequence[str]) -> np.ndarray:
+        """Correlations between the assets, in the order of the codes"""
+        i = [self.index(c) for c in codes]
+        return self.correlation[np.ix_(i, i)]
+
+    def average_correlation(self, codes: Sequence[str]) -> float:
+        """Mean correlation of the different pairs of the assets"""
+        codes = list(dict.fromkeys(codes))
+        n = len(codes)
+        if n < 2:
+            return np.nan
+        c = self.submatrix(codes)
+        return float((c.sum() - np.trace(c)) / (n * (n - 1)))
+
+
+def covariance_matrix(panel: PricePanel, returns: np.ndarray = None) -> CovarianceMatrix:
+    """Covariance and correlation with a single matrix product
+
+    returns are the daily returns to use, the complete returns of the
+    panel by default.
+    """
+    if returns is None:
+        returns = panel.complete_returns()
+    n = len(returns)
+    centered = returns - returns.mean(axis=0)
+    # one BLAS pass over the returns
+    covariance = (centered.T @ centered) / (n - 1) if n > 1 else np.full((len(panel.codes),) * 2, np.nan)
+    stdev = np.sqrt(np.diag(covariance))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        correlation = covariance / np.outer(stdev, stdev)
+    np.clip(correlation, -1.0, 1.0, out=correlation)
+    np.fill_diagonal(correlation, np.where(stdev > 0, 1.0, np.nan))
+    covariance.flags.writeable = False
+    correlation.flags.writeable = False
+    return CovarianceMatrix(panel.codes, covariance, correlation, n)
@@ -2,30 +2,133 @@
 import copy
 import datetime
 import logging
-from typing import Dict, Tuple
+from typing import Callable, Dict, Hashable, Iterator, List, NamedTuple, Tuple
 from optopus.asset import Asset, History, Measures, AssetType, Forecast
+from optopus.bar_store import BarStore
+from optopus.covariance import CovarianceMatrix
 from optopus.data_objects import Portfolio
+from optopus.indicators import IndicatorEngine, IndicatorRegistry
+from optopus.option_chain import OptionChain
+from optopus.option_parameters import OptionParameters
+from optopus.panel import PricePanel
+from optopus.measure_cache import MeasureCache
+from optopus.percentiles import HistoryPercentiles
+from optopus.rolling_moments import UniverseMoments
 from optopus.strategy import Strategy
+from optopus.vol_surface import VolatilitySurface
 from optopus.computation import (
-    assets_loop_computation,
-    assets_vector_computation,
+    assets_iv_computation,
+    assets_price_percentile,
+    assets_indicator_computation,
+    computable,
+    assets_panel,
+    calc_covariance,
+    assets_moments_computation,
     assets_directional_assumption,
     portfolio_bwd,
 )
 from optopus.strategy_repository import StrategyRepository
-from optopus.settings import CURRENCY, MARKET_BENCHMARK
+from optopus.utils import is_outdated
+from optopus.settings import (
+    COMPUTE_WORKERS,
+    CURRENCY,
+    DTE_MAX,
+    DTE_MIN,
+    HISTORICAL_YEARS,
+    MARKET_BENCHMARK,
+    STREAMING_MARKET_DATA,
+    VOLATILITY_SURFACE_TTL,
+)
+
+
+# Bar types kept in the bar store
+PRICE_BARS = "price"
+IV_BARS = "iv"
+HISTORY_ATTRIBUTES = {PRICE_BARS: "price_history", IV_BARS: "iv_history"}
+
+# Measures computed together, from the same inputs
+QUOTE_MEASURES = ("price_percentile",)
+IV_MEASURES = ("iv", "iv_rank", "iv_percentile", "iv_pct")
+# indicators of the default registry with a field in Measures
+INDICATOR_MEASURES = (
+    "price_pct",
+    "rsi",
+    "fast_sma",
+    "slow_sma",
+    "very_slow_sma",
+    "fast_sma_speed",
+    "fast_sma_speed_diff",
+)
+UNIVERSE_MEASURES = ("stdev", "beta", "correlation")
+MEASURE_NAMES = QUOTE_MEASURES + IV_MEASURES + UNIVERSE_MEASURES + INDICATOR_MEASURES
+
+
+class HistoryRequest(NamedTuple):
+    """Bars of an asset, from since or the whole HISTORICAL_YEARS span"""
+    asset: Asset
+    kind: str
+    since: datetime.date = None
 
 
 class DataAdapter:
-    pass
+    def get_histories(
+        self,
+        requests: List[HistoryRequest],
+        progress: Callable[[int, int], None] = None,
+    ) -> List[History]:
+        """Histories of the requests in the same order, None if failed
+
+        Requests one history at a time, adapters able to run concurrent
+        requests override it.
+        """
+        histories = []
+        for i, r in enumerate(requests):
+            get_history = self.get_price_history if r.kind == PRICE_BARS else self.get_iv_history
+            if r.since:
+                histories.append(get_history(r.asset, since=r.since))
+            else:
+                histories.append(get_history(r.asset))
+            if progress:
+                progress(i + 1, len(requests))
+        return histories
 
 
 class DataManager:
-    def __init__(self, data_adapter: DataAdapter, watch_list: Tuple) -> None:
+    def __init__(
+        self,
+        data_adapter: DataAdapter,
+        watch_list: Tuple,
+        streaming: bool = STREAMING_MARKET_DATA,
+        bar_store: BarStore = None,
+        compute_workers: int = COMPUTE_WORKERS,
+        indicators: IndicatorRegistry = None,
+    ) -> None:
         self._da = data_adapter
+        self._bar_store = bar_store
+        self._streaming = streaming
+        self._subscribed = False
         self._account = None
         self.portfolio = Portfolio()
         self._watch_list = watch_list
+        self._failed_assets = {}
+        self._pool = None
+        if compute_workers > 1:
+            # shared memory needs Python 3.8, imported only with workers
+            from optopus.parallel import ParallelIndicators
+
+            self._pool = ParallelIndicators(compute_workers)
+        self._indicators = IndicatorEngine(pool=self._pool, registry=indicators)
+        self._percentiles = HistoryPercentiles()
+        self._panel = None
+        self._panel_histories = ()
+        self._panel_version = 0
+        self._measure_cache = MeasureCache()
+        self._covariance = None
+        self._moments = UniverseMoments()
+        self._covariance_version = None
+        self._forecast_panel = None
+        self._registry_version = self._indicators.registry.version
+        self._surfaces: Dict[str, VolatilitySurface] = {}
         # self._assets = {code: Asset(code, asset_type, CURRENCY)
         #                for code, asset_type in watch_list.items()}
 
@@ -40,6 +143,10 @@ class DataManager:
     def assets(self):
         return self._assets
 
+    @property
+    def failed_assets(self) -> Dict[str, str]:
+        return self._failed_assets
+
     @property
     def strategies(self):
         return self._strategies
@@ -52,98 +159,309 @@ class DataManager:
     def account(self, values):
         self._account = values
 
+    def close(self) -> None:
+        """Stops the compute processes"""
+        if self._pool is not None:
+            self._pool.close()
+
     def update_account(self) -> None:
         self.account = self._da.get_account_values()
 
     def create_assets(self) -> None:
         """Retrieves the ids of the assets (contracts) from IB
         """
-        self._assets = self._da.create_assets(self._watch_list)
+        self._assets, self._failed_assets = self._da.create_assets(self._watch_list)
+        for code, reason in self._failed_assets.items():
+            self._log.warning(f"Asset {code} not created: {reason}")
 
     def update_assets(self) -> None:
         """Updates the current asset values.
+
+        In streaming mode the assets are subscribed after the first
+        snapshot and later calls only update the assets whose quotes
+        changed. Otherwise every asset is polled with a snapshot.
         """
-        current_values = self._da.update_assets(self.assets)
+        if self._streaming and self._subscribed:
+            current_values = self._da.pending_assets()
+        else:
+            current_values = self._da.update_assets(self.assets)
+            if self._streaming:
+                self._da.subscribe_assets(self.assets)
+                self._subscribed = True
         for code, current in current_values.items():
             self._assets[code].current = current
 
-    def update_historical_assets(self) -> None:
+    def update_histories(self, full: bool = False) -> None:
+        """Updates historical price and IV values of the assets
+
+        Only the bars after the last stored ones are requested, unless
+        full is True. Missing histories are requested before the stale
+        ones.
+        """
+        self._update_histories(
+            [(a, PRICE_BARS) for a in self._assets.values()]
+            + [(a, IV_BARS) for a in self._iv_assets()],
+            full,
+        )
+
+    def update_historical_assets(self, full: bool = False) -> None:
         """Updates historical assets values
         """
-        for a in self._assets.values():
-            if a.price_history:
-                delta = datetime.datetime.now() - a.price_history.created
-                if delta.days:
-                    a.price_history = self._da.get_price_history(a)
-            else:
-                a.price_history = self._da.get_price_history(a)
+        self._update_histories([(a, PRICE_BARS) for a in self._assets.values()], full)
 
-    def update_historical_IV_assets(self) -> None:
+    def update_historical_IV_assets(self, full: bool = False) -> None:
         """Updates historical IV asset values
         """
-        assets = [
+        self._update_histories([(a, IV_BARS) for a in self._iv_assets()], full)
+
+    def _iv_assets(self) -> List[Asset]:
+        return [
             a
             for a in self._assets.values()
             if a.id.asset_type in (AssetType.Stock, AssetType.ETF)
         ]
 
-        for a in assets:
-            if a.iv_history:
-                delta = datetime.datetime.now() - a.iv_history.created
-                if delta.days:
-                    a.iv_history = self._da.get_iv_history(a)
+    def _update_histories(self, items: List[Tuple[Asset, str]], full: bool) -> None:
+        start = datetime.date.today() - datetime.timedelta(days=365 * HISTORICAL_YEARS)
+        requests = []
+        for asset, kind in items:
+            attribute = HISTORY_ATTRIBUTES[kind]
+            history = getattr(asset, attribute)
+            if not history and not full and self._bar_store:
+                history = self._bar_store.load(asset.id.code, kind, start)
+                setattr(asset, attribute, history)
+            if full or not history or not len(history.records):
+                requests.append(HistoryRequest(asset, kind))
+            elif is_outdated(history.last_time, fetched=history.created):
+                last_time = history.last_time
+                if isinstance(last_time, datetime.datetime):
+                    last_time = last_time.date()
+                requests.append(HistoryRequest(asset, kind, last_time))
+
+        if not requests:
+            return
+        self._log.info(f"Requesting {len(requests)} histories")
+        histories = self._da.get_histories(requests, self._history_progress)
+
+        for r, h in zip(requests, histories):
+            if h is None:
+                self._log.warning(f"No {r.kind} history for {r.asset.id.code}")
+                continue
+            code = r.asset.id.code
+            attribute = HISTORY_ATTRIBUTES[r.kind]
+            if r.since:
+                if self._bar_store:
+                    self._bar_store.append(code, r.kind, h.values)
+                setattr(r.asset, attribute, getattr(r.asset, attribute).append(h.values))
+            elif not len(h.records):
+                # IB answers a failed request with no bars
+                self._log.warning(f"Empty {r.kind} history for {code}, the stored bars are kept")
             else:
-                a.iv_history = self._da.get_iv_history(a)
+                if self._bar_store:
+                    self._bar_store.write(code, r.kind, h.values)
+                setattr(r.asset, attribute, h)
+
+    def _history_progress(self, done: int, total: int) -> None:
+        self._log.debug(f"Histories received {done}/{total}")
+        if done == total:
+            self._log.info(f"Histories received {done}/{total}")
 
-    def compute(self) -> None:
+    def compute(self, full: bool = False) -> None:
         """Computes some asset measures
+
+        A measure is computed again only when its inputs changed, the
+        price percentile with the quotes and the rest with the histories.
+        full recomputes every measure from the whole history.
         """
-        measure_assets = {}
-        measure_names = ('price_percentile', 'price_pct', 'iv', 'iv_rank', 'iv_percentile',
-        'iv_pct', 'stdev', 'beta', 'correlation', 'rsi', 'sma20', 'sma50', 'sma200')
-        for a in self._assets.values():
-            m = {}
-            for n in measure_names:    
-                m[n] = None
-            measure_assets[a.id.code] = m
-        
-        loop_m = assets_loop_computation(self._assets, measure_assets)
-        vector_m = assets_vector_computation(self._assets, measure_assets)
-        #)
+        cache = self._measure_cache
+        if full:
+            cache.clear()
+            self._moments = UniverseMoments()
+        computable_assets = computable(self._assets)
+        self._percentiles.update(computable_assets)
+        panel = self.price_panel()
+        percentiles = self._percentiles
+        groups = (
+            (
+                QUOTE_MEASURES,
+                computable_assets,
+                lambda a: (a.version("price_history"), a.version("current")),
+                lambda assets, m: assets_price_percentile(assets, m, percentiles),
+            ),
+            (
+                IV_MEASURES,
+                computable_assets,
+                lambda a: (a.version("price_history"), a.version("iv_history")),
+                lambda assets, m: assets_iv_computation(assets, m, percentiles),
+            ),
+            (
+                self._indicators.registry.measures(),
+                self._assets,
+                lambda a: a.version("price_history"),
+                lambda assets, m: assets_indicator_computation(assets, m, self._indicators, full),
+            ),
+        )
+
+        changed = set()
+        for names, assets, key, compute_group in groups:
+            keys = {code: key(a) for code, a in assets.items()}
+            stale = cache.missing(names, keys)
+            if stale:
+                self._compute_group(names, {c: assets[c] for c in stale}, keys, compute_group)
+                changed.update(stale)
+
+        # beta, correlation and stdev depend on the whole universe
+        keys = {code: self._panel_version for code in computable_assets}
+        if cache.missing(UNIVERSE_MEASURES, keys):
+            self._compute_group(
+                UNIVERSE_MEASURES,
+                computable_assets,
+                keys,
+                lambda assets, m: assets_moments_computation(assets, m, panel, self._moments),
+            )
+            changed.update(computable_assets)
+
+        # the custom indicators of the measures changed with the registry
+        registry = self._indicators.registry
+        if registry.version != self._registry_version:
+            changed.update(self._assets)
+            self._registry_version = registry.version
+        custom = [n for n in registry.measures() if n not in MEASURE_NAMES]
+        for code in changed:
+            m = {n: cache.get(n, code) for n in MEASURE_NAMES}
+            self._assets[code].measures = Measures(**m, indicators={n: cache.get(n, code) for n in custom})
         # self.portfolio.bwd = portfolio_bwd(self.strategies,
         #                                   self._assets,
         #                                   self._assets[MARKET_BENCHMARK].current.market_price)
 
-        for a in self._assets.values():
-            a.measures = Measures(
-                price_percentile=loop_m[a.id.code]["price_percentile"],
-                price_pct=vector_m[a.id.code]["price_pct"],
-                iv=loop_m[a.id.code]["iv"],
-                iv_rank=loop_m[a.id.code]["iv_rank"],
-                iv_percentile=loop_m[a.id.code]["iv_percentile"],
-                iv_pct=loop_m[a.id.code]["iv_pct"],
-                stdev=vector_m[a.id.code]["stdev"],
-                beta=vector_m[a.id.code]["beta"],
-                correlation=vector_m[a.id.code]["correlation"],
-                rsi=vector_m[a.id.code]["rsi"],
-                fast_sma=vector_m[a.id.code]["fast_sma"],
-                slow_sma=vector_m[a.id.code]["slow_sma"],
-                very_slow_sma=vector_m[a.id.code]["very_slow_sma"],
-                fast_sma_speed=vector_m[a.id.code]["fast_sma_speed"],
-                fast_sma_speed_diff=vector_m[a.id.code]["fast_sma_speed_diff"]
-            )
-
-        directional_m = assets_directional_assumption(self._assets)
-        for code, v in directional_m.items():
-            self._assets[code].forecast = Forecast(v)
+        # the forecasts change only with the price histories
+        panel = self.price_panel()
+        if full or panel is not self._forecast_panel:
+            directional_m = assets_directional_assumption(self._assets, self._indicators)
+            for code, v in directional_m.items():
+                self._assets[code].forecast = Forecast(v)
+            self._forecast_panel = panel
 
     
 
-    def option_chain(self, code: str, expiration: datetime.date) -> None:
-        """Update option chain values
+    def _compute_group(
+        self,
+        names: Tuple[str],
+        assets: Dict[str, Asset],
+        keys: Dict[str, Hashable],
+        compute_group: Callable[[Dict[str, Asset], Dict[str, Dict]], Dict[str, Dict]],
+    ) -> None:
+        measures = compute_group(assets, {code: dict.fromkeys(names) for code in assets})
+        for code in assets:
+            for n in names:
+                self._measure_cache.put(n, code, keys[code], measures[code][n])
+
+    @property
+    def indicator_timings(self) -> Dict[str, float]:
+        """Seconds spent computing every indicator"""
+        return dict(self._indicators.timings)
+
+    @property
+    def measure_stats(self) -> Dict[str, Tuple[int, int]]:
+        """Hits and misses of the measure cache per measure"""
+        return self._measure_cache.stats()
+
+    def covariance(self) -> CovarianceMatrix:
+        """Covariance and correlation of the returns of every pair of stocks and ETFs
+
+        The matrix is computed again only when the price panel changed.
+        """
+        panel = self.price_panel()
+        if self._covariance is None or self._covariance_version != self._panel_version:
+            codes = list(computable(self._assets))
+            self._covariance = calc_covariance(panel.select(codes))
+            self._covariance_version = self._panel_version
+        return self._covariance
+
+    def price_panel(self) -> PricePanel:
+        """Close prices of every asset aligned by date
+
+        The panel is built again only when a price history changed.
+        """
+        histories = tuple(a.price_history for a in self._assets.values())
+        if (
+            self._panel is None
+            or len(histories) != len(self._panel_histories)
+            or any(h is not p for h, p in zip(histories, self._panel_histories))
+        ):
+            self._panel = assets_panel(self._assets)
+            self._panel_histories = histories
+            self._panel_version += 1
+        return self._panel
+
+    def option_chain(self, code: str, expiration: datetime.date) -> OptionChain:
+        """Option chain values, the volatility surface is updated with them
+
+        The expiration chosen by the data adapter is the chain expiration
+        when expiration is None. An empty chain only records the update
+        time, so it isn't requested again before the surface ttl.
         """
         a = self._assets[code]
-        return self._da.get_optionchain(a, expiration)
+        options = self._da.get_optionchain(a, expiration)
+        expiration = options.expiration or expiration
+        if len(options):
+            self._surface(code).update(expiration, options, self._underlying_price(a))
+        elif expiration:
+            self._surface(code).touch(expiration)
+        return options
+
+    def option_parameters(self, code: str) -> OptionParameters:
+        """Expirations and strikes of the asset options
+        """
+        a = self._assets[code]
+        return self._da.get_option_parameters(a)
+
+    def stream_option_chain(self, code: str, expiration: datetime.date) -> Iterator[OptionChain]:
+        """Yields the option chain values as they arrive
+        """
+        a = self._assets[code]
+        surface = self._surface(code)
+        replace = True
+        for options in self._da.stream_optionchain(a, expiration):
+            if len(options):
+                surface.update(options.expiration, options, self._underlying_price(a), replace=replace)
+                replace = False
+            yield options
+
+    def volatility_surface(
+        self,
+        code: str,
+        expirations: Tuple[datetime.date] = None,
+        ttl: float = VOLATILITY_SURFACE_TTL,
+    ) -> VolatilitySurface:
+        """Implied volatility surface of the asset options
+
+        Only the chains of the expirations updated more than ttl seconds
+        ago are requested. The expirations are those between DTE_MIN and
+        DTE_MAX days by default.
+        """
+        if expirations is None:
+            today = datetime.date.today()
+            parameters = self.option_parameters(code)
+            expirations = tuple(
+                e for e in (parameters.expirations if parameters else ())
+                if DTE_MIN <= (e - today).days <= DTE_MAX
+            )
+        surface = self._surface(code)
+        for expiration in expirations:
+            if surface.is_stale(expiration, ttl):
+                self.option_chain(code, expiration)
+        return surface
+
+    def _surface(self, code: str) -> VolatilitySurface:
+        surface = self._surfaces.get(code)
+        if surface is None:
+            surface = self._surfaces[code] = VolatilitySurface(code)
+        return surface
+
+    @staticmethod
+    def _underlying_price(a: Asset) -> float:
+        return a.current.market_price if a.current else None
 
     def update_strategy_options(self) -> None:
         for strategy_key, strategy in self._strategies.items():
@@ -6,8 +6,9 @@ Created on Sun Aug  5 07:21:38 2018
 @author: ilia
 """
 import datetime
+from functools import partial
 import logging
-from typing import List, Dict, Tuple
+from typing import Callable, List, Dict, Iterator, Tuple
 from pathlib import Path
 
 from ib_insync.ib import IB, Contract
@@ -17,19 +18,33 @@ from ib_insync.objects import (
     Position as IBPosition,
     Fill,
     CommissionReport,
-    ComboLeg,
 )
+try:
+    from ib_insync.objects import ComboLeg
+except ImportError:
+    # Moved to ib_insync.contract in later versions
+    from ib_insync.contract import ComboLeg
 from ib_insync.order import Trade as IBTrade, LimitOrder, StopOrder
+from ib_insync.ticker import Ticker
 from optopus.asset import AssetId, Asset, Current, History, Bar, Stock, ETF, Index
 from optopus.common import AssetType, AssetDefinition, Currency
 from optopus.data_objects import Position, OwnershipType, Account, OrderStatus, Trade
 from optopus.option import Option, OptionId, RightType
+from optopus.option_chain import OptionChain
+from optopus.option_parameters import OptionParameters, OptionParametersCache
 from optopus.strategy import StrategyType, Strategy
-from optopus.data_manager import DataAdapter
+from optopus.contract_cache import ContractCache
+from optopus.data_manager import DataAdapter, HistoryRequest, PRICE_BARS, IV_BARS
+from optopus.ib_pipeline import ContractPipeline
+from optopus.pricing import fill_missing_greeks
+from optopus.pacing import HistoricalJob, HistoricalScheduler
 from optopus.settings import CURRENCY, HISTORICAL_YEARS, DTE_MAX, DTE_MIN, EXPIRATIONS
 from optopus.utils import parse_ib_date, format_ib_date
 
 
+HISTORY_WHAT_TO_SHOW = {PRICE_BARS: "TRADES", IV_BARS: "OPTION_IMPLIED_VOLATILITY"}
+
+
 class IBBrokerAdapter:
     """Class implementing the Interactive Brokers interface"""
 
@@ -273,11 +288,23 @@ class IBTranslator:
 
 
 class IBDataAdapter(DataAdapter):
-    def __init__(self, broker: IB, translator: IBTranslator) -> None:
+    def __init__(
+        self, broker: IB, translator: IBTranslator, contract_cache: ContractCache = None
+    ) -> None:
         self._broker = broker
         self._translator = translator
+        self._contract_cache = contract_cache if contract_cache else ContractCache()
+        self._pipeline = ContractPipeline(self._broker, cache=self._contract_cache)
+        self._option_parameters = OptionParametersCache()
+        self._scheduler = HistoricalScheduler()
+        self._subscribed = set()
+        self._pending_tickers = {}
         self._log = logging.getLogger(__name__)
 
+    @property
+    def contract_cache(self) -> ContractCache:
+        return self._contract_cache
+
     def get_account_values(self):
         values = self._broker.accountValues()
         account = self._translator.translate_account(values)
@@ -291,114 +318,236 @@ class IBDataAdapter(DataAdapter):
             positions_data[pd.position_id] = pd
         return positions_data
 
-    def create_assets(self, watchlist: Tuple[AssetDefinition]) -> List[Asset]:
+    def create_assets(
+        self, watchlist: Tuple[AssetDefinition]
+    ) -> Tuple[Dict[str, Asset], Dict[str, str]]:
+        """Creates the assets of the watch list
+
+        Returns the created assets and the reason of failure of every
+        asset that couldn't be created
+        """
         watchlist_dict = {i.code: i for i in watchlist}
         contracts = []
+        failures = {}
         for item in watchlist:
             if item.asset_type == AssetType.Stock or item.asset_type == AssetType.ETF:
                 contracts.append(
                     IBStock(item.code, exchange="SMART", currency=item.currency.value)
                 )
-            if item.asset_type == AssetType.Index:
+            elif item.asset_type == AssetType.Index:
                 contracts.append(
                     IBIndex(item.code, exchange=item.exchange)
                 )
-        # TODO: Remove the limit
-        # It works if len(contracts) < 50. IB limit.
-        q_contracts = self._broker.qualifyContracts(*contracts)
-        if len(q_contracts) == len(watchlist):
-            assets = {}
-            for qc in q_contracts:
-                id = AssetId(
-                        code=qc.symbol,
-                        asset_type=watchlist_dict[qc.symbol].asset_type,
-                        currency=self._translator._currency_translation[qc.currency],
-                        contract=qc,
-                    )
-                if id.asset_type == AssetType.Stock:
-                    assets[id.code] = Stock(id)
-                elif id.asset_type == AssetType.ETF:
-                    assets[id.code] = ETF(id)
-                elif id.asset_type == AssetType.Index:
-                    assets[id.code] = Index(id)
-
+            else:
+                failures[item.code] = f"Unsupported asset type {item.asset_type.value}"
 
-        else:
-            raise ValueError("Error: ambiguous contracts")
+        # Chunked and rate limited, IB accepts 50 messages per second
+        q_contracts, failed = self._broker.run(
+            self._pipeline.qualify_with_failures(contracts)
+        )
+        for c, reason in failed:
+            failures[c.symbol] = reason
+
+        assets = {}
+        for qc in q_contracts:
+            currency = self._translator._currency_translation.get(qc.currency)
+            if currency is None:
+                failures[qc.symbol] = f"Unsupported currency {qc.currency}"
+                continue
+            id = AssetId(
+                    code=qc.symbol,
+                    asset_type=watchlist_dict[qc.symbol].asset_type,
+                    currency=currency,
+                    contract=qc,
+                )
+            if id.asset_type == AssetType.Stock:
+                assets[id.code] = Stock(id)
+            elif id.asset_type == AssetType.ETF:
+                assets[id.code] = ETF(id)
+            elif id.asset_type == AssetType.Index:
+                assets[id.code] = Index(id)
 
-        return assets
+        return assets, failures
 
     def update_assets(self, assets: Dict[str, Asset]) -> Dict[str, Current]:
+        """Snapshot of the current values of every asset"""
         contracts = [a.id.contract for a in assets.values()]
-        tickers = self._broker.reqTickers(*contracts)
-        current_values = {}
-        for t in tickers:
-            c = Current(
-                high=t.high,
-                low=t.low,
-                close=t.close,
-                bid=t.bid,
-                bid_size=t.bidSize,
-                ask=t.ask,
-                ask_size=t.askSize,
-                last=t.last,
-                last_size=t.lastSize,
-                volume=t.volume,
-                time=t.time,
-            )
-            current_values[t.contract.symbol] = c
+        tickers = self._broker.run(self._pipeline.tickers(contracts))
+        return {t.contract.symbol: self._create_current(t) for t in tickers}
+
+    def subscribe_assets(self, assets: Dict[str, Asset]) -> None:
+        """Streams the market data of the assets
+
+        Every asset takes a market data line, the number of lines is
+        limited by the IB account.
+        """
+        contracts = [a.id.contract for a in assets.values()]
+        self._broker.pendingTickersEvent += self._onPendingTickers
+        self._broker.run(self._pipeline.subscribe(contracts))
+        self._subscribed.update(c.conId for c in contracts)
+
+    def unsubscribe_assets(self) -> None:
+        for t in self._broker.tickers():
+            if t.contract.conId in self._subscribed:
+                self._broker.cancelMktData(t.contract)
+        self._broker.pendingTickersEvent -= self._onPendingTickers
+        self._subscribed.clear()
+        self._pending_tickers.clear()
+
+    def pending_assets(self) -> Dict[str, Current]:
+        """Current values of the streamed assets that changed since the
+        last call"""
+        current_values = {
+            code: self._create_current(t) for code, t in self._pending_tickers.items()
+        }
+        self._pending_tickers.clear()
         return current_values
 
-    def get_price_history(self, a: Asset) -> None:
-        bars = self._broker.reqHistoricalData(
-            a.id.contract,
-            endDateTime="",
-            durationStr=str(HISTORICAL_YEARS) + " Y",
-            barSizeSetting="1 day",
-            whatToShow="TRADES",
-            useRTH=True,
-            formatDate=1,
+    def _onPendingTickers(self, tickers: List[Ticker]) -> None:
+        for t in tickers:
+            if t.contract.conId in self._subscribed:
+                self._pending_tickers[t.contract.symbol] = t
+
+    def _create_current(self, t: Ticker) -> Current:
+        return Current(
+            high=t.high,
+            low=t.low,
+            close=t.close,
+            bid=t.bid,
+            bid_size=t.bidSize,
+            ask=t.ask,
+            ask_size=t.askSize,
+            last=t.last,
+            last_size=t.lastSize,
+            volume=t.volume,
+            time=t.time,
         )
-        return History(self._translator.translate_bars(a.id.code, bars))
 
-    def get_iv_history(self, a: Asset) -> None:
-        bars = self._broker.reqHistoricalData(
+    def get_price_history(self, a: Asset, since: datetime.date = None) -> History:
+        """Daily price bars, from `since` when given"""
+        return self.get_histories([HistoryRequest(a, PRICE_BARS, since)])[0]
+
+    def get_iv_history(self, a: Asset, since: datetime.date = None) -> History:
+        """Daily implied volatility bars, from `since` when given"""
+        return self.get_histories([HistoryRequest(a, IV_BARS, since)])[0]
+
+    def get_histories(
+        self,
+        requests: List[HistoryRequest],
+        progress: Callable[[int, int], None] = None,
+    ) -> List[History]:
+        """Runs the requests concurrently under the IB pacing rules
+
+        Requests for whole histories are sent before the ones for the
+        missing bars of stale histories.
+        """
+        jobs = []
+        for r in requests:
+            what = HISTORY_WHAT_TO_SHOW[r.kind]
+            duration = history_duration(r.since)
+            jobs.append(
+                HistoricalJob(
+                    priority=0 if r.since is None else 1,
+                    request=(r.asset.id.contract.conId, what, duration),
+                    contract=(r.asset.id.contract.conId, what),
+                    run=partial(self._history, r.asset, what, duration),
+                )
+            )
+        return self._broker.run(self._scheduler.run(jobs, progress))
+
+    async def _history(self, a: Asset, what: str, duration: str) -> History:
+        bars = await self._broker.reqHistoricalDataAsync(
             a.id.contract,
             endDateTime="",
-            durationStr=str(HISTORICAL_YEARS) + " Y",
+            durationStr=duration,
             barSizeSetting="1 day",
-            whatToShow="OPTION_IMPLIED_VOLATILITY",
+            whatToShow=what,
             useRTH=True,
             formatDate=1,
         )
         return History(self._translator.translate_bars(a.id.code, bars))
 
-    def get_optionchain(self, asset: Asset, expiration: datetime.date) -> List[Option]:
-        chains = self._broker.reqSecDefOptParams(
-            asset.id.contract.symbol,
-            "",
-            asset.id.contract.secType,
-            asset.id.contract.conId,
-        )
+    def get_optionchain(self, asset: Asset, expiration: datetime.date) -> OptionChain:
+        # Batches arrive in any order, the merged chain keeps the strikes sorted
+        chain = OptionChain.from_options((), asset.id, expiration)
+        for batch in self.stream_optionchain(asset, expiration):
+            chain = chain.merge(batch)
+        return chain
+
+    def stream_optionchain(
+        self, asset: Asset, expiration: datetime.date
+    ) -> Iterator[OptionChain]:
+        """Yields the options of the chain as every batch of tickers arrives
+
+        Every contract is qualified and its ticker requested only once.
+        The requests only progress while the next batch is awaited, the
+        IB loop is idle while the caller handles the yielded one. A
+        caller stopping early cancels the requests still pending.
+        """
+        contracts = self._option_contracts(asset, expiration)
+        if not contracts:
+            return
+        # Qualification and ticker requests are pipelined under the
+        # IB limit of 50 messages per second
+        batches = self._pipeline.stream(contracts)
+        try:
+            while True:
+                try:
+                    _, tickers = self._broker.run(batches.__anext__())
+                except StopAsyncIteration:
+                    break
+                yield self.create_options(asset, tickers)
+        finally:
+            self._broker.run(batches.aclose())
+
+    def get_option_parameters(self, asset: Asset) -> OptionParameters:
+        """Expirations and strikes of the asset options
+
+        The parameters are retrieved once a day per underlying.
+        """
+        parameters = self._option_parameters.get(asset.id.code)
+        if parameters is None:
+            chains = self._broker.run(
+                self._pipeline.sec_def_opt_params(asset.id.contract)
+            )
+            chain = next(
+                (
+                    c
+                    for c in chains
+                    if c.tradingClass == asset.id.contract.symbol and c.exchange == "SMART"
+                ),
+                None,
+            )
+            if chain is None:
+                return None
+            parameters = OptionParameters(
+                code=asset.id.code,
+                exchange=chain.exchange,
+                trading_class=chain.tradingClass,
+                multiplier=chain.multiplier,
+                expirations=tuple(sorted(parse_ib_date(e) for e in chain.expirations)),
+                strikes=tuple(sorted(chain.strikes)),
+                created=self._option_parameters.today,
+            )
+            self._option_parameters.add(parameters)
+        return parameters
 
-        chain = next(
-            c
-            for c in chains
-            if c.tradingClass == asset.id.contract.symbol and c.exchange == "SMART"
-        )
+    def _option_contracts(
+        self, asset: Asset, expiration: datetime.date
+    ) -> List[Contract]:
+        parameters = self.get_option_parameters(asset)
 
-        self._log.debug(f"Total chain elements {len(chain)}")
-        if chain:
+        contracts = []
+        if parameters and expiration is None:
+            expiration = default_expiration(parameters.expirations)
+        if parameters and expiration:
+            self._log.debug(f"Total chain strikes {len(parameters.strikes)}")
             underlying_price = asset.current.market_price
             # width = (a.current.stdev * 2) * underlying_price
             width = underlying_price * 0.1
             min_strike_price = underlying_price - width
             max_strike_price = underlying_price + width
-            strikes = sorted(
-                strike
-                for strike in chain.strikes
-                if min_strike_price < strike < max_strike_price
-            )
+            strikes = parameters.strikes_between(min_strike_price, max_strike_price)
             rights = ["P", "C"]
 
             # Create the options contracts
@@ -414,89 +563,83 @@ class IBDataAdapter(DataAdapter):
                 # for expiration in expirations
                 for strike in strikes
             ]
-            q_contracts = []
-            # IB has a limit of 50 requests per second
-            for c in chunks(contracts, 50):
-                q_contracts += self._broker.qualifyContracts(*c)
-                self._broker.sleep(1)
-
-            tickers = []
-            # print("Contracts: {} Unqualified: {}".
-            #      format(len(contracts), len(contracts) - len(q_contracts)))
-
-            for q in chunks(q_contracts, 50):
-                tickers += self._broker.reqTickers(*q)
-                self._broker.sleep(1)
-
-            return self.create_options(asset, q_contracts)
-
-    def create_options(
-        self, asset: Asset, q_contracts: List[Contract]
-    ) -> Dict[str, Option]:
-        tickers = []
-        for q in chunks(q_contracts, 50):
-            tickers += self._broker.reqTickers(*q)
-            self._broker.sleep(1)
-        # options = []
-        options = {}
-        for t in tickers:
-            expiration = parse_ib_date(t.contract.lastTradeDateOrContractMonth)
-            strike = float(t.contract.strike)
-            right = RightType.Call if t.contract.right == "C" else RightType.Put
-            delta = gamma = theta = vega = None
-            option_price = (
-                implied_volatility
-            ) = underlying_price = underlying_dividends = None
-
-            if t.modelGreeks:
-                delta = t.modelGreeks.delta
-                gamma = t.modelGreeks.gamma
-                theta = t.modelGreeks.theta
-                vega = t.modelGreeks.vega
-                option_price = t.modelGreeks.optPrice
-                implied_volatility = t.modelGreeks.impliedVol
-                underlying_price = t.modelGreeks.undPrice
-                underlying_dividends = t.modelGreeks.pvDividend
-            opt_id = OptionId(
-                underlying_id=asset.id,
-                asset_type=AssetType.Option,
-                expiration=expiration,
-                strike=strike,
-                right=right,
-                multiplier=t.contract.multiplier,
-                contract=t.contract,
-            )
-            opt = Option(
-                id=opt_id,
-                high=t.high,
-                low=t.low,
-                close=t.close,
-                bid=t.bid if not t.bid == -1 else None,
-                bid_size=t.bidSize,
-                ask=t.ask if not t.ask == -1 else None,
-                ask_size=t.askSize,
-                last=t.last,
-                last_size=t.lastSize,
-                option_price=option_price,
-                volume=t.volume,
-                delta=delta,
-                gamma=gamma,
-                theta=theta,
-                vega=vega,
-                iv=implied_volatility,
-                underlying_price=underlying_price,
-                underlying_dividends=underlying_dividends,
-                time=t.time,
-            )
+        return contracts
+
+    def create_options(self, asset: Asset, tickers: List[Ticker]) -> OptionChain:
+        """Options of the tickers, the missing model Greeks are computed locally
+        """
+        chain = OptionChain.from_options(self._create_option(asset, t) for t in tickers)
+        underlying_price = asset.current.market_price if asset.current else None
+        return fill_missing_greeks(chain, underlying_price)
+
+    def _create_option(self, asset: Asset, t: Ticker) -> Option:
+        expiration = parse_ib_date(t.contract.lastTradeDateOrContractMonth)
+        strike = float(t.contract.strike)
+        right = RightType.Call if t.contract.right == "C" else RightType.Put
+        delta = gamma = theta = vega = None
+        option_price = (
+            implied_volatility
+        ) = underlying_price = underlying_dividends = None
+
+        if t.modelGreeks:
+            delta = t.modelGreeks.delta
+            gamma = t.modelGreeks.gamma
+            theta = t.modelGreeks.theta
+            vega = t.modelGreeks.vega
+            option_price = t.modelGreeks.optPrice
+            implied_volatility = t.modelGreeks.impliedVol
+            underlying_price = t.modelGreeks.undPrice
+            underlying_dividends = t.modelGreeks.pvDividend
+        opt_id = OptionId(
+            underlying_id=asset.id,
+            asset_type=AssetType.Option,
+            expiration=expiration,
+            strike=strike,
+            right=right,
+            multiplier=t.contract.multiplier,
+            contract=t.contract,
+        )
+        return Option(
+            id=opt_id,
+            high=t.high,
+            low=t.low,
+            close=t.close,
+            bid=t.bid if not t.bid == -1 else None,
+            bid_size=t.bidSize,
+            ask=t.ask if not t.ask == -1 else None,
+            ask_size=t.askSize,
+            last=t.last,
+            last_size=t.lastSize,
+            option_price=option_price,
+            volume=t.volume,
+            delta=delta,
+            gamma=gamma,
+            theta=theta,
+            vega=vega,
+            iv=implied_volatility,
+            underlying_price=underlying_price,
+            underlying_dividends=underlying_dividends,
+            time=t.time,
+        )
+
 
-            # options.append(opt)
-            options[f"{strike}{right.value}"] = opt
-        return options
+def default_expiration(
+    expirations: Tuple[datetime.date], today: datetime.date = None
+) -> datetime.date:
+    """First expiration at least DTE_MIN days away, None if there isn't one"""
+    today = today if today else datetime.date.today()
+    future = [e for e in expirations if (e - today).days >= DTE_MIN]
+    return future[0] if future else None
 
 
-def chunks(l: list, n: int) -> list:
-    # For item i in a range that is a lenght of l
-    for i in range(0, len(l), n):
-        # Create an index range for l of n items:
-        yield l[i : i + n]
+def history_duration(since: datetime.date = None) -> str:
+    """IB duration string covering from since to today
 
+    Without since the duration is HISTORICAL_YEARS
+    """
+    if since is None:
+        return str(HISTORICAL_YEARS) + " Y"
+    days = (datetime.date.today() - since).days + 1
+    if days > 365:
+        return str(days // 365 + 1) + " Y"
+    return str(days) + " D"
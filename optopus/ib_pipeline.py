@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""Pipelined contract qualification and market data requests"""
+import asyncio
+from typing import Any, AsyncIterator, List, Tuple
+from optopus.contract_cache import ContractCache
+from optopus.pacing import RateLimiter
+
+# Contracts sent to IB in a single qualification or ticker request
+CHUNK_SIZE = 50
+
+
+class ContractPipeline:
+    """Sends contract requests to IB overlapping qualification and tickers
+
+    The contracts are split in chunks. Every chunk is qualified and its
+    tickers requested as soon as it's ready, while the next chunks are
+    still being qualified. A single rate limiter shared by all the
+    requests keeps the traffic under the IB message limit.
+
+    Contracts found in the contract cache skip the qualification.
+    """
+
+    def __init__(self, broker: Any, limiter: RateLimiter = None,
+                 chunk_size: int = CHUNK_SIZE, cache: ContractCache = None) -> None:
+        self._broker = broker
+        self._limiter = limiter if limiter else RateLimiter()
+        self._chunk_size = min(chunk_size, self._limiter.max_requests)
+        self._cache = cache
+
+    @property
+    def limiter(self) -> RateLimiter:
+        return self._limiter
+
+    @property
+    def cache(self) -> ContractCache:
+        return self._cache
+
+    async def sec_def_opt_params(self, contract: Any) -> List[Any]:
+        await self._limiter.acquire()
+        return await self._broker.reqSecDefOptParamsAsync(
+            contract.symbol, "", contract.secType, contract.conId
+        )
+
+    async def qualify(self, contracts: List[Any]) -> List[Any]:
+        q_contracts, _ = await self.qualify_with_failures(contracts)
+        return q_contracts
+
+    async def qualify_with_failures(self, contracts: List[Any]) -> Tuple[List[Any], List[Tuple[Any, str]]]:
+        """Qualifies the contracts without aborting on failed chunks
+
+        Returns the qualified contracts and every failed contract with
+        the reason of the failure
+        """
+        cached, missing = self._split(contracts)
+        missing_chunks = list(chunks(missing, self._chunk_size))
+        batches = await asyncio.gather(
+            *[self._qualify_chunk(c) for c in missing_chunks], return_exceptions=True
+        )
+        q_contracts = list(cached)
+        failures = []
+        for chunk, batch in zip(missing_chunks, batches):
+            if isinstance(batch, Exception):
+                reason = str(batch) or batch.__class__.__name__
+                failures += [(c, reason) for c in chunk]
+            else:
+                qualified = {id(c) for c in batch}
+                q_contracts += batch
+                failures += [
+                    (c, "Unknown or ambiguous contract")
+                    for c in chunk
+                    if id(c) not in qualified
+                ]
+        return q_contracts, failures
+
+    async def tickers(self, contracts: List[Any]) -> List[Any]:
+        batches = await asyncio.gather(
+            *[self._tickers_chunk(c) for c in chunks(contracts, self._chunk_size)]
+        )
+        return [t for batch in batches for t in batch]
+
+    async def qualify_and_tickers(self, contracts: List[Any]) -> Tuple[List[Any], List[Any]]:
+        """Qualifies the contracts and requests their tickers
+
+        Returns the qualified contracts and their tickers
+        """
+        batches = await asyncio.gather(*self._chunk_requests(contracts))
+        q_contracts = [c for q_batch, _ in batches for c in q_batch]
+        tickers = [t for _, t_batch in batches for t in t_batch]
+        return q_contracts, tickers
+
+    async def subscribe(self, contracts: List[Any]) -> None:
+        """Requests streaming market data for the contracts"""
+        for chunk in chunks(contracts, self._chunk_size):
+            await self._limiter.acquire(len(chunk))
+            for c in chunk:
+                self._broker.reqMktData(c)
+
+    async def stream(self, contracts: List[Any]) -> AsyncIterator[Tuple[List[Any], List[Any]]]:
+        """Yields the qualified contracts and tickers of every chunk
+
+        The chunks are yielded as soon as their tickers arrive, not in
+        the order of the contracts.
+        """
+        pending = [asyncio.ensure_future(r) for r in self._chunk_requests(contracts)]
+        try:
+            for done in asyncio.as_completed(pending):
+                yield await done
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _split(self, contracts: List[Any]) -> Tuple[List[Any], List[Any]]:
+        if self._cache is None:
+            return [], contracts
+        return self._cache.split(contracts)
+
+    def _chunk_requests(self, contracts: List[Any]) -> list:
+        cached, missing = self._split(contracts)
+        return [
+            self._cached_tickers_chunk(c) for c in chunks(cached, self._chunk_size)
+        ] + [
+            self._qualify_and_tickers_chunk(c) for c in chunks(missing, self._chunk_size)
+        ]
+
+    async def _qualify_chunk(self, contracts: List[Any]) -> List[Any]:
+        # qualification fills the contracts, keep the keys they were requested by
+        if self._cache is not None:
+            keys = {id(c): ContractCache.key(c) for c in contracts}
+        await self._limiter.acquire(len(contracts))
+        q_contracts = await self._broker.qualifyContractsAsync(*contracts)
+        if self._cache is not None:
+            self._cache.add({keys[id(c)]: c for c in q_contracts})
+        return q_contracts
+
+    async def _cached_tickers_chunk(self, contracts: List[Any]) -> Tuple[List[Any], List[Any]]:
+        return contracts, await self._tickers_chunk(contracts)
+
+    async def _tickers_chunk(self, contracts: List[Any]) -> List[Any]:
+        if not contracts:
+            return []
+        await self._limiter.acquire(len(contracts))
+        return await self._broker.reqTickersAsync(*contracts)
+
+    async def _qualify_and_tickers_chunk(self, contracts: List[Any]) -> Tuple[List[Any], List[Any]]:
+        q_contracts = await self._qualify_chunk(contracts)
+        tickers = await self._tickers_chunk(q_contracts)
+        return q_contracts, tickers
+
+
+def chunks(l: list, n: int) -> list:
+    # For item i in a range that is a lenght of l
+    for i in range(0, len(l), n):
+        # Create an index range for l of n items:
+        yield l[i : i + n]
@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""Online indicators
+
+Every indicator keeps the state it needs to compute its next value in
+constant time when a bar is added. run computes the whole series at once
+with pandas, as the calc functions in optopus.computation do, and leaves
+the indicator in the same state as updating it value by value.
+
+The indicators of an asset are the nodes of a graph declared in an
+IndicatorRegistry, every node computed from the close prices or from the
+series of another node.
+"""
+from collections import Counter, deque
+from dataclasses import dataclass
+import functools
+import math
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, Tuple
+import numpy as np
+import pandas as pd
+from optopus.asset import Bar, to_records
+from optopus.settings import (
+    RSI_WINDOW,
+    RSI_WILDER,
+    FAST_SMA_WINDOW,
+    SLOW_SMA_WINDOW,
+    VERY_SLOW_SMA_WINDOW,
+)
+
+if TYPE_CHECKING:
+    from optopus.parallel import ParallelIndicators
+
+
+class RollingMean:
+    """Mean of the last window values, NaN if any of them is NaN"""
+
+    def __init__(self, window: int) -> None:
+        self._window = window
+        self._values = deque()
+        self._sum = 0.0
+        self._nans = 0
+        self._updates = 0
+
+    def _resum(self) -> None:
+        # bounds the rounding error of the running sum
+        self._sum = math.fsum(v for v in self._values if not math.isnan(v))
+        self._nans = sum(1 for v in self._values if math.isnan(v))
+
+    def update(self, x: float) -> float:
+        self._values.append(x)
+        if math.isnan(x):
+            self._nans += 1
+        else:
+            self._sum += x
+        if len(self._values) > self._window:
+            old = self._values.popleft()
+            if math.isnan(old):
+                self._nans -= 1
+            else:
+                self._sum -= old
+        self._updates += 1
+        if not self._updates % self._window:
+            self._resum()
+        if len(self._values) < self._window or self._nans:
+            return math.nan
+        return self._sum / self._window
+
+    def run(self, xs: np.ndarray) -> np.ndarray:
+        self._values = deque(xs[-self._window:].tolist())
+        self._updates = len(xs)
+        self._resum()
+        return pd.Series(xs).rolling(self._window).mean().to_numpy()
+
+
+class EWMean:
+    """Wilder's smoothing, exponential mean with alpha 1 / window
+
+    NaN until window values have been averaged.
+    """
+
+    def __init__(self, window: int) -> None:
+        self._window = window
+        self._mean = math.nan
+        self._count = 0
+
+    def update(self, x: float) -> float:
+        if not math.isnan(x):
+            self._count += 1
+            if self._count == 1:
+                self._mean = x
+            else:
+                self._mean += (x - self._mean) / self._window
+        return self._mean if self._count >= self._window else math.nan
+
+    def run(self, xs: np.ndarray) -> np.ndarray:
+        ewm = pd.Series(xs).ewm(alpha=1 / self._window, adjust=False)
+        means = ewm.mean().to_numpy().copy()
+        self._count = int(np.count_nonzero(~np.isnan(xs)))
+        self._mean = float(means[-1]) if len(means) else math.nan
+        means[np.cumsum(~np.isnan(xs)) < self._window] = np.nan
+        return means
+
+
+class _Lagged:
+    def __init__(self, lag: int) -> None:
+        self._lag = lag
+        self._values = deque(maxlen=lag)
+
+    def _previous(self, x: float) -> float:
+        previous = self._values[0] if len(self._values) == self._lag else math.nan
+        self._values.append(x)
+        return previous
+
+
+class PctChange(_Lagged):
+    """Change relative to the value lag positions before"""
+
+    def update(self, x: float) -> float:
+        previous = self._previous(x)
+        if math.isnan(previous) or math.isnan(x):
+            return math.nan
+        if not previous:
+            return math.copysign(math.inf, x) if x else math.nan
+        return x / previous - 1
+
+    def run(self, xs: np.ndarray) -> np.ndarray:
+        self._values.extend(xs[-self._lag:].tolist())
+        return pd.Series(xs).pct_change(self._lag).to_numpy()
+
+
+class Diff(_Lagged):
+    """Difference with the value lag positions before"""
+
+    def update(self, x: float) -> float:
+        return x - self._previous(x)
+
+    def run(self, xs: np.ndarray) -> np.ndarray:
+        self._values.extend(xs[-self._lag:].tolist())
+        return pd.Series(xs).diff(self._lag).to_numpy()
+
+
+class RSI:
+    """Relative strength index
+
+    The gains and losses are averaged with a simple moving average, as
+    calc_rsi does, or with Wilder's smoothing.
+    """
+
+    def __init__(self, window: int = RSI_WINDOW, wilder: bool = RSI_WILDER) -> None:
+        mean = EWMean if wilder else RollingMean
+        self._delta = Diff(1)
+        self._up = mean(window)
+        self._down = mean(window)
+
+    def update(self, x: float) -> float:
+        delta = self._delta.update(x)
+        up = self._up.update(max(delta, 0.0) if not math.isnan(delta) else delta)
+        down = self._down.update(-min(delta, 0.0) if not math.isnan(delta) else delta)
+        if math.isnan(up) or math.isnan(down):
+            return math.nan
+        if not down:
+            return 100.0 if up else math.nan
+        return 100.0 - 100.0 / (1.0 + up / down)
+
+    def run(self, xs: np.ndarray) -> np.ndarray:
+        delta = self._delta.run(xs)
+        up = self._up.run(np.where(delta < 0, 0.0, delta))
+        down = self._down.run(-np.where(delta > 0, 0.0, delta))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return 100.0 - 100.0 / (1.0 + up / down)
+
+
+class Series:
+    """Growing series of floats
+
+    Values are appended in amortized constant time, view returns the
+    values without copying them.
+    """
+
+    def __init__(self, values: np.ndarray = None) -> None:
+        values = np.empty(0) if values is None else values
+        self._values = np.empty(max(2 * len(values), 16))
+        self._values[: len(values)] = values
+        self._length = len(values)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def append(self, x: float) -> None:
+        if self._length == len(self._values):
+            values = np.empty(2 * len(self._values))
+            values[: self._length] = self._values
+            # views already returned keep the previous buffer
+            self._values = values
+        self._values[self._length] = x
+        self._length += 1
+
+    def view(self) -> np.ndarray:
+        v = self._values[: self._length]
+        v.flags.writeable = False
+        return v
+
+    @property
+    def last(self) -> float:
+        return self._values[self._length - 1] if self._length else math.nan
+
+
+# input of the indicators of the close prices
+CLOSE = "close"
+
+
+@dataclass(frozen=True)
+class IndicatorSpec:
+    """Indicator with a window of the close prices or of another indicator
+
+    kind builds the online indicator from the window, an object with the
+    update and run methods of the indicators above. measure False keeps
+    the series only as the input of other indicators, last keeps only
+    the last value as the measure.
+    """
+
+    name: str
+    kind: Callable[[int], Any]
+    window: int
+    input: str = CLOSE
+    measure: bool = True
+    last: bool = False
+
+
+class IndicatorRegistry:
+    """Indicators computed for every asset, in the order of their inputs
+
+    version changes with every registered or unregistered indicator.
+    """
+
+    def __init__(self, specs: Tuple[IndicatorSpec] = ()) -> None:
+        self._specs: Dict[str, IndicatorSpec] = {}
+        self._order = None
+        self.version = 0
+        for spec in specs:
+            self.register(spec)
+
+    def __iter__(self) -> Iterator[IndicatorSpec]:
+        return iter(self._specs.values())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def __getitem__(self, name: str) -> IndicatorSpec:
+        return self._specs[name]
+
+    def register(self, spec: IndicatorSpec) -> None:
+        if spec.name == CLOSE or spec.name in self._specs:
+            raise ValueError(f"Indicator {spec.name} already registered")
+        self._specs[spec.name] = spec
+        self._order = None
+        self.version += 1
+
+    def unregister(self, name: str) -> None:
+        del self._specs[name]
+        self._order = None
+        self.version += 1
+
+    def order(self) -> Tuple[IndicatorSpec]:
+        """Indicators after their inputs, sorted once per change of the registry"""
+        if self._order is None:
+            order = []
+            state = {}
+
+            def visit(name: str, path: Tuple[str]) -> None:
+                if name == CLOSE or state.get(name) == "done":
+                    return
+                if name not in self._specs:
+                    raise ValueError(f"Indicator {path[-1]} depends on unknown {name}")
+                if state.get(name) == "visiting":
+                    raise ValueError(f"Indicators {' -> '.join(path + (name,))} are a cycle")
+                state[name] = "visiting"
+                visit(self._specs[name].input, path + (name,))
+                state[name] = "done"
+                order.append(self._specs[name])
+
+            for name in self._specs:
+                visit(name, ())
+            self._order = tuple(order)
+        return self._order
+
+    def measures(self) -> Tuple[str]:
+        """Names of the indicators that are measures"""
+        return tuple(s.name for s in self.order() if s.measure)
+
+    def series_names(self) -> Tuple[str]:
+        """Names of the indicators whose whole series are measures"""
+        return tuple(s.name for s in self.order() if s.measure and not s.last)
+
+
+def default_registry(wilder: bool = RSI_WILDER) -> IndicatorRegistry:
+    """Moving averages, RSI and the speed of the fast moving average"""
+    return IndicatorRegistry((
+        IndicatorSpec("fast_sma", RollingMean, FAST_SMA_WINDOW),
+        IndicatorSpec("slow_sma", RollingMean, SLOW_SMA_WINDOW),
+        IndicatorSpec("very_slow_sma", RollingMean, VERY_SLOW_SMA_WINDOW),
+        IndicatorSpec("rsi", functools.partial(RSI, wilder=wilder), RSI_WINDOW),
+        IndicatorSpec("price_pct", PctChange, 1, last=True),
+        # calc_pct_change smooths the series before the change
+        IndicatorSpec("fast_sma_mean", RollingMean, FAST_SMA_WINDOW, "fast_sma", measure=False),
+        IndicatorSpec("fast_sma_speed", PctChange, FAST_SMA_WINDOW, "fast_sma_mean"),
+        IndicatorSpec("fast_sma_speed_diff", Diff, 1, "fast_sma_speed"),
+    ))
+
+
+class AssetIndicators:
+    """Indicators of the close prices of an asset
+
+    The series have the same length as the bars they were computed from.
+    The intermediate series, and the series of the indicators keeping only
+    their last value, are used by the nodes computed from them and dropped.
+    """
+
+    def __init__(self, registry: IndicatorRegistry = None) -> None:
+        registry = registry if registry is not None else default_registry()
+        self.version = registry.version
+        self._order = registry.order()
+        self._nodes = {s.name: s.kind(s.window) for s in self._order}
+        self._series = None
+        self._lasts: Dict[str, float] = {}
+        self._length = 0
+        self._last = None
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def price_pct(self) -> float:
+        return self.last("price_pct")
+
+    def last(self, name: str) -> float:
+        """Last value of the indicator"""
+        if name in self._lasts:
+            return self._lasts[name]
+        return self._series[name].last if self._series else math.nan
+
+    def continues(self, bars: Tuple[Bar]) -> bool:
+        """True if the bars consumed so far are the first ones of bars"""
+        if self._series is None:
+            return False
+        n = len(self)
+        if not n:
+            return True
+        if len(bars) < n:
+            return False
+        b = bars[n - 1]
+        return (b.time, b.close) == self._last
+
+    def run(self, bars: Tuple[Bar], timings: Counter = None) -> None:
+        """Computes the series of all the bars"""
+        closes = to_records(bars)["close"]
+        self.attach(self.compute(closes, timings), bars)
+
+    def compute(self, closes: np.ndarray, timings: Counter = None) -> Dict[str, np.ndarray]:
+        """Series of the measures of the close prices, without keeping them
+
+        The indicators are left in the state of the last close, attach
+        keeps the series. timings adds the seconds of every indicator.
+        """
+        values = {CLOSE: closes}
+        series = {}
+        for spec in self._order:
+            start = time.perf_counter()
+            v = values[spec.name] = self._nodes[spec.name].run(values[spec.input])
+            if timings is not None:
+                timings[spec.name] += time.perf_counter() - start
+            if spec.last:
+                self._lasts[spec.name] = float(v[-1]) if len(v) else math.nan
+            elif spec.measure:
+                series[spec.name] = v
+        return series
+
+    def attach(self, series: Dict[str, np.ndarray], bars: Tuple[Bar]) -> None:
+        """Keeps the series computed from the bars"""
+        self._series = {name: Series(values) for name, values in series.items()}
+        self._length = len(bars)
+        self._last = (bars[-1].time, bars[-1].close) if bars else None
+
+    def update(self, bar: Bar, timings: Counter = None) -> None:
+        """Adds the values of a new bar in constant time"""
+        values = {CLOSE: bar.close}
+        for spec in self._order:
+            start = time.perf_counter()
+            v = values[spec.name] = self._nodes[spec.name].update(values[spec.input])
+            if timings is not None:
+                timings[spec.name] += time.perf_counter() - start
+            if spec.last:
+                self._lasts[spec.name] = v
+            elif spec.measure:
+                self._series[spec.name].append(v)
+        self._length += 1
+        self._last = (bar.time, bar.close)
+
+    def series(self, name: str) -> np.ndarray:
+        """Read only view of the series"""
+        return self._series[name].view()
+
+
+class IndicatorEngine:
+    """Keeps the indicators of every asset up to date
+
+    Only the bars added since the last update are computed. The series are
+    recomputed when the bars already used changed, when the registry
+    changed, or on request. timings holds the seconds spent in every
+    indicator.
+    """
+
+    def __init__(
+        self,
+        wilder: bool = RSI_WILDER,
+        pool: "ParallelIndicators" = None,
+        registry: IndicatorRegistry = None,
+    ) -> None:
+        self.registry = registry if registry is not None else default_registry(wilder)
+        self._pool = pool
+        self._assets: Dict[str, AssetIndicators] = {}
+        self.full_updates = 0
+        self.bar_updates = 0
+        self.timings = Counter()
+
+    def _continues(self, code: str, bars: Tuple[Bar], full: bool) -> bool:
+        indicators = self._assets.get(code)
+        return (
+            not full
+            and indicators is not None
+            and indicators.version == self.registry.version
+            and indicators.continues(bars)
+        )
+
+    def update(self, code: str, bars: Tuple[Bar], full: bool = False) -> AssetIndicators:
+        if not self._continues(code, bars, full):
+            indicators = AssetIndicators(self.registry)
+            indicators.run(bars, self.timings)
+            self._assets[code] = indicators
+            self.full_updates += 1
+        else:
+            indicators = self._assets[code]
+            for b in bars[len(indicators):]:
+                indicators.update(b, self.timings)
+                self.bar_updates += 1
+        return indicators
+
+    def update_many(self, bars: Dict[str, Tuple[Bar]], full: bool = False) -> Dict[str, AssetIndicators]:
+        """Updates the indicators of every asset
+
+        The assets computed from the start run in the process pool, when
+        there is one and they are enough.
+        """
+        runs = {}
+        if self._pool is not None:
+            runs = {code: b for code, b in bars.items() if not self._continues(code, b, full)}
+            if self._pool.enabled(len(runs)):
+                indicators, timings = self._pool.run(runs, self.registry)
+                self._assets.update(indicators)
+                self.timings.update(timings)
+                self.full_updates += len(runs)
+            else:
+                runs = {}
+        return {
+            code: self._assets[code] if code in runs else self.update(code, b, full)
+            for code, b in bars.items()
+        }
+
+    def reset(self, code: str = None) -> None:
+        """Forgets the state of the asset, of all of them without code"""
+        if code is None:
+            self._assets.clear()
+        else:
+            self._assets.pop(code, None)
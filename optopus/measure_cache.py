@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+from collections import Counter, defaultdict
+from typing import Any, Dict, Hashable, List, Sequence, Tuple
+
+
+class MeasureCache:
+    """Measures of every asset with the versions of the inputs they were
+    computed from
+
+    A measure is computed again only when the key of its inputs changed.
+    Measures computed together share the same key.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[str, Dict[str, Tuple[Hashable, Any]]] = defaultdict(dict)
+        self._hits = Counter()
+        self._misses = Counter()
+
+    def missing(self, names: Sequence[str], keys: Dict[str, Hashable]) -> List[str]:
+        """Codes whose measures were computed from other inputs
+
+        Counts a hit or a miss of every measure for every code.
+        """
+        stale = []
+        for code, key in keys.items():
+            if any(self._key(n, code) != key for n in names):
+                stale.append(code)
+        for n in names:
+            self._hits[n] += len(keys) - len(stale)
+            self._misses[n] += len(stale)
+        return stale
+
+    def _key(self, name: str, code: str) -> Hashable:
+        entry = self._entries[name].get(code)
+        return entry[0] if entry else None
+
+    def put(self, name: str, code: str, key: Hashable, value: Any) -> None:
+        self._entries[name][code] = (key, value)
+
+    def get(self, name: str, code: str, default: Any = None) -> Any:
+        entry = self._entries[name].get(code)
+        return entry[1] if entry else default
+
+    def stats(self) -> Dict[str, Tuple[int, int]]:
+        """Hits and misses of every measure"""
+        return {n: (self._hits[n], self._misses[n]) for n in sorted(set(self._hits) | set(self._misses))}
+
+    def reset_stats(self) -> None:
+        self._hits.clear()
+        self._misses.clear()
+
+    def clear(self) -> None:
+        self._entries.clear()
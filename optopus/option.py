@@ -3,7 +3,7 @@ import datetime
 from enum import Enum
 from typing import Any
 from optopus.asset import AssetId
-from optopus.common import AssetType, Currency
+from optopus.common import AssetType, Currency, FrozenSlots
 
 
 class RightType(Enum):
@@ -19,7 +19,11 @@ class Moneyness(Enum):
 
 
 @dataclass(frozen=True)
-class OptionId:
+class OptionId(FrozenSlots):
+    __slots__ = (
+        "underlying_id", "asset_type", "expiration", "strike", "right", "multiplier", "contract",
+    )
+
     underlying_id: AssetId
     asset_type: AssetType
     expiration: datetime.date
@@ -30,7 +34,13 @@ class OptionId:
 
 
 @dataclass(frozen=True)
-class Option:
+class Option(FrozenSlots):
+    __slots__ = (
+        "id", "high", "low", "close", "bid", "bid_size", "ask", "ask_size", "last",
+        "last_size", "option_price", "volume", "delta", "gamma", "theta", "vega", "iv",
+        "underlying_price", "underlying_dividends", "time",
+    )
+
     id: OptionId
     high: float 
     low: float
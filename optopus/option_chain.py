@@ -0,0 +1,403 @@
+# -*- coding: utf-8 -*-
+"""Option chain of an expiration stored by column
+
+The quotes and Greeks of the options are the rows of one read only float
+array, the puts first and then the calls, both sorted by strike. A
+strike is found by binary search, filters are boolean masks of the
+columns and the chain is exported to pandas without copying them.
+
+The strikes nearest to a price, the options with the delta closest to a
+target and the strikes of a range are found in logarithmic time too, the
+options of a right sorted by delta are kept once per chain.
+"""
+import collections.abc
+import datetime
+from typing import Dict, Iterable, Iterator, Tuple
+import numpy as np
+import pandas as pd
+from optopus.asset import AssetId
+from optopus.common import AssetType
+from optopus.option import Option, OptionId, RightType
+
+# Float columns of the chain, the missing values are NaN
+OPTION_COLUMNS = (
+    "strike", "high", "low", "close", "bid", "bid_size", "ask", "ask_size", "last",
+    "last_size", "option_price", "volume", "delta", "gamma", "theta", "vega", "iv",
+    "underlying_price", "underlying_dividends",
+)
+# Strikes closer than this are the same strike
+STRIKE_TOLERANCE = 1e-6
+_INDEX = {name: i for i, name in enumerate(OPTION_COLUMNS)}
+
+
+def _column(name: str) -> property:
+    i = _INDEX[name]
+    return property(lambda self: self.values[i], doc=f"Read only {name} column")
+
+
+def _objects(values: Iterable, n: int) -> np.ndarray:
+    a = np.empty(n, dtype=object)
+    if values is not None:
+        a[:] = list(values) if not isinstance(values, np.ndarray) else values
+    return a
+
+
+class OptionChain(collections.abc.Sequence):
+    """Options of an underlying and expiration by column
+
+    values holds a row per column of OPTION_COLUMNS and a column per
+    option, call is True for the calls. The options are built as Option
+    objects when accessed, slices are views of the same columns and a
+    boolean mask selects the options of a filter:
+
+        puts = chain.puts
+        liquid = puts[(puts.ask - puts.bid <= 0.2) & (puts.volume > 10)]
+    """
+
+    __slots__ = (
+        "underlying_id", "expiration", "values", "call", "multiplier", "contract", "time", "_puts", "_deltas",
+    )
+
+    def __init__(
+        self,
+        underlying_id: AssetId,
+        expiration: datetime.date,
+        values: np.ndarray,
+        call: np.ndarray,
+        multiplier: np.ndarray,
+        contract: np.ndarray,
+        time: np.ndarray,
+    ) -> None:
+        """The options must be sorted, from_columns sorts them"""
+        if values.flags.writeable:
+            values = values.view()
+            values.flags.writeable = False
+        if call.flags.writeable:
+            call = call.view()
+            call.flags.writeable = False
+        self.underlying_id = underlying_id
+        self.expiration = expiration
+        self.values = values
+        self.call = call
+        self.multiplier = multiplier
+        self.contract = contract
+        self.time = time
+        self._puts = len(call) - int(np.count_nonzero(call))
+        self._deltas = {}
+
+    @classmethod
+    def from_columns(
+        cls,
+        underlying_id: AssetId,
+        expiration: datetime.date,
+        call: np.ndarray,
+        columns: Dict[str, np.ndarray],
+        multiplier: Iterable = None,
+        contract: Iterable = None,
+        time: Iterable = None,
+    ) -> "OptionChain":
+        """Chain of the columns in any order, the missing columns are NaN"""
+        call = np.asarray(call, dtype=bool)
+        n = len(call)
+        values = np.full((len(OPTION_COLUMNS), n), np.nan)
+        for name, column in columns.items():
+            values[_INDEX[name]] = np.asarray(column, dtype=float)
+        order = np.lexsort((values[_INDEX["strike"]], call))
+        return cls(
+            underlying_id,
+            expiration,
+            values[:, order],
+            call[order],
+            _objects(multiplier, n)[order],
+            _objects(contract, n)[order],
+            _objects(time, n)[order],
+        )
+
+    @classmethod
+    def from_options(
+        cls, options: Iterable[Option], underlying_id: AssetId = None, expiration: datetime.date = None
+    ) -> "OptionChain":
+        """Chain of the Option objects, of a single expiration"""
+        options = list(options)
+        if options:
+            underlying_id = options[0].id.underlying_id
+            expiration = options[0].id.expiration
+        values = np.array(
+            [
+                [o.id.strike] + [getattr(o, name) for name in OPTION_COLUMNS[1:]]
+                for o in options
+            ],
+            dtype=float,
+        ).reshape(len(options), len(OPTION_COLUMNS))
+        return cls.from_columns(
+            underlying_id,
+            expiration,
+            [o.id.right == RightType.Call for o in options],
+            dict(zip(OPTION_COLUMNS, values.T)),
+            multiplier=[o.id.multiplier for o in options],
+            contract=[o.id.contract for o in options],
+            time=[o.time for o in options],
+        )
+
+    strike = _column("strike")
+    high = _column("high")
+    low = _column("low")
+    close = _column("close")
+    bid = _column("bid")
+    bid_size = _column("bid_size")
+    ask = _column("ask")
+    ask_size = _column("ask_size")
+    last = _column("last")
+    last_size = _column("last_size")
+    option_price = _column("option_price")
+    volume = _column("volume")
+    delta = _column("delta")
+    gamma = _column("gamma")
+    theta = _column("theta")
+    vega = _column("vega")
+    iv = _column("iv")
+    underlying_price = _column("underlying_price")
+    underlying_dividends = _column("underlying_dividends")
+
+    def column(self, name: str) -> np.ndarray:
+        return self.values[_INDEX[name]]
+
+    @property
+    def midpoint(self) -> np.ndarray:
+        """Midpoint of the quotes, NaN without a bid or an ask"""
+        bid, ask = self.bid, self.ask
+        return np.where((bid > 0) & (ask > 0), (bid + ask) / 2, np.nan)
+
+    @property
+    def spread(self) -> np.ndarray:
+        return self.ask - self.bid
+
+    @property
+    def puts(self) -> "OptionChain":
+        return self[: self._puts]
+
+    @property
+    def calls(self) -> "OptionChain":
+        return self[self._puts :]
+
+    def __len__(self) -> int:
+        return len(self.call)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            if i.step is not None and i.step < 0:
+                raise ValueError("The options of a chain are sorted, slices can't reverse them")
+            return self._take(i)
+        if isinstance(i, np.ndarray) or isinstance(i, list):
+            i = np.asarray(i)
+            # integer positions keep the options sorted
+            return self._take(i if i.dtype == bool else np.unique(i.astype(np.intp)))
+        return self._option(range(len(self))[i])
+
+    def __iter__(self) -> Iterator[Option]:
+        for i in range(len(self)):
+            yield self._option(i)
+
+    def __repr__(self) -> str:
+        code = self.underlying_id.code if self.underlying_id else None
+        return f"OptionChain({code} {self.expiration}, {self._puts} puts, {len(self) - self._puts} calls)"
+
+    def index(self, strike: float, right: RightType) -> int:
+        """Position of the option with the strike and right, KeyError if
+        the chain doesn't have it
+        """
+        start, stop = self._bounds(right)
+        strikes = self.strike[start:stop]
+        i = int(np.searchsorted(strikes, strike - STRIKE_TOLERANCE))
+        if i == len(strikes) or strikes[i] > strike + STRIKE_TOLERANCE:
+            raise KeyError(f"{strike}{right.value}")
+        return start + i
+
+    def option(self, strike: float, right: RightType) -> Option:
+        return self._option(self.index(strike, right))
+
+    def nearest_index(self, price: float, right: RightType) -> int:
+        """Position of the option of the right with the strike nearest to
+        the price, -1 without options of the right
+        """
+        start, stop = self._bounds(right)
+        strikes = self.strike[start:stop]
+        if not len(strikes):
+            return -1
+        i = int(np.searchsorted(strikes, price))
+        if i == len(strikes) or (i > 0 and price - strikes[i - 1] <= strikes[i] - price):
+            i -= 1
+        return start + i
+
+    def nearest(self, price: float, right: RightType) -> Option:
+        i = self.nearest_index(price, right)
+        if i < 0:
+            raise KeyError(f"No {right.name} options")
+        return self._option(i)
+
+    def delta_index(self, delta: float) -> int:
+        """Position of the option with the delta closest to delta, a put
+        for a negative delta and a call otherwise, -1 without deltas
+        """
+        order, deltas = self._delta_order(RightType.Put if delta < 0 else RightType.Call)
+        if not len(deltas):
+            return -1
+        i = int(np.searchsorted(deltas, delta))
+        if i == len(deltas) or (i > 0 and delta - deltas[i - 1] <= deltas[i] - delta):
+            i -= 1
+        return int(order[i])
+
+    def closest_delta(self, delta: float) -> Option:
+        i = self.delta_index(delta)
+        if i < 0:
+            raise KeyError(f"No option with a delta near {delta}")
+        return self._option(i)
+
+    def strike_for_delta(self, delta: float) -> float:
+        """Strike with the delta interpolated between the listed strikes,
+        a put for a negative delta and a call otherwise
+        """
+        order, deltas = self._delta_order(RightType.Put if delta < 0 else RightType.Call)
+        if not len(deltas):
+            return np.nan
+        return float(np.interp(delta, deltas, self.strike[order]))
+
+    def between(self, low: float, high: float, right: RightType = None) -> "OptionChain":
+        """Options with a strike between low and high included, of both
+        rights without right
+
+        The options of a right are a view of the chain.
+        """
+        if right is not None:
+            return self[slice(*self._strike_range(low, high, right))]
+        puts = np.arange(*self._strike_range(low, high, RightType.Put))
+        calls = np.arange(*self._strike_range(low, high, RightType.Call))
+        return self._take(np.concatenate((puts, calls)))
+
+    def interpolate(
+        self,
+        strike: np.ndarray,
+        right: RightType,
+        columns: Tuple[str] = ("delta", "gamma", "theta", "vega", "iv"),
+    ) -> Dict[str, np.ndarray]:
+        """Values of the columns at the strikes, interpolated linearly
+        between the listed strikes of the right
+
+        The options without a value are skipped, the values are flat
+        outside the strikes and NaN without any value.
+        """
+        start, stop = self._bounds(right)
+        strikes = self.strike[start:stop]
+        values = {}
+        for name in columns:
+            column = self.column(name)[start:stop]
+            known = ~np.isnan(column)
+            values[name] = (
+                np.interp(strike, strikes[known], column[known])
+                if known.any()
+                else np.full(np.shape(strike), np.nan)
+            )
+        return values
+
+    def replace(self, **columns: np.ndarray) -> "OptionChain":
+        """Chain of the same options with new values of the columns"""
+        values = self.values.copy()
+        for name, column in columns.items():
+            values[_INDEX[name]] = column
+        return OptionChain(
+            self.underlying_id, self.expiration, values, self.call, self.multiplier, self.contract, self.time
+        )
+
+    def merge(self, other: "OptionChain") -> "OptionChain":
+        """Options of both chains, those of other replace the options of
+        the chain with the same strike and right
+        """
+        if not len(other):
+            return self
+        if not len(self):
+            return other
+        call = np.concatenate((self.call, other.call))
+        strike = np.concatenate((self.strike, other.strike))
+        order = np.lexsort((np.arange(len(call)), strike, call))
+        call, strike = call[order], strike[order]
+        # the last of the options with the same strike and right is kept
+        last = np.ones(len(call), dtype=bool)
+        last[:-1] = (call[1:] != call[:-1]) | (np.abs(strike[1:] - strike[:-1]) > STRIKE_TOLERANCE)
+        order = order[last]
+        return OptionChain(
+            self.underlying_id,
+            self.expiration,
+            np.concatenate((self.values, other.values), axis=1)[:, order],
+            call[last],
+            np.concatenate((self.multiplier, other.multiplier))[order],
+            np.concatenate((self.contract, other.contract))[order],
+            np.concatenate((self.time, other.time))[order],
+        )
+
+    def to_df(self) -> pd.DataFrame:
+        """DataFrame of the options, a row per option
+
+        The float columns are views of the chain values, not copies.
+        """
+        df = pd.DataFrame(self.values.T, columns=list(OPTION_COLUMNS), copy=False)
+        df.insert(0, "code", self.underlying_id.code if self.underlying_id else None)
+        df.insert(1, "expiration", self.expiration)
+        df.insert(3, "right", np.where(self.call, RightType.Call.value, RightType.Put.value))
+        df["midpoint"] = self.midpoint
+        return df
+
+    def _bounds(self, right: RightType) -> Tuple[int, int]:
+        return (self._puts, len(self)) if right == RightType.Call else (0, self._puts)
+
+    def _strike_range(self, low: float, high: float, right: RightType) -> Tuple[int, int]:
+        start, stop = self._bounds(right)
+        strikes = self.strike[start:stop]
+        first = int(np.searchsorted(strikes, low - STRIKE_TOLERANCE))
+        last = int(np.searchsorted(strikes, high + STRIKE_TOLERANCE, side="right"))
+        return start + first, start + max(first, last)
+
+    def _delta_order(self, right: RightType) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of the options of the right with a delta sorted by
+        delta and their deltas, sorted once per chain
+        """
+        cached = self._deltas.get(right)
+        if cached is None:
+            start, stop = self._bounds(right)
+            deltas = self.delta[start:stop]
+            known = np.flatnonzero(~np.isnan(deltas))
+            # the delta decreases with the strike, a reversed view is sorted
+            order = known[::-1]
+            if np.any(np.diff(deltas[order]) < 0):
+                order = known[np.argsort(deltas[known], kind="stable")]
+            cached = self._deltas[right] = (start + order, deltas[order])
+        return cached
+
+    def _take(self, i) -> "OptionChain":
+        return OptionChain(
+            self.underlying_id,
+            self.expiration,
+            self.values[:, i],
+            self.call[i],
+            self.multiplier[i],
+            self.contract[i],
+            self.time[i],
+        )
+
+    def _option(self, i: int) -> Option:
+        fields = {
+            name: None if v != v else v
+            for name, v in zip(OPTION_COLUMNS, self.values[:, i].tolist())
+        }
+        strike = fields.pop("strike")
+        if fields["volume"] is not None:
+            fields["volume"] = int(fields["volume"])
+        opt_id = OptionId(
+            underlying_id=self.underlying_id,
+            asset_type=AssetType.Option,
+            expiration=self.expiration,
+            strike=strike,
+            right=RightType.Call if self.call[i] else RightType.Put,
+            multiplier=self.multiplier[i],
+            contract=self.contract[i],
+        )
+        return Option(id=opt_id, time=self.time[i], **fields)
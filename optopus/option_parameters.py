@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+import datetime
+from typing import Callable, Dict, Tuple
+
+
+@dataclass(frozen=True)
+class OptionParameters:
+    """Expirations and strikes listed for the options of an underlying"""
+    code: str
+    exchange: str
+    trading_class: str
+    multiplier: str
+    expirations: Tuple[datetime.date]
+    strikes: Tuple[float]
+    created: datetime.date
+
+    def strikes_between(self, low: float, high: float) -> Tuple[float]:
+        """Strikes strictly between low and high"""
+        return self.strikes[bisect_right(self.strikes, low):bisect_left(self.strikes, high)]
+
+
+class OptionParametersCache:
+    """Option parameters per underlying, valid for the day they were retrieved"""
+
+    def __init__(self, today: Callable[[], datetime.date] = datetime.date.today) -> None:
+        self._today = today
+        self._parameters: Dict[str, OptionParameters] = {}
+
+    def get(self, code: str) -> OptionParameters:
+        """The parameters of the underlying if they were retrieved today"""
+        p = self._parameters.get(code)
+        if p is not None and p.created != self._today():
+            del self._parameters[code]
+            p = None
+        return p
+
+    def add(self, parameters: OptionParameters) -> None:
+        self._parameters[parameters.code] = parameters
+
+    def clear(self) -> None:
+        self._parameters.clear()
+
+    @property
+    def today(self) -> datetime.date:
+        return self._today()
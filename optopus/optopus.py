@@ -6,16 +6,21 @@ Created on Sat Aug  4 16:30:25 2018
 @author: ilia
 """
 import datetime
-from typing import List, Callable, Dict, Tuple
+from typing import List, Callable, Dict, Iterator, Tuple
 from collections import OrderedDict
 import logging
+from optopus.bar_store import BarStore
+from optopus.covariance import CovarianceMatrix
 from optopus.data_manager import DataManager
+from optopus.indicators import IndicatorSpec, default_registry
 from optopus.order_manager import OrderManager
 from optopus.watch_list import WATCH_LIST
 from optopus.asset import Asset, AssetType
 from optopus.data_objects import Account, Portfolio
-from optopus.option import Option
+from optopus.option_chain import OptionChain
+from optopus.option_parameters import OptionParameters
 from optopus.strategy import Strategy
+from optopus.vol_surface import VolatilitySurface
 from optopus.settings import (
     SLEEP_LOOP,
     EXPIRATIONS,
@@ -27,13 +32,20 @@ from optopus.settings import (
 class Optopus:
     """Class implementing automated trading system"""
 
-    def __init__(self, broker) -> None:
+    def __init__(self, broker, watch_list: Tuple = WATCH_LIST) -> None:
         self._broker = broker
+        self._watch_list = watch_list
         self._algorithms = []
+        self._indicators = default_registry()
         self._log = logging.getLogger(__name__)
 
     def start(self) -> None:
-        self._data_manager = DataManager(self._broker._data_adapter, WATCH_LIST)
+        self._data_manager = DataManager(
+            self._broker._data_adapter,
+            self._watch_list,
+            bar_store=BarStore(),
+            indicators=self._indicators,
+        )
         self._order_manager = OrderManager(self._broker, self._data_manager)
 
         # Events
@@ -53,8 +65,7 @@ class Optopus:
         self._data_manager.create_assets()
 
         self._data_manager.update_assets()
-        self._data_manager.update_historical_assets()
-        self._data_manager.update_historical_IV_assets()
+        self._data_manager.update_histories()
         self._data_manager.compute()
 
         self._data_manager.update_strategy_options()
@@ -87,6 +98,7 @@ class Optopus:
         return self._data_manager.strategies
 
     def stop(self) -> None:
+        self._data_manager.close()
         self._broker.disconnect()
 
     def pause(self, time: float) -> None:
@@ -97,24 +109,28 @@ class Optopus:
         for t in self._broker._broker.timeRange(
             datetime.time(0, 0), datetime.datetime(2100, 1, 1, 0), 10
         ):
-            self._log.debug("Initiating loop iteration")
-            self._data_manager.update_assets()
-            self._data_manager.update_strategy_options()
-            self._data_manager.check_strategy_positions()
-            # FIXME: Compute must be before check_strategy?
-            self._data_manager.compute()
-
-            for algorithm in self._algorithms:
-                algorithm()
+            self.iterate()
             self._broker.sleep(SLEEP_LOOP)
 
+    def iterate(self) -> None:
+        """Updates the data and runs the algorithms once"""
+        self._log.debug("Initiating loop iteration")
+        self._data_manager.update_assets()
+        self._data_manager.update_strategy_options()
+        self._data_manager.check_strategy_positions()
+        # FIXME: Compute must be before check_strategy?
+        self._data_manager.compute()
+
+        for algorithm in self._algorithms:
+            algorithm()
+
     def series(self, code: str, item: str) -> Tuple:
         if item == "time":
-            return [b.time for b in self._data_manager.assets[code].price_history.values]
+            return self._data_manager.assets[code].price_history.time.tolist()
         elif item == "value":
-            return [b.close for b in self._data_manager.assets[code].price_history.values]
+            return self._data_manager.assets[code].price_history.close
         elif item == "iv":
-            return [b.close for b in self._data_manager.assets[code].iv_history.values]
+            return self._data_manager.assets[code].iv_history.close
         elif item == "rsi":
             return self._data_manager.assets[code].measures.rsi
         elif item == "sma_rsi":
@@ -130,7 +146,7 @@ class Optopus:
         elif item == "fast_sma_speed_diff":
             return self._data_manager.assets[code].measures.fast_sma_speed_diff        
         elif item == "direction":
-            return self._data_manager.assets[code].forecast.direction
+            return self._data_manager.assets[code].forecast.directions()
         else:
             return None
 
@@ -157,10 +173,33 @@ class Optopus:
     def assets_matrix(self, field: str) -> dict:
         return self._data_manager.assets_matrix(field)
 
-    def option_chain(self, code: str, expiration: datetime.date) -> List[Option]:
+    def covariance(self) -> CovarianceMatrix:
+        return self._data_manager.covariance()
+
+    def option_chain(self, code: str, expiration: datetime.date) -> OptionChain:
         return self._data_manager.option_chain(code, expiration)
         # return self._data_manager._assets[code]._option_chain
 
+    def option_parameters(self, code: str) -> OptionParameters:
+        return self._data_manager.option_parameters(code)
+
+    def stream_option_chain(self, code: str, expiration: datetime.date) -> Iterator[OptionChain]:
+        return self._data_manager.stream_option_chain(code, expiration)
+
+    def volatility_surface(self, code: str, expirations: Tuple[datetime.date] = None) -> VolatilitySurface:
+        return self._data_manager.volatility_surface(code, expirations)
+
+    def register_indicator(self, spec: IndicatorSpec) -> None:
+        """Computes the indicator for every asset, in Measures.indicators
+
+        An indicator registered after start is computed from the first bar
+        in the next compute.
+        """
+        self._indicators.register(spec)
+
+    def indicator_timings(self) -> Dict[str, float]:
+        return self._data_manager.indicator_timings
+
     def register_algorithm(self, algo: Callable[[], None]) -> None:
         self._algorithms.append(algo)
 
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""Request pacing for the IB API"""
+import asyncio
+from collections import deque
+import logging
+import time
+from typing import Any, Awaitable, Callable, Hashable, List, NamedTuple
+
+# IB disconnects clients sending more than 50 messages per second
+IB_MAX_MESSAGES = 50
+IB_MESSAGES_PERIOD = 1.0
+# Historical data pacing rules
+# https://interactivebrokers.github.io/tws-api/historical_limitations.html
+HISTORICAL_MAX_REQUESTS = 60
+HISTORICAL_PERIOD = 600.0
+IDENTICAL_REQUEST_PERIOD = 15.0
+# Six or more requests for the same contract within two seconds violate the rule
+CONTRACT_MAX_REQUESTS = 5
+CONTRACT_PERIOD = 2.0
+# Simultaneous open historical requests
+HISTORICAL_MAX_OPEN = 50
+
+
+class RateLimiter:
+    """Sliding window rate limiter
+
+    At most max_requests are allowed inside any window of period seconds.
+    """
+
+    def __init__(self,
+                 max_requests: int = IB_MAX_MESSAGES,
+                 period: float = IB_MESSAGES_PERIOD,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if max_requests < 1:
+            raise ValueError("max_requests must be greater than 0")
+        self._max_requests = max_requests
+        self._period = period
+        self._clock = clock
+        self._sent = deque()
+
+    @property
+    def max_requests(self) -> int:
+        return self._max_requests
+
+    def _expire(self, now: float) -> None:
+        while self._sent and now - self._sent[0] >= self._period:
+            self._sent.popleft()
+
+    def delay(self, n: int = 1) -> float:
+        """Seconds to wait before n requests fit in the window"""
+        if n > self._max_requests:
+            raise ValueError(f"Cannot send {n} requests at once, "
+                             f"the limit is {self._max_requests}")
+        now = self._clock()
+        self._expire(now)
+        excess = len(self._sent) + n - self._max_requests
+        if excess <= 0:
+            return 0.0
+        # the window must slide past the oldest `excess` requests
+        return self._sent[excess - 1] + self._period - now
+
+    def record(self, n: int = 1) -> None:
+        now = self._clock()
+        self._sent.extend([now] * n)
+
+    async def acquire(self, n: int = 1) -> None:
+        """Waits until n requests can be sent and records them"""
+        wait = self.delay(n)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.delay(n)
+        self.record(n)
+
+
+class HistoricalPacer:
+    """Enforces the IB pacing rules of historical data requests
+
+    - No more than 60 requests in any ten minute period.
+    - No identical requests within 15 seconds.
+    - No six or more requests for the same contract within two seconds.
+    """
+
+    def __init__(self,
+                 max_requests: int = HISTORICAL_MAX_REQUESTS,
+                 period: float = HISTORICAL_PERIOD,
+                 identical_period: float = IDENTICAL_REQUEST_PERIOD,
+                 contract_requests: int = CONTRACT_MAX_REQUESTS,
+                 contract_period: float = CONTRACT_PERIOD,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self._clock = clock
+        self._limiter = RateLimiter(max_requests, period, clock)
+        self._identical_period = identical_period
+        self._contract_requests = contract_requests
+        self._contract_period = contract_period
+        self._requests = {}
+        self._contracts = {}
+
+    def _contract_limiter(self, contract: Hashable) -> RateLimiter:
+        limiter = self._contracts.get(contract)
+        if limiter is None:
+            limiter = RateLimiter(self._contract_requests, self._contract_period, self._clock)
+            self._contracts[contract] = limiter
+        return limiter
+
+    def delay(self, request: Hashable, contract: Hashable) -> float:
+        """Seconds to wait before the request can be sent"""
+        identical = 0.0
+        if request in self._requests:
+            identical = self._requests[request] + self._identical_period - self._clock()
+        return max(
+            self._limiter.delay(),
+            self._contract_limiter(contract).delay(),
+            identical,
+        )
+
+    def record(self, request: Hashable, contract: Hashable) -> None:
+        self._limiter.record()
+        self._contract_limiter(contract).record()
+        self._requests[request] = self._clock()
+
+    async def acquire(self, request: Hashable, contract: Hashable) -> None:
+        """Waits until the request can be sent and records it"""
+        wait = self.delay(request, contract)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            wait = self.delay(request, contract)
+        self.record(request, contract)
+
+
+class HistoricalJob(NamedTuple):
+    """Historical data request run by the scheduler
+
+    Jobs with lower priority values are sent first.
+    """
+    priority: int
+    request: Hashable
+    contract: Hashable
+    run: Callable[[], Awaitable[Any]]
+
+
+class HistoricalScheduler:
+    """Runs historical data requests concurrently honoring the pacing rules"""
+
+    def __init__(self, pacer: HistoricalPacer = None,
+                 max_open: int = HISTORICAL_MAX_OPEN) -> None:
+        self._pacer = pacer if pacer else HistoricalPacer()
+        self._max_open = max_open
+        self._log = logging.getLogger(__name__)
+
+    async def run(self, jobs: List[HistoricalJob],
+                  progress: Callable[[int, int], None] = None) -> List[Any]:
+        """Results of the jobs in the same order, None for the failed ones"""
+        results = [None] * len(jobs)
+        total = len(jobs)
+        done = 0
+        semaphore = asyncio.Semaphore(self._max_open)
+
+        async def run_job(i: int, job: HistoricalJob) -> None:
+            nonlocal done
+            try:
+                results[i] = await job.run()
+            except Exception as e:
+                self._log.warning(f"Historical request {job.request} failed: {e!r}")
+            finally:
+                semaphore.release()
+                done += 1
+                if progress:
+                    progress(done, total)
+
+        tasks = []
+        for i in sorted(range(total), key=lambda i: jobs[i].priority):
+            await semaphore.acquire()
+            await self._pacer.acquire(jobs[i].request, jobs[i].contract)
+            tasks.append(asyncio.ensure_future(run_job(i, jobs[i])))
+        await asyncio.gather(*tasks)
+        return results
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Date aligned panel of the price histories of the universe"""
+from dataclasses import dataclass
+import datetime
+from typing import Dict, Sequence, Tuple
+import numpy as np
+from optopus.asset import History
+
+
+@dataclass(frozen=True)
+class PricePanel:
+    """One column per asset and one row per date, float64
+
+    The dates are the union of the dates of every history. An asset
+    without a bar on a date keeps the value of its previous bar, and is
+    NaN before its first bar.
+    """
+
+    times: np.ndarray
+    codes: Tuple[str]
+    values: np.ndarray
+
+    @classmethod
+    def from_histories(cls, histories: Dict[str, History], field: str = "close") -> "PricePanel":
+        codes = tuple(histories)
+        columns = []
+        for code in codes:
+            records = histories[code].records
+            columns.append((records["time"].astype("M8[D]"), records[field].astype(float)))
+        times = (
+            np.unique(np.concatenate([t for t, _ in columns]))
+            if columns
+            else np.empty(0, dtype="M8[D]")
+        )
+        values = np.full((len(times), len(codes)), np.nan)
+        for j, (t, v) in enumerate(columns):
+            values[np.searchsorted(times, t), j] = v
+        return cls(times, codes, _fill_forward(values))
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Sequence[float]], times: np.ndarray = None) -> "PricePanel":
+        """Panel of equal length series"""
+        codes = tuple(columns)
+        values = np.column_stack([np.asarray(columns[c], dtype=float) for c in codes])
+        if times is None:
+            times = np.arange(len(values)).astype("M8[D]")
+        return cls(np.asarray(times, dtype="M8[D]"), codes, values)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def index(self, code: str) -> int:
+        return self.codes.index(code)
+
+    def column(self, code: str) -> np.ndarray:
+        return self.values[:, self.index(code)]
+
+    def select(self, codes: Sequence[str]) -> "PricePanel":
+        """Panel with the columns of the codes, in that order"""
+        positions = {c: i for i, c in enumerate(self.codes)}
+        codes = tuple(codes)
+        if codes == self.codes:
+            return self
+        return PricePanel(self.times, codes, self.values[:, [positions[c] for c in codes]])
+
+    def replace(self, values: np.ndarray) -> "PricePanel":
+        """Panel with the same dates and assets and other values"""
+        return PricePanel(self.times, self.codes, values)
+
+    def returns(self) -> np.ndarray:
+        """Daily returns, the first row is NaN"""
+        r = np.full(self.values.shape, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            r[1:] = self.values[1:] / self.values[:-1] - 1
+        return r
+
+    def complete_returns(self) -> np.ndarray:
+        """Daily returns of the dates every asset has a price"""
+        r = self.returns()
+        return r[~np.isnan(r).any(axis=1)]
+
+    def last_time(self) -> datetime.date:
+        return self.times[-1].astype(datetime.date) if len(self.times) else None
+
+
+def _fill_forward(values: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(values)
+    rows = np.where(valid, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = values[rows, np.arange(values.shape[1])]
+    # before the first bar there is nothing to fill with
+    filled[~np.maximum.accumulate(valid, axis=0)] = np.nan
+    return filled
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""Indicators of many assets computed in a process pool
+
+The close prices of every asset are written once to a shared memory
+block and the workers write the series to another one, only the offsets
+of the assets and the small state of their indicators are pickled.
+"""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import sys
+from typing import Dict, List, Tuple
+import numpy as np
+from optopus.asset import Bar, to_records
+from optopus.indicators import AssetIndicators, IndicatorRegistry
+from optopus.settings import COMPUTE_WORKERS, PARALLEL_MIN_ASSETS
+
+# shards per worker, smaller shards balance the work between the workers
+SHARDS_PER_WORKER = 4
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)
+
+
+def _run_shard(
+    closes_name: str, series_name: str, size: int, offsets: List[int], registry: IndicatorRegistry
+) -> Tuple[List[AssetIndicators], Counter]:
+    """Runs the indicators of the assets between the offsets
+
+    Returns the indicators without their series, written to the shared
+    series block, and the seconds spent in every indicator.
+    """
+    names = registry.series_names()
+    closes_block = _attach(closes_name)
+    series_block = _attach(series_name)
+    try:
+        closes = np.ndarray((size,), dtype=float, buffer=closes_block.buf)
+        series = np.ndarray((len(names), size), dtype=float, buffer=series_block.buf)
+        states = []
+        timings = Counter()
+        for start, stop in zip(offsets[:-1], offsets[1:]):
+            indicators = AssetIndicators(registry)
+            computed = indicators.compute(closes[start:stop], timings)
+            for i, name in enumerate(names):
+                series[i, start:stop] = computed[name]
+            states.append(indicators)
+        del closes, series
+        return states, timings
+    finally:
+        closes_block.close()
+        series_block.close()
+
+
+class ParallelIndicators:
+    """Runs the indicators of the assets computed from the start in a
+    process pool
+
+    Below min_assets assets, or with less than two workers, the
+    indicators are computed in this process: the cost of the shared
+    memory and of the workers isn't worth it.
+    """
+
+    def __init__(self, workers: int = COMPUTE_WORKERS, min_assets: int = PARALLEL_MIN_ASSETS) -> None:
+        self.workers = workers
+        self.min_assets = min_assets
+        self._executor = None
+
+    def enabled(self, n: int) -> bool:
+        return self.workers > 1 and n >= self.min_assets
+
+    def run(
+        self, bars: Dict[str, Tuple[Bar]], registry: IndicatorRegistry
+    ) -> Tuple[Dict[str, AssetIndicators], Counter]:
+        """Indicators of the bars of every asset and the seconds spent in
+        every indicator
+
+        The kinds of the indicators of the registry are pickled to the
+        workers, they must be defined at the top level of a module.
+        """
+        names = registry.series_names()
+        codes = list(bars)
+        lengths = np.array([len(bars[c]) for c in codes], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths))).tolist()
+        size = offsets[-1]
+        closes_block = shared_memory.SharedMemory(create=True, size=max(size * 8, 1))
+        series_block = shared_memory.SharedMemory(
+            create=True, size=max(len(names) * size * 8, 1)
+        )
+        try:
+            closes = np.ndarray((size,), dtype=float, buffer=closes_block.buf)
+            for c, start, stop in zip(codes, offsets[:-1], offsets[1:]):
+                closes[start:stop] = to_records(bars[c])["close"]
+
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(self.workers)
+            shards = np.array_split(np.arange(len(codes)), self.workers * SHARDS_PER_WORKER)
+            futures = [
+                (
+                    shard,
+                    self._executor.submit(
+                        _run_shard,
+                        closes_block.name,
+                        series_block.name,
+                        size,
+                        offsets[shard[0] : shard[-1] + 2],
+                        registry,
+                    ),
+                )
+                for shard in shards
+                if len(shard)
+            ]
+
+            series = np.ndarray((len(names), size), dtype=float, buffer=series_block.buf)
+            results = {}
+            timings = Counter()
+            for shard, future in futures:
+                states, shard_timings = future.result()
+                timings.update(shard_timings)
+                for i, indicators in zip(shard, states):
+                    c = codes[i]
+                    start, stop = offsets[i], offsets[i + 1]
+                    # attach copies the series out of the shared block
+                    indicators.attach(
+                        {name: series[j, start:stop] for j, name in enumerate(names)},
+                        bars[c],
+                    )
+                    results[c] = indicators
+            del closes, series
+            return results, timings
+        finally:
+            closes_block.close()
+            closes_block.unlink()
+            series_block.close()
+            series_block.unlink()
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Percentile and rank of current values within the histories of the universe"""
+from typing import Dict, Sequence
+import numpy as np
+from optopus.asset import BAR_DTYPE, Asset, History
+from optopus.settings import IV_WINDOW
+
+
+def _keys(rows: np.ndarray, values: np.ndarray) -> np.ndarray:
+    # row + value * 1j would make the real part NaN for infinite values
+    keys = np.empty(len(rows), dtype=complex)
+    keys.real = rows
+    keys.imag = values
+    return keys
+
+
+class SortedColumns:
+    """Sorted values of every asset searched with a single searchsorted call
+
+    Every value is stored as the complex number row + value * 1j. Numpy
+    orders complex numbers by their real part first, so the concatenation
+    of the sorted rows is sorted as a whole. NaN values would be sorted
+    after every row, they aren't stored.
+    """
+
+    def __init__(self) -> None:
+        self._rows: Dict[str, int] = {}
+        self._keys = np.empty(0, dtype=complex)
+        self._starts = np.empty(0, dtype=np.int64)
+        self._lengths = np.empty(0, dtype=np.int64)
+
+    def build(self, columns: Dict[str, np.ndarray]) -> None:
+        """columns are the sorted values of every asset"""
+        columns = {code: v[~np.isnan(v)] for code, v in columns.items()}
+        self._rows = {code: i for i, code in enumerate(columns)}
+        self._lengths = np.array([len(v) for v in columns.values()], dtype=np.int64)
+        self._starts = np.cumsum(self._lengths) - self._lengths
+        rows = np.repeat(np.arange(len(columns)), self._lengths)
+        values = np.concatenate(list(columns.values())) if columns else np.empty(0)
+        self._keys = _keys(rows, values)
+
+    def rows(self, codes: Sequence[str]) -> np.ndarray:
+        return np.array([self._rows[c] for c in codes], dtype=np.int64)
+
+    def lengths(self, codes: Sequence[str]) -> np.ndarray:
+        return self._lengths[self.rows(codes)]
+
+    def count_below(self, codes: Sequence[str], values: np.ndarray) -> np.ndarray:
+        """Number of stored values of every asset lower than its value, 0
+        for a NaN value
+        """
+        rows = self.rows(codes)
+        values = np.asarray(values, dtype=float)
+        missing = np.isnan(values)
+        positions = np.searchsorted(self._keys, _keys(rows, np.where(missing, -np.inf, values)))
+        return positions - self._starts[rows]
+
+
+class HistoryPercentiles:
+    """Sorted lows of the price and IV histories of every asset
+
+    The arrays of an asset are refreshed only when its histories change.
+    """
+
+    def __init__(self) -> None:
+        self._histories: Dict[str, tuple] = {}
+        self._price_lows: Dict[str, np.ndarray] = {}
+        self._iv_lows: Dict[str, np.ndarray] = {}
+        self._iv_low: Dict[str, float] = {}
+        self._iv_high: Dict[str, float] = {}
+        self._iv_last: Dict[str, float] = {}
+        self._iv_previous: Dict[str, float] = {}
+        self._price = SortedColumns()
+        self._iv = SortedColumns()
+        self.refreshes = 0
+
+    def update(self, assets: Dict[str, Asset]) -> None:
+        changed = len(assets) != len(self._histories)
+        for code, a in assets.items():
+            histories = self._histories.get(code)
+            if histories and histories[0] is a.price_history and histories[1] is a.iv_history:
+                continue
+            self._refresh(code, a.price_history, a.iv_history)
+            self._histories[code] = (a.price_history, a.iv_history)
+            changed = True
+        if changed:
+            for code in set(self._histories) - set(assets):
+                del self._histories[code]
+            codes = list(assets)
+            self._price.build({c: self._price_lows[c] for c in codes})
+            self._iv.build({c: self._iv_lows[c] for c in codes})
+
+    def _refresh(self, code: str, price_history: History, iv_history: History) -> None:
+        self.refreshes += 1
+        self._price_lows[code] = _sorted(price_history, "low")
+        iv_bars = iv_history.records if iv_history else np.empty(0, dtype=BAR_DTYPE)
+        n = len(iv_bars)
+        self._iv_lows[code] = _sorted(iv_history, "low")
+        self._iv_low[code] = self._iv_lows[code][0] if n else np.nan
+        self._iv_high[code] = float(iv_bars["high"].max()) if n else np.nan
+        self._iv_last[code] = float(iv_bars["close"][-1]) if n else np.nan
+        self._iv_previous[code] = float(iv_bars["close"][-IV_WINDOW]) if n >= IV_WINDOW else np.nan
+
+    def price_percentile(self, codes: Sequence[str], prices: np.ndarray) -> np.ndarray:
+        """Fraction of the bars with a low below the price"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._price.count_below(codes, prices) / self._price.lengths(codes)
+
+    def iv_percentile(self, codes: Sequence[str], ivs: np.ndarray) -> np.ndarray:
+        """Fraction of the IV bars with a low below the IV"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._iv.count_below(codes, ivs) / self._iv.lengths(codes)
+
+    def iv_rank(self, codes: Sequence[str], ivs: np.ndarray) -> np.ndarray:
+        """Position of the IV between the lowest and the highest IV"""
+        low = np.array([self._iv_low[c] for c in codes])
+        high = np.array([self._iv_high[c] for c in codes])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (np.asarray(ivs) - low) / (high - low)
+
+    def iv(self, codes: Sequence[str]) -> np.ndarray:
+        """Last IV close"""
+        return np.array([self._iv_last[c] for c in codes])
+
+    def iv_pct(self, codes: Sequence[str]) -> np.ndarray:
+        """Change of the IV close over the IV window"""
+        previous = np.array([self._iv_previous[c] for c in codes])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return (self.iv(codes) - previous) / previous
+
+
+def _sorted(history: History, field: str) -> np.ndarray:
+    return np.sort(history.records[field]) if history else np.empty(0)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""Vectorized Black-Scholes pricing of European options
+
+The Greeks follow the IB conventions: theta is the change of the price in
+one calendar day and vega the change for one point of volatility.
+"""
+import datetime
+from typing import NamedTuple
+import numpy as np
+from optopus.option_chain import OptionChain
+from optopus.settings import RISK_FREE_RATE
+
+# Volatility bracket of the implied volatility solver
+MIN_VOLATILITY = 1e-4
+MAX_VOLATILITY = 5.0
+# Options expiring today are priced with one hour left
+MIN_TIME = 1 / (365 * 24)
+_SQRT_2PI = np.sqrt(2 * np.pi)
+
+
+class Greeks(NamedTuple):
+    price: np.ndarray
+    delta: np.ndarray
+    gamma: np.ndarray
+    theta: np.ndarray
+    vega: np.ndarray
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / _SQRT_2PI
+
+
+def norm_cdf(x: np.ndarray) -> np.ndarray:
+    """Standard normal cumulative distribution, double precision
+
+    Hart's rational approximation as given by West, "Better approximations
+    to cumulative normal functions", 2005.
+    """
+    x = np.asarray(x, dtype=float)
+    a = np.abs(x)
+    e = np.exp(-0.5 * a * a)
+    n = 3.52624965998911e-02 * a + 0.700383064443688
+    n = n * a + 6.37396220353165
+    n = n * a + 33.912866078383
+    n = n * a + 112.079291497871
+    n = n * a + 221.213596169931
+    n = n * a + 220.206867912376
+    d = 8.83883476483184e-02 * a + 1.75566716318264
+    d = d * a + 16.064177579207
+    d = d * a + 86.7807322029461
+    d = d * a + 296.564248779674
+    d = d * a + 637.333633378831
+    d = d * a + 793.826512519948
+    d = d * a + 440.413735824752
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        tail = a + 0.65
+        for c in (4.0, 3.0, 2.0, 1.0):
+            tail = a + c / tail
+        c = np.where(a < 7.07106781186547, e * n / d, e / tail / 2.506628274631)
+    c = np.where(a > 37.0, 0.0, c)
+    return np.where(x > 0, 1.0 - c, c)
+
+
+def black_scholes(
+    call: np.ndarray,
+    s: np.ndarray,
+    k: np.ndarray,
+    t: np.ndarray,
+    sigma: np.ndarray,
+    r: float = RISK_FREE_RATE,
+    q: float = 0.0,
+) -> Greeks:
+    """Price and Greeks, call is True for calls and False for puts
+
+    t is the time to expiration in years, sigma the volatility, r the risk
+    free rate and q the dividend yield. The arguments are broadcast.
+    """
+    call = np.asarray(call, dtype=bool)
+    s, k, sigma = (np.asarray(v, dtype=float) for v in (s, k, sigma))
+    t = np.maximum(np.asarray(t, dtype=float), MIN_TIME)
+    sqrt_t = np.sqrt(t)
+    v = sigma * sqrt_t
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1 = (np.log(s / k) + (r - q + 0.5 * sigma * sigma) * t) / v
+    d2 = d1 - v
+    sign = np.where(call, 1.0, -1.0)
+    dividend = np.exp(-q * t)
+    discount = np.exp(-r * t)
+    pdf = norm_pdf(d1)
+    n1 = norm_cdf(sign * d1)
+    n2 = norm_cdf(sign * d2)
+
+    price = sign * (s * dividend * n1 - k * discount * n2)
+    delta = sign * dividend * n1
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gamma = dividend * pdf / (s * v)
+    theta = (
+        -s * dividend * pdf * sigma / (2 * sqrt_t)
+        - sign * r * k * discount * n2
+        + sign * q * s * dividend * n1
+    ) / 365
+    vega = s * dividend * pdf * sqrt_t / 100
+    return Greeks(price, delta, gamma, theta, vega)
+
+
+def implied_volatility(
+    call: np.ndarray,
+    price: np.ndarray,
+    s: np.ndarray,
+    k: np.ndarray,
+    t: np.ndarray,
+    r: float = RISK_FREE_RATE,
+    q: float = 0.0,
+    tolerance: float = 1e-8,
+    max_iterations: int = 100,
+) -> np.ndarray:
+    """Volatility that prices every option at its price, NaN if there isn't one
+
+    Newton iterations safeguarded by bisection: a step leaving the bracket
+    of the solution is replaced by the midpoint of the bracket. Prices out
+    of reach of the volatilities from MIN_VOLATILITY to MAX_VOLATILITY,
+    or not solved in max_iterations, are NaN.
+    """
+    call, price, s, k, t = np.broadcast_arrays(
+        np.asarray(call, dtype=bool),
+        np.asarray(price, dtype=float),
+        np.asarray(s, dtype=float),
+        np.asarray(k, dtype=float),
+        np.maximum(np.asarray(t, dtype=float), MIN_TIME),
+    )
+    shape = price.shape
+    call, price, s, k, t = (a.ravel() for a in (call, price, s, k, t))
+    forward = s * np.exp(-q * t)
+    strike = k * np.exp(-r * t)
+    lower = np.where(call, np.maximum(forward - strike, 0.0), np.maximum(strike - forward, 0.0))
+    upper = np.where(call, forward, strike)
+    valid = (price > lower) & (price < upper)
+
+    sigma = np.full(len(price), np.nan)
+    low = np.full(len(price), MIN_VOLATILITY)
+    high = np.full(len(price), MAX_VOLATILITY)
+    # Brenner and Subrahmanyam approximation
+    with np.errstate(divide="ignore", invalid="ignore"):
+        guess = np.sqrt(2 * np.pi / t) * price / s
+    sigma[valid] = np.clip(guess[valid], 0.05, 1.0)
+
+    solved = np.zeros(len(price), dtype=bool)
+    active = np.flatnonzero(valid)
+    for _ in range(max_iterations):
+        if not len(active):
+            break
+        g = black_scholes(call[active], s[active], k[active], t[active], sigma[active], r, q)
+        error = g.price - price[active]
+        converged = np.abs(error) <= tolerance * price[active]
+        above = error > 0
+        high[active] = np.where(above, sigma[active], high[active])
+        low[active] = np.where(above, low[active], sigma[active])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = sigma[active] - error / (g.vega * 100)
+        outside = ~((step > low[active]) & (step < high[active]))
+        step[outside] = 0.5 * (low[active] + high[active])[outside]
+        sigma[active] = np.where(converged, sigma[active], step)
+        # a bracket closing on an edge of the volatility range has no solution in it
+        closed = (high[active] - low[active] <= tolerance) & ~converged
+        inside = (low[active] > MIN_VOLATILITY) & (high[active] < MAX_VOLATILITY)
+        solved[active] = converged | (closed & inside)
+        active = active[~converged & ~closed]
+
+    sigma[~solved] = np.nan
+    return sigma.reshape(shape)
+
+
+def fill_missing_greeks(
+    chain: OptionChain,
+    underlying_price: float,
+    today: datetime.date = None,
+    r: float = RISK_FREE_RATE,
+) -> OptionChain:
+    """Options without Greeks priced from the midpoint of the quote
+
+    The implied volatility is solved from the midpoint, or from the last
+    or close price without a quote, and the Greeks computed with it.
+    Options already with Greeks, or without any price, don't change.
+    """
+    today = today if today else datetime.date.today()
+    missing = np.isnan(chain.delta) | np.isnan(chain.iv) | np.isnan(chain.gamma) | np.isnan(chain.vega)
+    if not missing.any() or not underlying_price:
+        return chain
+
+    prices = chain.midpoint
+    for fallback in (chain.last, chain.close):
+        prices = np.where(np.isnan(prices) & (fallback > 0), fallback, prices)
+    t = (chain.expiration - today).days / 365
+    iv = implied_volatility(chain.call, prices, underlying_price, chain.strike, t, r)
+    g = black_scholes(chain.call, underlying_price, chain.strike, t, iv, r)
+
+    filled = missing & ~np.isnan(iv)
+    return chain.replace(
+        delta=np.where(filled, g.delta, chain.delta),
+        gamma=np.where(filled, g.gamma, chain.gamma),
+        theta=np.where(filled, g.theta, chain.theta),
+        vega=np.where(filled, g.vega, chain.vega),
+        iv=np.where(filled, iv, chain.iv),
+        option_price=np.where(filled & np.isnan(chain.option_price), g.price, chain.option_price),
+        underlying_price=np.where(
+            filled & np.isnan(chain.underlying_price), underlying_price, chain.underlying_price
+        ),
+    )
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""Rolling moments of the returns of the universe against the market benchmark"""
+from typing import Dict, Tuple
+import numpy as np
+from optopus.panel import PricePanel
+from optopus.settings import (
+    MARKET_BENCHMARK,
+    BETA_WINDOW,
+    CORRELATION_WINDOW,
+    STDEV_WINDOW,
+)
+
+
+class RollingMoments:
+    """Mean, variance and covariance with the benchmark of the last window
+    rows of returns
+
+    Adding a row costs O(assets): the row leaving the window is subtracted
+    from the sums exactly as it was added. Rows with a missing return are
+    skipped, as complete_returns does.
+    """
+
+    def __init__(self, window: int, n: int, benchmark: int) -> None:
+        self._window = window
+        self._benchmark = benchmark
+        self._rows = np.zeros((window, n))
+        self._count = 0
+        self._next = 0
+        self._updates = 0
+        self._sum = np.zeros(n)
+        self._sum_sq = np.zeros(n)
+        self._sum_cross = np.zeros(n)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _resum(self) -> None:
+        # bounds the rounding error of the running sums
+        rows = self._rows[: self._count]
+        self._sum = rows.sum(axis=0)
+        self._sum_sq = (rows * rows).sum(axis=0)
+        self._sum_cross = rows.T @ rows[:, self._benchmark]
+
+    def append(self, returns: np.ndarray) -> None:
+        if np.isnan(returns).any():
+            return
+        if self._count == self._window:
+            old = self._rows[self._next]
+            self._sum -= old
+            self._sum_sq -= old * old
+            self._sum_cross -= old * old[self._benchmark]
+        else:
+            self._count += 1
+        self._rows[self._next] = returns
+        self._sum += returns
+        self._sum_sq += returns * returns
+        self._sum_cross += returns * returns[self._benchmark]
+        self._next = (self._next + 1) % self._window
+        self._updates += 1
+        if not self._updates % self._window:
+            self._resum()
+
+    def run(self, returns: np.ndarray) -> None:
+        """Starts over with the last window complete rows of the returns"""
+        complete = returns[~np.isnan(returns).any(axis=1)][-self._window:]
+        self._count = len(complete)
+        self._rows[: self._count] = complete
+        self._next = self._count % self._window
+        self._updates = 0
+        self._resum()
+
+    def mean(self) -> np.ndarray:
+        return self._sum / self._count if self._count else np.full(len(self._sum), np.nan)
+
+    def variance(self) -> np.ndarray:
+        """Population variance"""
+        mean = self.mean()
+        return np.maximum(self._sum_sq / self._count - mean * mean, 0.0) if self._count else mean
+
+    def covariance(self) -> np.ndarray:
+        """Population covariance with the benchmark"""
+        mean = self.mean()
+        return self._sum_cross / self._count - mean * mean[self._benchmark] if self._count else mean
+
+    def stdev(self) -> np.ndarray:
+        return np.sqrt(self.variance())
+
+    def beta(self) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.covariance() / self.variance()[self._benchmark]
+
+    def correlation(self) -> np.ndarray:
+        stdev = self.stdev()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.covariance() / (stdev * stdev[self._benchmark])
+
+
+class UniverseMoments:
+    """Rolling beta, correlation and stdev of every asset of a price panel
+
+    The moments are updated with the rows added to the panel since the last
+    update, and computed again when the assets or the previous rows changed.
+    """
+
+    def __init__(
+        self,
+        beta_window: int = BETA_WINDOW,
+        correlation_window: int = CORRELATION_WINDOW,
+        stdev_window: int = STDEV_WINDOW,
+    ) -> None:
+        self._windows = (beta_window, correlation_window, stdev_window)
+        self._panel = None
+        self._moments: Dict[int, RollingMoments] = {}
+        self.full_updates = 0
+        self.row_updates = 0
+
+    @property
+    def codes(self) -> Tuple[str]:
+        return self._panel.codes if self._panel else ()
+
+    def _continues(self, panel: PricePanel) -> bool:
+        previous = self._panel
+        if previous is None or panel.codes != previous.codes or len(panel) < len(previous):
+            return False
+        if not len(previous):
+            return True
+        i = len(previous) - 1
+        return panel.times[i] == previous.times[i] and np.array_equal(
+            panel.values[i], previous.values[i], equal_nan=True
+        )
+
+    def update(self, panel: PricePanel) -> None:
+        if self._continues(panel):
+            start = max(len(self._panel) - 1, 0)
+            rows = panel.values[start:]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                returns = rows[1:] / rows[:-1] - 1
+            for r in returns:
+                for moments in self._moments.values():
+                    moments.append(r)
+                self.row_updates += 1
+        else:
+            benchmark = panel.index(MARKET_BENCHMARK)
+            returns = panel.returns()
+            self._moments = {}
+            for w in set(self._windows):
+                self._moments[w] = RollingMoments(w, len(panel.codes), benchmark)
+                self._moments[w].run(returns)
+            self.full_updates += 1
+        self._panel = panel
+
+    def beta(self) -> Dict[str, float]:
+        return dict(zip(self.codes, self._moments[self._windows[0]].beta()))
+
+    def correlation(self) -> Dict[str, float]:
+        return dict(zip(self.codes, self._moments[self._windows[1]].correlation()))
+
+    def stdev(self) -> Dict[str, float]:
+        return dict(zip(self.codes, self._moments[self._windows[2]].stdev()))
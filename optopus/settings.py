@@ -12,6 +12,8 @@ UNDERLYING_COLOR = 'lightseagreen'
 DATA_DIR = 'data'
 STRATEGY_DIR = 'strategy'
 POSITIONS_FILE = 'positions.pckl'
+CONTRACTS_FILE = 'contracts.db'
+BARS_DIR = 'bars'
 DTE_MAX = 50
 DTE_MIN = 0
 EXPIRATIONS = [datetime.date(2018, 9, 21),
@@ -31,15 +33,25 @@ EXPIRATIONS = [datetime.date(2018, 9, 21),
                datetime.date(2019, 11, 15),
                datetime.date(2019, 12, 20)]
 MARKET_BENCHMARK = 'SPY'
+RISK_FREE_RATE = 0.02
+# Seconds before the smile of an expiration is requested again
+VOLATILITY_SURFACE_TTL = 300
 STDEV_WINDOW = 22
 BETA_WINDOW = 252
 CORRELATION_WINDOW = 252
 PRICE_WINDOW = 22
 IV_WINDOW = 22
 SLEEP_LOOP = 20
+STREAMING_MARKET_DATA = True
+# Processes computing the indicators, 0 or 1 computes them in this process
+COMPUTE_WORKERS = 0
+# Fewer assets to compute from the start don't use the processes
+PARALLEL_MIN_ASSETS = 500
 PRESERVED_CASH_FACTOR = 0.4
 MAXIMUM_RISK_FACTOR = 0.05
 RSI_WINDOW = 14
+# Wilder's smoothing instead of a simple moving average in the RSI
+RSI_WILDER = False
 FAST_SMA_WINDOW = 20
 SLOW_SMA_WINDOW = 50
 VERY_SLOW_SMA_WINDOW = 200
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+"""In process data adapter generating synthetic market data
+
+It needs no TWS connection, so the whole runtime can be load tested with
+any number of underlyings.
+"""
+import datetime
+import math
+import time
+from typing import Dict, Iterator, List, Tuple
+import zlib
+import numpy as np
+from optopus.asset import BAR_DTYPE, AssetId, Asset, Current, History, Stock, ETF, Index
+from optopus.common import AssetType, AssetDefinition
+from optopus.data_manager import DataAdapter, PRICE_BARS
+from optopus.data_objects import Account
+from optopus.option import RightType
+from optopus.option_chain import OptionChain
+from optopus.option_parameters import OptionParameters
+from optopus.pacing import RateLimiter
+from optopus.pricing import black_scholes, fill_missing_greeks
+from optopus.settings import HISTORICAL_YEARS, MARKET_BENCHMARK
+
+TRADING_DAYS = 252
+# Options per batch of a streamed chain
+CHAIN_BATCH = 50
+
+
+def synthetic_watch_list(n: int) -> Tuple[AssetDefinition]:
+    """The market benchmark and n - 1 synthetic ETFs"""
+    codes = [MARKET_BENCHMARK] + [f"SYN{i:04d}" for i in range(1, n)]
+    return tuple(AssetDefinition(code, AssetType.ETF) for code in codes)
+
+
+class SyntheticDataAdapter(DataAdapter):
+    """Generates bars, quotes and option chains with Greeks
+
+    Prices follow a one factor model: every underlying has a beta
+    against the market benchmark plus its own noise, so beta and
+    correlation measures are meaningful. The values are deterministic
+    for every symbol.
+
+    latency is the time in seconds every request takes and max_requests
+    the number of messages accepted per second. A missing_greeks fraction
+    of the options comes without model Greeks, as it happens with IB.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        max_requests: int = None,
+        quote_activity: float = 0.2,
+        missing_greeks: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self._latency = latency
+        self._limiter = RateLimiter(max_requests) if max_requests else None
+        self._quote_activity = quote_activity
+        self._missing_greeks = missing_greeks
+        self._seed = seed
+        self._rng = np.random.default_rng(seed)
+        self._market = None
+        self._profiles = {}
+        self._subscribed = {}
+        self.requests = 0
+
+    def _request(self, n: int = 1) -> None:
+        self.requests += 1
+        if self._limiter:
+            for i in range(0, n, self._limiter.max_requests):
+                m = min(self._limiter.max_requests, n - i)
+                time.sleep(self._limiter.delay(m))
+                self._limiter.record(m)
+        if self._latency:
+            time.sleep(self._latency)
+
+    def _profile(self, code: str) -> dict:
+        profile = self._profiles.get(code)
+        if profile is None:
+            rng = np.random.default_rng([self._seed, zlib.crc32(code.encode())])
+            benchmark = code == MARKET_BENCHMARK
+            price = 100.0 if benchmark else float(rng.uniform(10, 400))
+            profile = {
+                "rng": rng,
+                "last_close": price,
+                "price": price,
+                "beta": 1.0 if benchmark else float(rng.uniform(0.3, 1.8)),
+                "vol": 0.01 if benchmark else float(rng.uniform(0.008, 0.03)),
+                "iv": 0.15 if benchmark else float(rng.uniform(0.15, 0.6)),
+            }
+            self._profiles[code] = profile
+        return profile
+
+    def _market_returns(self, days: int) -> np.ndarray:
+        if self._market is None or len(self._market) < days:
+            rng = np.random.default_rng([self._seed, 1])
+            self._market = rng.normal(0.0003, 0.01, days)
+        return self._market[-days:]
+
+    def _days(self, since: datetime.date = None) -> List[datetime.date]:
+        today = datetime.date.today()
+        first = since if since else today - datetime.timedelta(days=365 * HISTORICAL_YEARS)
+        days = []
+        d = first
+        while d <= today:
+            if d.weekday() < 5:
+                days.append(d)
+            d += datetime.timedelta(days=1)
+        return days
+
+    def get_account_values(self) -> Account:
+        account = Account()
+        account.net_liquidation = account.cash = account.funds = 100000.0
+        account.buying_power = 400000.0
+        return account
+
+    def get_positions(self) -> dict:
+        return {}
+
+    def create_assets(
+        self, watchlist: Tuple[AssetDefinition]
+    ) -> Tuple[Dict[str, Asset], Dict[str, str]]:
+        self._request(len(watchlist))
+        assets = {}
+        failures = {}
+        for item in watchlist:
+            id = AssetId(item.code, item.asset_type, item.currency, None)
+            if item.asset_type == AssetType.Stock:
+                assets[item.code] = Stock(id)
+            elif item.asset_type == AssetType.ETF:
+                assets[item.code] = ETF(id)
+            elif item.asset_type == AssetType.Index:
+                assets[item.code] = Index(id)
+            else:
+                failures[item.code] = f"Unsupported asset type {item.asset_type.value}"
+        return assets, failures
+
+    def _current(self, code: str) -> Current:
+        p = self._profile(code)
+        p["price"] *= math.exp(p["rng"].normal(0, p["vol"] / 20))
+        price = round(p["price"], 2)
+        spread = max(0.01, round(price * 0.0005, 2))
+        return Current(
+            high=round(price * 1.01, 2),
+            low=round(price * 0.99, 2),
+            close=price,
+            bid=price - spread,
+            bid_size=int(p["rng"].integers(1, 50)) * 100,
+            ask=price + spread,
+            ask_size=int(p["rng"].integers(1, 50)) * 100,
+            last=price,
+            last_size=100,
+            volume=int(p["rng"].integers(10000, 5000000)),
+            time=datetime.datetime.now(datetime.timezone.utc),
+        )
+
+    def update_assets(self, assets: Dict[str, Asset]) -> Dict[str, Current]:
+        self._request(len(assets))
+        return {code: self._current(code) for code in assets}
+
+    def subscribe_assets(self, assets: Dict[str, Asset]) -> None:
+        self._request(len(assets))
+        self._subscribed = dict(assets)
+
+    def unsubscribe_assets(self) -> None:
+        self._subscribed = {}
+
+    def pending_assets(self) -> Dict[str, Current]:
+        """A quote_activity fraction of the subscribed assets changes"""
+        codes = [c for c in self._subscribed if self._rng.random() < self._quote_activity]
+        return {code: self._current(code) for code in codes}
+
+    def _bars(self, code: str, kind: str, since: datetime.date = None) -> np.ndarray:
+        p = self._profile(code)
+        days = self._days()
+        n = len(days)
+        rng = np.random.default_rng([self._seed, zlib.crc32(code.encode()), len(kind)])
+        if kind == PRICE_BARS:
+            returns = p["beta"] * self._market_returns(n) + rng.normal(0, p["vol"], n)
+            close = p["last_close"] * np.exp(np.cumsum(returns) - np.sum(returns))
+        else:
+            # mean reverting implied volatility
+            close = np.empty(n)
+            level = p["iv"]
+            for i in range(n):
+                level += 0.05 * (p["iv"] - level) + rng.normal(0, p["iv"] * 0.04)
+                close[i] = max(level, 0.01)
+        spread = np.abs(rng.normal(0, 0.005, n)) * close
+        volume = rng.integers(10000, 5000000, n)
+        first = days.index(since) if since in days else (0 if since is None else n)
+        records = np.empty(n, dtype=BAR_DTYPE)
+        records["time"] = days
+        records["open"][0] = close[0]
+        records["open"][1:] = close[:-1]
+        records["high"] = close + spread
+        records["low"] = close - spread
+        records["close"] = close
+        records["average"] = close
+        records["volume"] = volume
+        records["count"] = volume // 100
+        return records[first:]
+
+    def get_price_history(self, a: Asset, since: datetime.date = None) -> History:
+        self._request()
+        return History(self._bars(a.id.code, PRICE_BARS, since))
+
+    def get_iv_history(self, a: Asset, since: datetime.date = None) -> History:
+        self._request()
+        return History(self._bars(a.id.code, "iv", since))
+
+    def get_option_parameters(self, asset: Asset) -> OptionParameters:
+        self._request()
+        price = asset.current.market_price if asset.current else self._profile(asset.id.code)["price"]
+        step = 1.0 if price < 200 else 5.0
+        low = math.floor(price * 0.5 / step) * step
+        strikes = tuple(low + i * step for i in range(int(price / step) + 1))
+        return OptionParameters(
+            code=asset.id.code,
+            exchange="SMART",
+            trading_class=asset.id.code,
+            multiplier="100",
+            expirations=monthly_expirations(datetime.date.today(), 6),
+            strikes=strikes,
+            created=datetime.date.today(),
+        )
+
+    def get_optionchain(self, asset: Asset, expiration: datetime.date) -> OptionChain:
+        chain = OptionChain.from_options((), asset.id, expiration)
+        for batch in self.stream_optionchain(asset, expiration):
+            chain = chain.merge(batch)
+        return chain
+
+    def stream_optionchain(
+        self, asset: Asset, expiration: datetime.date
+    ) -> Iterator[OptionChain]:
+        parameters = self.get_option_parameters(asset)
+        if expiration is None:
+            expiration = parameters.expirations[1]
+        price = asset.current.market_price
+        width = price * 0.1
+        strikes = parameters.strikes_between(price - width, price + width)
+        contracts = [(s, r) for r in (RightType.Put, RightType.Call) for s in strikes]
+        for i in range(0, len(contracts), CHAIN_BATCH):
+            batch = contracts[i:i + CHAIN_BATCH]
+            self._request(2 * len(batch))
+            yield self.create_options(asset, expiration, batch)
+
+    def create_options(
+        self,
+        asset: Asset,
+        expiration: datetime.date,
+        contracts: List[Tuple[float, RightType]],
+    ) -> OptionChain:
+        p = self._profile(asset.id.code)
+        price = asset.current.market_price
+        t = (expiration - datetime.date.today()).days / 365
+        now = datetime.datetime.now(datetime.timezone.utc)
+        strikes = np.array([strike for strike, _ in contracts], dtype=float)
+        call = np.array([right == RightType.Call for _, right in contracts])
+        # put skew
+        ivs = p["iv"] * (1 + 0.8 * np.maximum(0.0, 1 - strikes / price))
+        g = black_scholes(call, price, strikes, t, ivs)
+        n = len(contracts)
+        spread = np.maximum(0.01, np.round(g.price * 0.04, 2))
+        # IB doesn't always send the model Greeks
+        greeks = np.where(self._rng.random(n) >= self._missing_greeks, 1.0, np.nan)
+        chain = OptionChain.from_columns(
+            asset.id,
+            expiration,
+            call,
+            {
+                "strike": strikes,
+                "high": g.price * 1.1,
+                "low": g.price * 0.9,
+                "close": g.price,
+                "bid": np.maximum(np.round(g.price - spread, 2), 0.01),
+                "bid_size": np.full(n, 10.0),
+                "ask": np.round(g.price + spread, 2),
+                "ask_size": np.full(n, 10.0),
+                "last": np.round(g.price, 2),
+                "last_size": np.ones(n),
+                "option_price": g.price * greeks,
+                "volume": p["rng"].integers(0, 5000, n),
+                "delta": g.delta * greeks,
+                "gamma": g.gamma * greeks,
+                "theta": g.theta * greeks,
+                "vega": g.vega * greeks,
+                "iv": ivs * greeks,
+                "underlying_price": price * greeks,
+                "underlying_dividends": 0.0 * greeks,
+            },
+            multiplier=["100"] * n,
+            time=[now] * n,
+        )
+        return fill_missing_greeks(chain, price)
+
+
+def monthly_expirations(today: datetime.date, n: int) -> Tuple[datetime.date]:
+    """Third Friday of the next n months"""
+    expirations = []
+    year, month = today.year, today.month
+    while len(expirations) < n:
+        first = datetime.date(year, month, 1)
+        friday = first + datetime.timedelta(days=(4 - first.weekday()) % 7 + 14)
+        if friday > today:
+            expirations.append(friday)
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return tuple(expirations)
+
+
+class SyntheticBroker:
+    """Broker running Optopus on the synthetic data adapter
+
+    Orders are ignored.
+    """
+
+    def __init__(self, data_adapter: SyntheticDataAdapter = None) -> None:
+        self._data_adapter = data_adapter if data_adapter else SyntheticDataAdapter()
+        self.emit_order_status = None
+
+    def connect(self) -> None:
+        pass
+
+    def disconnect(self) -> None:
+        pass
+
+    def sleep(self, time: float) -> None:
+        pass
+
+    def open_strategy(self, strategy) -> None:
+        pass
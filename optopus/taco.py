@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import datetime
 from typing import List
+import numpy as np
 from optopus.asset import Asset
 from optopus.data_objects import OwnershipType
 from optopus.option import RightType
@@ -87,40 +88,30 @@ class Taco:
 
         """
         options = self._opt.option_chain(asset.id.code, expiration)
-        df = to_df(options.values())
-        df = df.dropna()
-        if not df.empty:
-            df["spread"] = df["ask"] - df["bid"]
-            # OTM puts filter
-            df = df[
-                (df["right"] == RightType.Put.value) & (df["strike"] <= asset.current.market_price)
-            ]
+        # OTM puts with a quote
+        puts = options.between(0.0, asset.current.market_price, RightType.Put)
+        puts = puts[~np.isnan(puts.midpoint) & ~np.isnan(puts.volume)]
+        if len(puts):
             # nearest ATM option
-            sell_strike = df.iloc[-1, df.columns.get_loc("strike")]
-            sell_midpoint = df.iloc[-1, df.columns.get_loc("midpoint")]
-            df["risk"] = sell_strike - df["strike"]
-            df["reward"] = sell_midpoint - df["midpoint"]
-            df["ROI"] = df["reward"] / df["risk"]
+            sell_option = puts[-1]
+            risk = sell_option.id.strike - puts.strike
+            reward = sell_option.midpoint - puts.midpoint
+            with np.errstate(divide="ignore", invalid="ignore"):
+                roi = reward / risk
 
             # Liquidity filter
-            df = df[
-                (df["spread"] <= self._maximum_price_spread)
-                & (df["volume"] > self._minimum_option_volume)
-            ]
+            liquid = (puts.spread <= self._maximum_price_spread) & (puts.volume > self._minimum_option_volume)
 
+            df = puts.to_df()
+            df["spread"], df["risk"], df["reward"], df["ROI"] = puts.spread, risk, reward, roi
             print(
-                df[["code", "strike", "right", "spread", "volume", "risk", "reward", "ROI"]]
+                df[liquid][["code", "strike", "right", "spread", "volume", "risk", "reward", "ROI"]]
             )
 
-            if sell_strike in df["strike"].values:
-                # Long put filter
-                df = df[
-                    (df["reward"] > self._minimum_reward) & (df["ROI"] > self._minimum_ROI)
-                ]
-                buy_strike = df.loc[df["ROI"].idxmax()]["strike"]
-
-                sell_option = options[f"{sell_strike}{RightType.Put.value}"]
-                buy_option = options[f"{buy_strike}{RightType.Put.value}"]
+            # Long put filter
+            long_puts = liquid & (reward > self._minimum_reward) & (roi > self._minimum_ROI)
+            if liquid[-1] and long_puts.any():
+                buy_option = puts[int(np.argmax(np.where(long_puts, roi, -np.inf)))]
 
                 print(sell_option)
                 print(buy_option)
@@ -129,4 +120,3 @@ class Taco:
                     asset, sell_option, buy_option, OwnershipType.Buyer
                 )
                 self._opt.new_strategy(strategy)
-
@@ -7,8 +7,11 @@ import pandas as pd
 from pandas import DataFrame
 from optopus.asset import Asset
 from optopus.option import Option, OptionId
+from optopus.option_chain import OptionChain
 
 def to_df(items: List[Any]) -> DataFrame:
+    if isinstance(items, OptionChain):
+        return items.to_df()
     rows = []
     if all([isinstance(i, Asset) for i in items]):
         rows = assets_to_df(items)
@@ -146,6 +149,28 @@ def format_ib_date(d: datetime.date) -> str:
     return d.strftime('%Y%m%d')
 
 
+def previous_weekday(d: datetime.date) -> datetime.date:
+    d -= datetime.timedelta(days=1)
+    while d.weekday() > 4:
+        d -= datetime.timedelta(days=1)
+    return d
+
+
+def is_outdated(
+    last_time: datetime.date, today: datetime.date = None, fetched: datetime.datetime = None
+) -> bool:
+    """True if a daily bar after last_time should already be closed, or
+    if the last bar was fetched during its own day, still incomplete, and
+    that day is over
+    """
+    if isinstance(last_time, datetime.datetime):
+        last_time = last_time.date()
+    today = today if today else datetime.date.today()
+    if last_time < previous_weekday(today):
+        return True
+    return fetched is not None and fetched.date() <= last_time < today
+
+
 def notify(event: str, value1: str = None, value2: str = None, value3: str = None):
     data = {'value1': value1, 'value2': value2, 'value3': value3}  
     data = parse.urlencode(data).encode()
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""Implied volatility surface of the options of an underlying
+
+Every expiration has a smile, the implied volatility against the log
+moneyness log(strike / forward) of the out of the money options. Between
+expirations the total variance iv^2 * t is interpolated linearly in time
+at the same moneyness, and the volatility is flat outside the strikes
+and expirations of the chains.
+"""
+import datetime
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Tuple, Union
+import numpy as np
+from optopus.option_chain import OptionChain
+from optopus.pricing import MIN_TIME, black_scholes
+from optopus.settings import RISK_FREE_RATE, VOLATILITY_SURFACE_TTL
+
+
+@dataclass(frozen=True)
+class VolatilitySmile:
+    """Implied volatility of an expiration by strike"""
+
+    expiration: datetime.date
+    t: float
+    underlying_price: float
+    strikes: np.ndarray
+    ivs: np.ndarray
+    r: float = RISK_FREE_RATE
+    forward: float = field(init=False, repr=False, compare=False)
+    moneyness: np.ndarray = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        forward = self.underlying_price * np.exp(self.r * self.t)
+        moneyness = np.log(self.strikes / forward)
+        moneyness.flags.writeable = False
+        object.__setattr__(self, "forward", forward)
+        object.__setattr__(self, "moneyness", moneyness)
+
+    def iv(self, strike: np.ndarray) -> np.ndarray:
+        return self.iv_at_moneyness(np.log(np.asarray(strike, dtype=float) / self.forward))
+
+    def iv_at_moneyness(self, x: np.ndarray) -> np.ndarray:
+        if not len(self.strikes):
+            return np.full(np.shape(x), np.nan)
+        return np.interp(x, self.moneyness, self.ivs)
+
+    def strike_for_delta(self, delta: float) -> float:
+        """Strike with the delta, a put for a negative delta and a call otherwise"""
+        if not len(self.strikes):
+            return np.nan
+        call = delta >= 0
+        deltas = black_scholes(call, self.underlying_price, self.strikes, self.t, self.ivs, self.r).delta
+        # the delta decreases with the strike for calls and puts
+        return float(np.interp(-delta, -deltas, self.strikes))
+
+
+def build_smile(
+    chain: OptionChain,
+    expiration: datetime.date,
+    underlying_price: float,
+    today: datetime.date = None,
+    r: float = RISK_FREE_RATE,
+) -> VolatilitySmile:
+    """Smile of the out of the money options of a chain with an implied volatility
+
+    At the money the call and put volatilities are averaged.
+    """
+    today = today if today else datetime.date.today()
+    t = max((expiration - today).days / 365, MIN_TIME)
+    forward = underlying_price * np.exp(r * t)
+    otm = np.where(chain.call, chain.strike >= forward, chain.strike <= forward)
+    used = otm & (chain.iv > 0)
+    strikes, at = np.unique(chain.strike[used], return_inverse=True)
+    ivs = np.bincount(at, weights=chain.iv[used], minlength=len(strikes)) / np.bincount(
+        at, minlength=len(strikes)
+    )
+    strikes.flags.writeable = False
+    ivs.flags.writeable = False
+    return VolatilitySmile(expiration, t, underlying_price, strikes, ivs, r)
+
+
+class VolatilitySurface:
+    """Smiles of the expirations of an underlying
+
+    A smile is replaced when the chain of its expiration is updated, the
+    smiles of the other expirations don't change. Partial chains, like the
+    batches of a streamed chain, are merged with the options received
+    before.
+    """
+
+    def __init__(
+        self,
+        code: str,
+        r: float = RISK_FREE_RATE,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.code = code
+        self._r = r
+        self._clock = clock
+        self._options: Dict[datetime.date, OptionChain] = {}
+        self._smiles: Dict[datetime.date, VolatilitySmile] = {}
+        self._updated: Dict[datetime.date, float] = {}
+        self._t = np.empty(0)
+        self._expirations: Tuple[datetime.date] = ()
+        self.underlying_price = None
+
+    @property
+    def expirations(self) -> Tuple[datetime.date]:
+        return self._expirations
+
+    def smile(self, expiration: datetime.date) -> VolatilitySmile:
+        return self._smiles[expiration]
+
+    def age(self, expiration: datetime.date) -> float:
+        """Seconds since the expiration was updated, inf if it never was"""
+        updated = self._updated.get(expiration)
+        return self._clock() - updated if updated is not None else np.inf
+
+    def is_stale(self, expiration: datetime.date, ttl: float = VOLATILITY_SURFACE_TTL) -> bool:
+        return self.age(expiration) > ttl
+
+    def touch(self, expiration: datetime.date) -> None:
+        """Records the expiration as updated, as when its chain was empty"""
+        self._updated[expiration] = self._clock()
+
+    def update(
+        self,
+        expiration: datetime.date,
+        options: OptionChain,
+        underlying_price: float = None,
+        today: datetime.date = None,
+        replace: bool = True,
+    ) -> None:
+        """Updates the smile of the expiration with the options
+
+        The underlying price is the one the options were quoted with when
+        not given. replace False merges the options with the previous ones.
+        Without any underlying price only the update time is recorded.
+        """
+        for price in (
+            underlying_price,
+            next((p for p in options.underlying_price.tolist() if p > 0), None),
+            self.underlying_price,
+        ):
+            if price and price > 0:
+                underlying_price = price
+                break
+        else:
+            self.touch(expiration)
+            return
+        chain = self._options.get(expiration)
+        chain = options if replace or chain is None else chain.merge(options)
+        self._options[expiration] = chain
+        self._smiles[expiration] = build_smile(chain, expiration, underlying_price, today, self._r)
+        self._updated[expiration] = self._clock()
+        self.underlying_price = underlying_price
+        self._expirations = tuple(sorted(self._smiles))
+        self._t = np.array([self._smiles[e].t for e in self._expirations])
+
+    def iv(self, strike: np.ndarray, t: Union[float, datetime.date], today: datetime.date = None) -> np.ndarray:
+        """Implied volatility at the strikes and time to expiration
+
+        t is the time in years or an expiration date.
+        """
+        if isinstance(t, datetime.date):
+            today = today if today else datetime.date.today()
+            t = (t - today).days / 365
+        t = max(t, MIN_TIME)
+        if not self._expirations:
+            return np.full(np.shape(strike), np.nan)
+        x = np.log(np.asarray(strike, dtype=float) / (self.underlying_price * np.exp(self._r * t)))
+        i = int(np.searchsorted(self._t, t))
+        if i == 0:
+            return self._smiles[self._expirations[0]].iv_at_moneyness(x)
+        if i == len(self._t):
+            return self._smiles[self._expirations[-1]].iv_at_moneyness(x)
+        before = self._smiles[self._expirations[i - 1]]
+        after = self._smiles[self._expirations[i]]
+        w0 = before.iv_at_moneyness(x) ** 2 * before.t
+        w1 = after.iv_at_moneyness(x) ** 2 * after.t
+        w = w0 + (w1 - w0) * (t - before.t) / (after.t - before.t)
+        return np.sqrt(np.maximum(w, 0.0) / t)
+
+    def strike_for_delta(self, delta: float, expiration: datetime.date) -> float:
+        return self._smiles[expiration].strike_for_delta(delta)
+
+    def price(
+        self,
+        call: np.ndarray,
+        strike: np.ndarray,
+        t: Union[float, datetime.date],
+        underlying_price: np.ndarray = None,
+        today: datetime.date = None,
+    ) -> np.ndarray:
+        """Black-Scholes price with the volatility of the surface
+
+        A different underlying price prices a scenario at the same
+        volatility of the strikes.
+        """
+        if isinstance(t, datetime.date):
+            today = today if today else datetime.date.today()
+            t = (t - today).days / 365
+        s = self.underlying_price if underlying_price is None else underlying_price
+        return black_scholes(call, s, strike, t, self.iv(strike, t), self._r).price
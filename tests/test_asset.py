@@ -1,5 +1,6 @@
 from dataclasses import FrozenInstanceError
 import datetime
+import numpy as np
 import pytest
 from optopus.asset import AssetId, Asset, Current, Bar, History, Measures, Stock
 from optopus.common import AssetType, Currency, Direction
@@ -316,4 +317,56 @@ def test_Stock_wrong_asset_type():
     with pytest.raises(ValueError):
         Stock(id)
 
-# TODO: Index and ETF tests
\ No newline at end of file
+# TODO: Index and ETF tests
+
+def bar_at(time, close):
+    return Bar(count=1, open=close, high=close, low=close, close=close,
+               average=close, volume=100, time=time)
+
+
+def test_History_append_replaces_incomplete_bar():
+    day = datetime.date(2018, 9, 3)
+    history = History(tuple(bar_at(day + datetime.timedelta(days=i), 10.0) for i in range(3)))
+    last = history.last_time
+    history = history.append((bar_at(last, 11.0), bar_at(last + datetime.timedelta(days=1), 12.0)))
+    assert len(history.values) == 4
+    assert [b.close for b in history.values] == [10.0, 10.0, 11.0, 12.0]
+
+
+def test_History_created_at_init():
+    before = datetime.datetime.now()
+    history = History(())
+    assert history.created >= before
+
+
+def test_History_columns_are_read_only_views():
+    day = datetime.date(2018, 9, 3)
+    history = History(tuple(bar_at(day + datetime.timedelta(days=i), 10.0 + i) for i in range(3)))
+    assert history.close.tolist() == [10.0, 11.0, 12.0]
+    assert history.close.base is not None
+    assert history.time[-1] == np.datetime64(day + datetime.timedelta(days=2))
+    with pytest.raises(ValueError):
+        history.close[0] = 1.0
+    with pytest.raises(FrozenInstanceError):
+        history.records = history.records
+
+
+def test_History_values_are_bars():
+    day = datetime.date(2018, 9, 3)
+    bars = tuple(bar_at(day + datetime.timedelta(days=i), 10.0 + i) for i in range(3))
+    history = History(bars)
+    assert history.values == bars
+    assert history.values[1] == bars[1]
+    assert history.values[1:] == bars[1:]
+    assert history.values[1:].close.tolist() == [11.0, 12.0]
+    assert History(history.values[1:]).records.base is not None
+    assert history.last_time == bars[-1].time
+
+
+def test_History_intraday_times():
+    start = datetime.datetime(2018, 9, 3, 9, 30)
+    bars = tuple(bar_at(start + datetime.timedelta(minutes=i), 10.0) for i in range(3))
+    history = History(bars)
+    assert history.values == bars
+    aware = datetime.datetime(2018, 9, 3, 15, 0, tzinfo=datetime.timezone(datetime.timedelta(hours=2)))
+    assert History((bar_at(aware, 1.0),)).last_time == datetime.datetime(2018, 9, 3, 13, 0)
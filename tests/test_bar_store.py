@@ -0,0 +1,48 @@
+import datetime
+import numpy as np
+from optopus.asset import Bar
+from optopus.bar_store import BarStore
+
+
+def bars(first, n, close=10.0):
+    return tuple(
+        Bar(count=1, open=close, high=close + 1, low=close - 1, close=close,
+            average=close, volume=100, time=first + datetime.timedelta(days=i))
+        for i in range(n)
+    )
+
+
+def test_BarStore_write_and_read(tmp_path):
+    store = BarStore(tmp_path)
+    day = datetime.date(2018, 9, 3)
+    store.write("SPY", "price", bars(day, 10))
+    values = store.read("SPY", "price")
+    assert len(values) == 10
+    assert values["close"][0] == 10.0
+    assert store.last_time("SPY", "price") == day + datetime.timedelta(days=9)
+
+    values = store.read("SPY", "price", day + datetime.timedelta(days=2),
+                        day + datetime.timedelta(days=4))
+    assert list(values["time"].astype(datetime.date)) == [
+        day + datetime.timedelta(days=i) for i in (2, 3, 4)
+    ]
+    assert not values.flags.writeable
+
+
+def test_BarStore_append_replaces_overlapping_bars(tmp_path):
+    store = BarStore(tmp_path)
+    day = datetime.date(2018, 9, 3)
+    store.write("SPY", "price", bars(day, 5))
+    store.append("SPY", "price", bars(day + datetime.timedelta(days=4), 3, 11.0))
+    values = store.read("SPY", "price")
+    assert len(values) == 7
+    np.testing.assert_array_equal(values["close"], [10.0] * 4 + [11.0] * 3)
+
+
+def test_BarStore_load(tmp_path):
+    store = BarStore(tmp_path)
+    assert store.load("SPY", "iv") is None
+    day = datetime.date(2018, 9, 3)
+    store.write("SPY", "iv", bars(day, 3))
+    history = store.load("SPY", "iv")
+    assert history.values == bars(day, 3)
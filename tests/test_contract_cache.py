@@ -0,0 +1,57 @@
+import datetime
+from types import SimpleNamespace
+from optopus.contract_cache import ContractCache
+
+
+def contract(symbol, expiration="", strike=0.0, right="", sec_type="OPT", con_id=0):
+    return SimpleNamespace(
+        secType=sec_type,
+        symbol=symbol,
+        lastTradeDateOrContractMonth=expiration,
+        strike=strike,
+        right=right,
+        exchange="SMART",
+        currency="USD",
+        conId=con_id,
+    )
+
+
+def test_ContractCache_hits_and_misses(tmp_path):
+    cache = ContractCache(tmp_path / "contracts.db")
+    request = contract("SPY", "20990101", 100, "P")
+    cached, missing = cache.split([request])
+    assert cached == [] and missing == [request]
+
+    cache.add({ContractCache.key(request): contract("SPY", "20990101", 100, "P", con_id=7)})
+    cached, missing = cache.split([contract("SPY", "20990101", 100.0, "P")])
+    assert [c.conId for c in cached] == [7]
+    assert missing == []
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_ContractCache_persistence(tmp_path):
+    cache = ContractCache(tmp_path / "contracts.db")
+    request = contract("SPY", sec_type="STK")
+    cache.add({ContractCache.key(request): contract("SPY", sec_type="STK", con_id=756733)})
+    cache.close()
+
+    cache = ContractCache(tmp_path / "contracts.db")
+    cached, _ = cache.split([request])
+    assert cached[0].conId == 756733
+
+
+def test_ContractCache_evicts_expired_options(tmp_path):
+    cache = ContractCache(tmp_path / "contracts.db")
+    expired = contract("SPY", "20180921", 100, "P")
+    alive = contract("SPY", "20181019", 100, "P")
+    stock = contract("SPY", sec_type="STK")
+    cache.add({ContractCache.key(c): c for c in (expired, alive, stock)})
+
+    cache.evict(datetime.date(2018, 10, 1))
+    assert len(cache) == 2
+    cache.close()
+
+    cache = ContractCache(tmp_path / "contracts.db")
+    # reopening evicts the options expired before today
+    assert len(cache) == 1
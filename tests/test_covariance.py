@@ -0,0 +1,35 @@
+import numpy as np
+from optopus.covariance import covariance_matrix
+from optopus.panel import PricePanel
+
+
+def panel(n_assets=4, n_bars=300, seed=0):
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, n_bars)
+    columns = {"SPY": 100 * np.exp(np.cumsum(market))}
+    for i in range(1, n_assets):
+        returns = rng.uniform(0.5, 1.5) * market + rng.normal(0, 0.01, n_bars)
+        columns[f"A{i}"] = 50 * np.exp(np.cumsum(returns))
+    return PricePanel.from_columns(columns)
+
+
+def test_covariance_matrix_matches_numpy():
+    p = panel()
+    returns = p.complete_returns()
+    m = covariance_matrix(p)
+    np.testing.assert_allclose(m.covariance, np.cov(returns, rowvar=False))
+    np.testing.assert_allclose(m.correlation, np.corrcoef(returns, rowvar=False))
+    np.testing.assert_allclose(m.stdev(), np.std(returns, axis=0, ddof=1))
+    cov = np.cov(returns, rowvar=False)
+    np.testing.assert_allclose(m.beta("SPY"), cov[0] / cov[0, 0])
+    assert m.observations == len(returns)
+
+
+def test_CovarianceMatrix_average_correlation():
+    p = panel()
+    m = covariance_matrix(p)
+    c = m.correlation
+    assert np.isclose(m.average_correlation(["A1", "A2", "A3"]), (c[1, 2] + c[1, 3] + c[2, 3]) / 3)
+    assert np.isclose(m.average_correlation(["A2", "A1", "A1"]), c[1, 2])
+    assert np.isnan(m.average_correlation(["A1"]))
+    assert m.submatrix(["A2", "SPY"]).tolist() == [[1.0, c[2, 0]], [c[0, 2], 1.0]]
@@ -0,0 +1,199 @@
+import datetime
+from optopus.asset import AssetId, Bar, Current, ETF, History
+from optopus.bar_store import BarStore
+from optopus.common import AssetDefinition, AssetType, Currency
+from optopus.data_manager import DataAdapter, DataManager, PRICE_BARS
+
+
+def current(price):
+    return Current(high=price, low=price, close=price, bid=price, bid_size=1,
+                   ask=price, ask_size=1, last=price, last_size=1, volume=100,
+                   time=datetime.datetime.now())
+
+
+class FakeDataAdapter(DataAdapter):
+    def __init__(self):
+        self.snapshots = 0
+        self.subscribed = None
+        self.pending = {}
+
+    def create_assets(self, watch_list):
+        assets = {
+            d.code: ETF(AssetId(d.code, d.asset_type, d.currency, None))
+            for d in watch_list
+        }
+        return assets, {}
+
+    def update_assets(self, assets):
+        self.snapshots += 1
+        return {code: current(100.0) for code in assets}
+
+    def subscribe_assets(self, assets):
+        self.subscribed = set(assets)
+
+    def pending_assets(self):
+        pending, self.pending = self.pending, {}
+        return pending
+
+
+WATCH_LIST = (AssetDefinition("SPY", AssetType.ETF), AssetDefinition("XLE", AssetType.ETF))
+
+
+def test_DataManager_streaming_updates_changed_assets():
+    da = FakeDataAdapter()
+    dm = DataManager(da, WATCH_LIST, streaming=True)
+    dm.create_assets()
+    dm.update_assets()
+    assert da.snapshots == 1
+    assert da.subscribed == {"SPY", "XLE"}
+
+    da.pending = {"XLE": current(101.0)}
+    dm.update_assets()
+    assert da.snapshots == 1
+    assert dm.assets["XLE"].current.last == 101.0
+    assert dm.assets["SPY"].current.last == 100.0
+
+
+def test_DataManager_snapshot_polling():
+    da = FakeDataAdapter()
+    dm = DataManager(da, WATCH_LIST, streaming=False)
+    dm.create_assets()
+    dm.update_assets()
+    dm.update_assets()
+    assert da.snapshots == 2
+    assert da.subscribed is None
+
+
+def daily_bars(first, n, close=10.0):
+    return tuple(
+        Bar(count=1, open=close, high=close, low=close, close=close,
+            average=close, volume=100, time=first + datetime.timedelta(days=i))
+        for i in range(n)
+    )
+
+
+class HistoryDataAdapter(FakeDataAdapter):
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def get_price_history(self, a, since=None):
+        self.requests.append(since)
+        today = datetime.date.today()
+        if since is None:
+            return History(daily_bars(today - datetime.timedelta(days=99), 100))
+        return History(daily_bars(since, (today - since).days + 1, 11.0))
+
+
+def test_DataManager_delta_history():
+    da = HistoryDataAdapter()
+    dm = DataManager(da, WATCH_LIST[:1], streaming=False)
+    dm.create_assets()
+    dm.update_historical_assets()
+    assert da.requests == [None]
+
+    # nothing is requested while the history is up to date
+    dm.update_historical_assets()
+    assert da.requests == [None]
+
+    spy = dm.assets["SPY"]
+    spy.price_history = History(spy.price_history.values[:-10])
+    since = spy.price_history.last_time
+    dm.update_historical_assets()
+    assert da.requests == [None, since]
+    assert len(spy.price_history.values) == 100
+    assert spy.price_history.values[-1].close == 11.0
+
+    dm.update_historical_assets(full=True)
+    assert da.requests == [None, since, None]
+
+
+def test_DataManager_warm_bar_store(tmp_path):
+    da = HistoryDataAdapter()
+    dm = DataManager(da, WATCH_LIST[:1], streaming=False, bar_store=BarStore(tmp_path))
+    dm.create_assets()
+    dm.update_historical_assets()
+    assert da.requests == [None]
+
+    da = HistoryDataAdapter()
+    dm = DataManager(da, WATCH_LIST[:1], streaming=False, bar_store=BarStore(tmp_path))
+    dm.create_assets()
+    dm.update_historical_assets()
+    assert da.requests == []
+    assert len(dm.assets["SPY"].price_history.values) > 0
+
+
+def test_DataManager_compute_recomputes_changed_inputs():
+    from optopus.synthetic_adapter import SyntheticDataAdapter, synthetic_watch_list
+
+    da = SyntheticDataAdapter(quote_activity=0.0)
+    dm = DataManager(da, synthetic_watch_list(4), streaming=True)
+    dm.create_assets()
+    dm.update_assets()
+    dm.update_histories()
+    dm.compute()
+    assert dm.measure_stats["beta"] == (0, 4)
+    measures = dm.assets["SYN0001"].measures
+
+    dm.assets["SYN0002"].current = current(1000.0)
+    dm.compute()
+    stats = dm.measure_stats
+    assert stats["price_percentile"] == (3, 5)
+    assert stats["iv_rank"] == (4, 4)
+    assert stats["fast_sma"] == (4, 4)
+    assert stats["beta"] == (4, 4)
+    assert dm.assets["SYN0001"].measures is measures
+    assert dm.assets["SYN0002"].measures.price_percentile == 1.0
+
+    a = dm.assets["SYN0001"]
+    a.price_history = a.price_history.append(a.price_history.values[-1:])
+    dm.compute()
+    stats = dm.measure_stats
+    assert stats["fast_sma"] == (7, 5)
+    assert stats["beta"] == (4, 8)
+
+
+def test_DataManager_covariance_cached_until_histories_change():
+    from optopus.synthetic_adapter import SyntheticDataAdapter, synthetic_watch_list
+
+    dm = DataManager(SyntheticDataAdapter(), synthetic_watch_list(3), streaming=False)
+    dm.create_assets()
+    dm.update_assets()
+    dm.update_histories()
+    matrix = dm.covariance()
+    assert matrix.codes == ("SPY", "SYN0001", "SYN0002")
+    assert dm.covariance() is matrix
+    a = dm.assets["SYN0001"]
+    a.price_history = a.price_history.append(a.price_history.values[-1:])
+    assert dm.covariance() is not matrix
+
+
+def test_DataManager_refetches_bar_fetched_during_its_day(tmp_path):
+    import os
+
+    da = HistoryDataAdapter()
+    store = BarStore(tmp_path)
+    dm = DataManager(da, WATCH_LIST[:1], streaming=False, bar_store=store)
+    dm.create_assets()
+    yesterday = datetime.date.today() - datetime.timedelta(days=1)
+    # the last bar of yesterday was fetched yesterday during the session
+    fetched = datetime.datetime.combine(yesterday, datetime.time(12))
+    store.write("SPY", PRICE_BARS, daily_bars(yesterday - datetime.timedelta(days=9), 10))
+    os.utime(store._file("SPY", PRICE_BARS), (fetched.timestamp(), fetched.timestamp()))
+    dm.update_historical_assets()
+    assert da.requests == [yesterday]
+    assert dm.assets["SPY"].price_history.last_time == datetime.date.today()
+
+
+def test_DataManager_keeps_bars_after_empty_full_download(tmp_path):
+    da = HistoryDataAdapter()
+    store = BarStore(tmp_path)
+    dm = DataManager(da, WATCH_LIST[:1], streaming=False, bar_store=store)
+    dm.create_assets()
+    dm.update_historical_assets()
+    history = dm.assets["SPY"].price_history
+
+    da.get_price_history = lambda a, since=None: History()
+    dm.update_historical_assets(full=True)
+    assert dm.assets["SPY"].price_history is history
+    assert len(store.read("SPY", PRICE_BARS)) == len(history.records)
@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+from optopus.contract_cache import ContractCache
+from optopus.ib_pipeline import ContractPipeline, chunks
+from optopus.pacing import RateLimiter
+
+
+class FakeBroker:
+    def __init__(self):
+        self.qualify_calls = 0
+        self.ticker_calls = 0
+
+    async def qualifyContractsAsync(self, *contracts):
+        self.qualify_calls += 1
+        await asyncio.sleep(0)
+        # odd symbols can't be qualified
+        return [c for c in contracts if int(c.symbol) % 2 == 0]
+
+    async def reqTickersAsync(self, *contracts):
+        self.ticker_calls += 1
+        await asyncio.sleep(0)
+        return [SimpleNamespace(contract=c) for c in contracts]
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def test_chunks():
+    assert list(chunks([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+
+
+def test_ContractPipeline_qualify_and_tickers():
+    broker = FakeBroker()
+    pipeline = ContractPipeline(broker, RateLimiter(1000, 1.0), chunk_size=10)
+    contracts = [SimpleNamespace(symbol=i) for i in range(35)]
+    q_contracts, tickers = run(pipeline.qualify_and_tickers(contracts))
+    assert [c.symbol for c in q_contracts] == list(range(0, 35, 2))
+    assert [t.contract.symbol for t in tickers] == list(range(0, 35, 2))
+    assert broker.qualify_calls == 4
+    assert broker.ticker_calls == 4
+
+
+def test_ContractPipeline_chunk_size_bounded_by_limiter():
+    broker = FakeBroker()
+    pipeline = ContractPipeline(broker, RateLimiter(5, 0.01), chunk_size=50)
+    contracts = [SimpleNamespace(symbol=2 * i) for i in range(12)]
+    tickers = run(pipeline.tickers(contracts))
+    assert len(tickers) == 12
+    assert broker.ticker_calls == 3
+
+
+def test_ContractPipeline_stream():
+    broker = FakeBroker()
+    pipeline = ContractPipeline(broker, RateLimiter(1000, 1.0), chunk_size=10)
+    contracts = [SimpleNamespace(symbol=i) for i in range(30)]
+
+    async def consume():
+        return [b async for b in pipeline.stream(contracts)]
+
+    batches = run(consume())
+    assert len(batches) == 3
+    symbols = sorted(t.contract.symbol for _, tickers in batches for t in tickers)
+    assert symbols == list(range(0, 30, 2))
+    # every ticker is requested once
+    assert broker.ticker_calls == 3
+
+
+def test_ContractPipeline_skips_cached_qualification(tmp_path):
+    broker = FakeBroker()
+    cache = ContractCache(tmp_path / "contracts.db")
+    pipeline = ContractPipeline(broker, RateLimiter(1000, 1.0), chunk_size=10, cache=cache)
+    contracts = [
+        SimpleNamespace(secType="STK", symbol=str(2 * i), lastTradeDateOrContractMonth="",
+                        strike=0.0, right="", exchange="SMART", currency="USD")
+        for i in range(10)
+    ]
+    run(pipeline.qualify(contracts))
+    q_contracts, tickers = run(pipeline.qualify_and_tickers(contracts))
+    assert len(q_contracts) == len(tickers) == 10
+    assert broker.qualify_calls == 1
+    assert cache.hits == 10
+    assert cache.misses == 10
+
+
+def test_ContractPipeline_qualify_with_failures():
+    class FailingBroker(FakeBroker):
+        async def qualifyContractsAsync(self, *contracts):
+            if any(c.symbol == "20" for c in contracts):
+                raise ConnectionError("Timeout")
+            return await super().qualifyContractsAsync(*contracts)
+
+    broker = FailingBroker()
+    pipeline = ContractPipeline(broker, RateLimiter(1000, 1.0), chunk_size=10)
+    contracts = [SimpleNamespace(symbol=str(i)) for i in range(30)]
+    q_contracts, failures = run(pipeline.qualify_with_failures(contracts))
+    assert [c.symbol for c in q_contracts] == [str(i) for i in range(0, 20, 2)]
+    reasons = {c.symbol: reason for c, reason in failures}
+    assert len(reasons) == 20
+    assert reasons["1"] == "Unknown or ambiguous contract"
+    assert reasons["25"] == "Timeout"
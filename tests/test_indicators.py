@@ -0,0 +1,179 @@
+import dataclasses
+import datetime
+import numpy as np
+import pytest
+from optopus.asset import Bar
+from optopus.computation import calc_diff, calc_pct_change, calc_rsi, calc_sma
+from optopus.indicators import (
+    EWMean,
+    IndicatorEngine,
+    IndicatorRegistry,
+    IndicatorSpec,
+    RollingMean,
+    RSI,
+    default_registry,
+)
+from optopus.panel import PricePanel
+from optopus.settings import (
+    FAST_SMA_WINDOW,
+    SLOW_SMA_WINDOW,
+    VERY_SLOW_SMA_WINDOW,
+    RSI_WINDOW,
+)
+
+
+def bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    start = datetime.date(2018, 1, 1)
+    return tuple(
+        Bar(count=1, open=c, high=c, low=c, close=float(c), average=c, volume=1,
+            time=start + datetime.timedelta(days=i))
+        for i, c in enumerate(closes)
+    )
+
+
+def expected(values):
+    closes = PricePanel.from_columns({"A": [b.close for b in values]})
+    fast = calc_sma(closes, FAST_SMA_WINDOW)
+    speed = calc_pct_change(fast, FAST_SMA_WINDOW)
+    return {
+        "fast_sma": fast.column("A"),
+        "slow_sma": calc_sma(closes, SLOW_SMA_WINDOW).column("A"),
+        "very_slow_sma": calc_sma(closes, VERY_SLOW_SMA_WINDOW).column("A"),
+        "rsi": calc_rsi(closes, RSI_WINDOW).column("A"),
+        "fast_sma_speed": speed.column("A"),
+        "fast_sma_speed_diff": calc_diff(speed, 1).column("A"),
+    }
+
+
+def assert_matches(indicators, values):
+    for name, series in expected(values).items():
+        np.testing.assert_allclose(indicators.series(name), series, rtol=1e-9, equal_nan=True)
+
+
+def test_IndicatorEngine_full_matches_calc_functions():
+    values = bars(300)
+    indicators = IndicatorEngine().update("A", values)
+    assert_matches(indicators, values)
+    assert indicators.price_pct == pytest.approx(values[-1].close / values[-2].close - 1)
+
+
+def test_IndicatorEngine_online_matches_calc_functions():
+    values = bars(600)
+    engine = IndicatorEngine()
+    engine.update("A", values[:10])
+    for i in range(11, len(values) + 1):
+        indicators = engine.update("A", values[:i])
+    assert engine.full_updates == 1
+    assert engine.bar_updates == 590
+    assert_matches(indicators, values)
+    assert indicators.price_pct == pytest.approx(values[-1].close / values[-2].close - 1)
+
+
+def test_IndicatorEngine_recomputes_revised_bars():
+    values = bars(300)
+    engine = IndicatorEngine()
+    engine.update("A", values)
+    revised = values[:-1] + (dataclasses.replace(values[-1], close=1.0),)
+    indicators = engine.update("A", revised)
+    assert engine.full_updates == 2
+    assert_matches(indicators, revised)
+
+
+def test_IndicatorEngine_series_are_read_only_views():
+    values = bars(300)
+    engine = IndicatorEngine()
+    before = engine.update("A", values[:299]).series("fast_sma")
+    after = engine.update("A", values).series("fast_sma")
+    assert len(before) == 299 and len(after) == 300
+    with pytest.raises(ValueError):
+        after[0] = 1.0
+
+
+def test_RSI_wilder_matches_calc_rsi():
+    closes = np.array([b.close for b in bars(200)])
+    online = RSI(RSI_WINDOW, wilder=True)
+    values = [online.update(x) for x in closes]
+    full = RSI(RSI_WINDOW, wilder=True).run(closes)
+    expected_rsi = calc_rsi(PricePanel.from_columns({"A": closes}), RSI_WINDOW, wilder=True).column("A")
+    np.testing.assert_allclose(values, expected_rsi, rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(full, expected_rsi, rtol=1e-9, equal_nan=True)
+
+
+def test_RollingMean_run_then_update():
+    xs = np.arange(10, dtype=float)
+    mean = RollingMean(3)
+    mean.run(xs)
+    assert mean.update(10.0) == pytest.approx(9.0)
+
+
+def test_IndicatorRegistry_orders_inputs_first():
+    registry = IndicatorRegistry((
+        IndicatorSpec("b", RollingMean, 3, "a"),
+        IndicatorSpec("c", EWMean, 2, "b"),
+        IndicatorSpec("a", RollingMean, 2),
+    ))
+    assert [s.name for s in registry.order()] == ["a", "b", "c"]
+    registry.register(IndicatorSpec("d", RollingMean, 2, "missing"))
+    with pytest.raises(ValueError):
+        registry.order()
+    registry.unregister("d")
+    with pytest.raises(ValueError):
+        registry.register(IndicatorSpec("a", RollingMean, 5))
+    cycle = IndicatorRegistry((IndicatorSpec("x", RollingMean, 2, "y"), IndicatorSpec("y", RollingMean, 2, "x")))
+    with pytest.raises(ValueError):
+        cycle.order()
+
+
+def test_IndicatorEngine_custom_indicator_shares_intermediates():
+    values = bars(300)
+    registry = default_registry()
+    registry.register(IndicatorSpec("fast_sma_ewm", EWMean, 10, "fast_sma"))
+    registry.register(IndicatorSpec("very_slow_mean", RollingMean, 5, "very_slow_sma", measure=False))
+    engine = IndicatorEngine(registry=registry)
+    engine.update("A", values[:-1])
+    indicators = engine.update("A", values)
+    assert_matches(indicators, values)
+    expected = EWMean(10).run(np.array(indicators.series("fast_sma")))
+    np.testing.assert_allclose(indicators.series("fast_sma_ewm"), expected, rtol=1e-9, equal_nan=True)
+    assert "very_slow_mean" not in registry.measures()
+    assert set(engine.timings) == {s.name for s in registry}
+    assert all(t > 0 for t in engine.timings.values())
+
+
+def test_DataManager_custom_indicator_measures():
+    from optopus.data_manager import DataManager
+    from optopus.synthetic_adapter import SyntheticDataAdapter, synthetic_watch_list
+
+    registry = default_registry()
+    registry.register(IndicatorSpec("sma_5", RollingMean, 5))
+    dm = DataManager(SyntheticDataAdapter(), synthetic_watch_list(2), streaming=False, indicators=registry)
+    dm.create_assets()
+    dm.update_assets()
+    dm.update_histories()
+    dm.compute()
+    m = dm.assets["SYN0001"].measures
+    closes = [b.close for b in dm.assets["SYN0001"].price_history.values]
+    assert m.indicators["sma_5"][-1] == pytest.approx(np.mean(closes[-5:]))
+    assert len(m.fast_sma) == len(closes)
+    assert "sma_5" in dm.indicator_timings
+
+
+def test_DataManager_indicator_registered_after_compute():
+    from optopus.data_manager import DataManager
+    from optopus.synthetic_adapter import SyntheticDataAdapter, synthetic_watch_list
+
+    registry = default_registry()
+    dm = DataManager(SyntheticDataAdapter(), synthetic_watch_list(2), streaming=False, indicators=registry)
+    dm.create_assets()
+    dm.update_assets()
+    dm.update_histories()
+    dm.compute()
+    registry.register(IndicatorSpec("sma_10", RollingMean, 10))
+    dm.compute()
+    closes = dm.assets["SYN0001"].price_history.close
+    assert dm.assets["SYN0001"].measures.indicators["sma_10"][-1] == pytest.approx(np.mean(closes[-10:]))
+    registry.unregister("sma_10")
+    dm.compute()
+    assert "sma_10" not in dm.assets["SYN0001"].measures.indicators
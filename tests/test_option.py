@@ -184,3 +184,23 @@ def test_Option_DTE():
                 underlying_dividends=2.1,
                 time=time)
     assert opt.DTE == 10
+
+
+def test_Option_slotted_and_pickled():
+    import copy
+    import pickle
+
+    id = AssetId("SPY", AssetType.Stock, Currency.USDollar, None)
+    opt_id = OptionId(id, AssetType.Option, datetime.date(2018, 9, 21), 100, RightType.Call, 100, None)
+    opt = Option(opt_id, None, None, None, 6.0, 1, 7.0, 1, None, None, None, 10,
+                 0.5, 0.1, -0.02, 0.1, 0.2, 100.0, 0.0, None)
+    assert not hasattr(opt, "__dict__")
+    assert not hasattr(opt_id, "__dict__")
+    assert pickle.loads(pickle.dumps(opt)) == opt
+    assert copy.deepcopy(opt) == opt
+    restored = Option.__new__(Option)
+    # states pickled before the slots were dicts too
+    restored.__setstate__({f: getattr(opt, f) for f in Option.__slots__})
+    assert restored == opt
+    with pytest.raises(FrozenInstanceError):
+        opt.bid = 1.0
@@ -0,0 +1,108 @@
+import datetime
+import pickle
+import numpy as np
+import pytest
+from optopus.asset import AssetId
+from optopus.common import AssetType, Currency
+from optopus.option import Option, OptionId, RightType
+from optopus.option_chain import OptionChain
+
+SPY = AssetId("SPY", AssetType.ETF, Currency.USDollar, None)
+EXPIRATION = datetime.date(2018, 10, 19)
+
+
+def option(strike, right, bid=1.0, ask=1.2, volume=10, delta=None):
+    id = OptionId(SPY, AssetType.Option, EXPIRATION, strike, right, "100", None)
+    return Option(id=id, high=None, low=None, close=None, bid=bid, bid_size=1.0, ask=ask,
+                  ask_size=1.0, last=None, last_size=None, option_price=None, volume=volume,
+                  delta=delta, gamma=None, theta=None, vega=None, iv=None,
+                  underlying_price=None, underlying_dividends=None, time=None)
+
+
+def test_OptionChain_sorted_and_round_trip():
+    options = [
+        option(105.0, RightType.Call, delta=0.3),
+        option(95.0, RightType.Put, delta=-0.3),
+        option(100.0, RightType.Call, delta=0.5),
+        option(100.0, RightType.Put, bid=None, volume=None),
+    ]
+    chain = OptionChain.from_options(options)
+    assert len(chain) == 4
+    assert chain.call.tolist() == [False, False, True, True]
+    assert chain.strike.tolist() == [95.0, 100.0, 100.0, 105.0]
+    assert list(chain.puts) == [options[1], options[3]]
+    assert list(chain.calls) == [options[2], options[0]]
+    assert chain[-1] == options[0]
+    assert np.isnan(chain.midpoint[1])
+    assert chain.midpoint[0] == pytest.approx(1.1)
+    with pytest.raises(ValueError):
+        chain.strike[0] = 1.0
+    assert list(pickle.loads(pickle.dumps(chain))) == list(chain)
+
+
+def test_OptionChain_lookup_and_filters():
+    chain = OptionChain.from_options(
+        [option(float(k), r, volume=k) for r in RightType for k in range(80, 121)]
+    )
+    assert chain.option(95, RightType.Put).id.strike == 95.0
+    assert chain.option(95.0, RightType.Call).id.right == RightType.Call
+    with pytest.raises(KeyError):
+        chain.index(95.5, RightType.Put)
+    puts = chain.puts
+    otm = puts[(puts.strike <= 100.0) & (puts.volume > 90)]
+    assert otm.strike.tolist() == [91.0 + i for i in range(10)]
+    assert all(o.id.right == RightType.Put for o in otm)
+    # slices are views of the chain columns
+    assert np.shares_memory(chain.calls.strike, chain.values)
+
+
+def test_OptionChain_merge_replaces_options():
+    chain = OptionChain.from_options([option(95.0, RightType.Put), option(100.0, RightType.Put)])
+    batch = OptionChain.from_options([option(100.0, RightType.Put, bid=2.0), option(100.0, RightType.Call)])
+    merged = chain.merge(batch)
+    assert [(o.id.strike, o.id.right) for o in merged] == [
+        (95.0, RightType.Put), (100.0, RightType.Put), (100.0, RightType.Call)
+    ]
+    assert merged.option(100.0, RightType.Put).bid == 2.0
+
+
+def test_OptionChain_to_df_doesnt_copy():
+    chain = OptionChain.from_options([option(95.0, RightType.Put), option(100.0, RightType.Call)])
+    df = chain.to_df()
+    assert df["right"].tolist() == ["P", "C"]
+    assert df["code"].tolist() == ["SPY", "SPY"]
+    assert np.shares_memory(df["bid"].to_numpy(), chain.values)
+
+
+def test_OptionChain_nearest_delta_and_between():
+    k = np.arange(80.0, 121.0)
+    strike = np.concatenate((k, k))
+    call = np.repeat([False, True], len(k))
+    delta = np.where(call, 1.0, 0.0) - (strike - 80.0) / 40.0
+    delta[3] = np.nan
+    chain = OptionChain.from_columns(SPY, EXPIRATION, call, {"strike": strike, "delta": delta})
+
+    assert chain.nearest(100.4, RightType.Put).id.strike == 100.0
+    assert chain.nearest(100.6, RightType.Call).id.strike == 101.0
+    assert chain.nearest(10.0, RightType.Put).id.strike == 80.0
+    assert chain.nearest(500.0, RightType.Call).id.strike == 120.0
+
+    put = chain.closest_delta(-0.3)
+    assert (put.id.right, put.id.strike) == (RightType.Put, 92.0)
+    assert chain.closest_delta(0.26).id.strike == 110.0
+    assert chain.strike_for_delta(-0.3125) == pytest.approx(92.5)
+    # an option without a delta is never chosen
+    assert chain.closest_delta(-(83.0 - 80.0) / 40.0).id.strike != 83.0
+
+    between = chain.between(95.0, 97.5, RightType.Put)
+    assert between.strike.tolist() == [95.0, 96.0, 97.0]
+    assert np.shares_memory(between.values, chain.values)
+    both = chain.between(119.5, 200.0)
+    assert [(o.id.right, o.id.strike) for o in both] == [
+        (RightType.Put, 120.0), (RightType.Call, 120.0)
+    ]
+    assert len(chain.between(100.2, 100.8, RightType.Call)) == 0
+
+    greeks = chain.interpolate([82.5, 100.0], RightType.Put, ("delta", "iv"))
+    np.testing.assert_allclose(greeks["delta"], [-0.0625, -0.5])
+    assert np.isnan(greeks["iv"]).all()
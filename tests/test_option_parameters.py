@@ -0,0 +1,33 @@
+import datetime
+from optopus.option_parameters import OptionParameters, OptionParametersCache
+
+
+def parameters(created):
+    return OptionParameters(
+        code="SPY",
+        exchange="SMART",
+        trading_class="SPY",
+        multiplier="100",
+        expirations=(datetime.date(2018, 9, 21), datetime.date(2018, 10, 19)),
+        strikes=(95.0, 97.5, 100.0, 102.5, 105.0),
+        created=created,
+    )
+
+
+def test_OptionParameters_strikes_between():
+    p = parameters(datetime.date(2018, 9, 1))
+    assert p.strikes_between(95.0, 105.0) == (97.5, 100.0, 102.5)
+    assert p.strikes_between(96.0, 104.0) == (97.5, 100.0, 102.5)
+    assert p.strikes_between(0.0, 1000.0) == p.strikes
+    assert p.strikes_between(106.0, 110.0) == ()
+
+
+def test_OptionParametersCache_daily_invalidation():
+    today = datetime.date(2018, 9, 1)
+    cache = OptionParametersCache(lambda: today)
+    assert cache.get("SPY") is None
+    cache.add(parameters(today))
+    assert cache.get("SPY").strikes[0] == 95.0
+
+    today = datetime.date(2018, 9, 2)
+    assert cache.get("SPY") is None
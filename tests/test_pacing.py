@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from optopus.pacing import HistoricalJob, HistoricalPacer, HistoricalScheduler, RateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_RateLimiter_burst_inside_limit():
+    clock = FakeClock()
+    limiter = RateLimiter(50, 1.0, clock)
+    assert limiter.delay(50) == 0
+    limiter.record(50)
+    assert limiter.delay(1) == 1.0
+
+
+def test_RateLimiter_sliding_window():
+    clock = FakeClock()
+    limiter = RateLimiter(3, 1.0, clock)
+    limiter.record(1)
+    clock.now = 0.4
+    limiter.record(2)
+    clock.now = 0.5
+    # the oldest request leaves the window at 1.0
+    assert limiter.delay(1) == pytest.approx(0.5)
+    # the two requests sent at 0.4 leave it at 1.4
+    assert limiter.delay(3) == pytest.approx(0.9)
+    clock.now = 1.0
+    assert limiter.delay(1) == 0
+
+
+def test_RateLimiter_too_many_requests():
+    limiter = RateLimiter(5, 1.0)
+    with pytest.raises(ValueError):
+        limiter.delay(6)
+
+
+def test_RateLimiter_acquire_waits():
+    limiter = RateLimiter(2, 0.05)
+
+    async def send():
+        for _ in range(3):
+            await limiter.acquire(2)
+
+    loop = asyncio.new_event_loop()
+    start = loop.time()
+    loop.run_until_complete(send())
+    elapsed = loop.time() - start
+    loop.close()
+    assert elapsed >= 0.1
+
+
+def test_HistoricalPacer_identical_requests():
+    clock = FakeClock()
+    pacer = HistoricalPacer(clock=clock)
+    pacer.record(("SPY", "TRADES", "1 Y"), ("SPY", "TRADES"))
+    clock.now = 5.0
+    assert pacer.delay(("SPY", "TRADES", "1 Y"), ("SPY", "TRADES")) == pytest.approx(10.0)
+    assert pacer.delay(("SPY", "TRADES", "5 D"), ("SPY", "TRADES")) == 0
+
+
+def test_HistoricalPacer_requests_per_contract():
+    clock = FakeClock()
+    pacer = HistoricalPacer(clock=clock)
+    for i in range(5):
+        pacer.record(("SPY", "TRADES", i), ("SPY", "TRADES"))
+    assert pacer.delay(("SPY", "TRADES", 5), ("SPY", "TRADES")) == pytest.approx(2.0)
+    assert pacer.delay(("XLE", "TRADES", 5), ("XLE", "TRADES")) == 0
+
+
+def test_HistoricalPacer_requests_per_period():
+    clock = FakeClock()
+    pacer = HistoricalPacer(clock=clock)
+    for i in range(60):
+        clock.now = i
+        pacer.record(i, i)
+    assert pacer.delay(60, 60) == pytest.approx(541.0)
+
+
+def test_HistoricalScheduler_priority_and_progress():
+    sent = []
+    progress = []
+
+    def job(priority, name):
+        async def run():
+            sent.append(name)
+            if name == "fails":
+                raise ValueError()
+            return name
+        return HistoricalJob(priority, name, name, run)
+
+    jobs = [job(1, "stale"), job(0, "missing"), job(1, "fails")]
+    scheduler = HistoricalScheduler(max_open=1)
+    loop = asyncio.new_event_loop()
+    results = loop.run_until_complete(
+        scheduler.run(jobs, lambda done, total: progress.append((done, total)))
+    )
+    loop.close()
+    assert sent == ["missing", "stale", "fails"]
+    assert results == ["stale", "missing", None]
+    assert progress == [(1, 3), (2, 3), (3, 3)]
@@ -0,0 +1,101 @@
+import datetime
+import numpy as np
+import pandas as pd
+from optopus.asset import Bar, History
+from optopus.computation import calc_beta, calc_correlation, calc_stdev
+from optopus.panel import PricePanel
+
+
+def history(closes, start=datetime.date(2018, 1, 1), skip=()):
+    return History(tuple(
+        Bar(count=1, open=c, high=c, low=c, close=c, average=c, volume=1,
+            time=start + datetime.timedelta(days=i))
+        for i, c in enumerate(closes) if i not in skip
+    ))
+
+
+def test_PricePanel_aligns_missing_dates():
+    panel = PricePanel.from_histories({
+        "SPY": history([1.0, 2.0, 3.0, 4.0]),
+        "XLE": history([10.0, 0.0, 20.0, 40.0], skip=(1,)),
+        "NEW": history([5.0, 6.0], start=datetime.date(2018, 1, 3)),
+    })
+    assert len(panel) == 4
+    assert panel.codes == ("SPY", "XLE", "NEW")
+    np.testing.assert_array_equal(panel.column("XLE"), [10.0, 10.0, 20.0, 40.0])
+    np.testing.assert_array_equal(panel.column("NEW"), [np.nan, np.nan, 5.0, 6.0])
+    assert panel.last_time() == datetime.date(2018, 1, 4)
+    assert len(panel.complete_returns()) == 1
+
+
+def test_PricePanel_select():
+    panel = PricePanel.from_columns({"A": [1.0, 2.0], "B": [3.0, 4.0]})
+    assert panel.select(["B"]).values.tolist() == [[3.0], [4.0]]
+
+
+def test_calc_measures_match_pandas():
+    rng = np.random.default_rng(0)
+    closes = {c: list(100 * np.exp(np.cumsum(rng.normal(0, 0.01, 300)))) for c in ("SPY", "XLE", "XLF")}
+    panel = PricePanel.from_columns(closes)
+    returns = pd.DataFrame(closes).pct_change().dropna().values[-252:]
+    covariance = np.cov(returns, rowvar=False)
+    beta = calc_beta(panel)
+    assert beta["SPY"] == 1.0
+    assert np.isclose(beta["XLE"], covariance[0, 1] / covariance[0, 0])
+    assert np.isclose(calc_correlation(panel)["XLF"], np.corrcoef(returns, rowvar=False)[0, 2])
+    assert np.isclose(calc_stdev(panel)["XLE"], np.std(returns[-22:, 1]))
+
+
+def test_assets_directional_assumption_matches_sma_comparison():
+    from optopus.asset import AssetId, ETF, Forecast, NO_DIRECTION
+    from optopus.common import AssetType, Currency, Direction
+    from optopus.computation import assets_directional_assumption
+    from optopus.indicators import IndicatorEngine
+
+    rng = np.random.default_rng(1)
+    assets = {}
+    for code, n in (("SPY", 120), ("XLE", 90)):
+        a = ETF(AssetId(code, AssetType.ETF, Currency.USDollar, None))
+        closes = list(100 * np.exp(np.cumsum(rng.normal(0, 0.02, n))))
+        a.price_history = history(closes, start=datetime.date(2018, 1, 1) + datetime.timedelta(days=120 - n))
+        assets[code] = a
+
+    directions = assets_directional_assumption(assets)
+    engine = IndicatorEngine()
+    for code, a in assets.items():
+        indicators = engine.update(code, a.price_history.values)
+        fast, slow = indicators.series("fast_sma"), indicators.series("slow_sma")
+        expected = tuple(
+            np.nan if np.isnan(f) or np.isnan(s)
+            else Direction.Bullish.value if f > s else Direction.Bearish.value
+            for f, s in zip(fast, slow)
+        )
+        forecast = Forecast(directions[code])
+        assert directions[code].dtype == np.int8
+        assert len(forecast.direction) == len(a.price_history.values)
+        assert forecast.direction[0] == NO_DIRECTION
+        assert [d for d in forecast.directions() if d == d] == [d for d in expected if d == d]
+        assert forecast.last_direction.value == expected[-1]
+
+
+def test_assets_directional_assumption_lines_up_with_own_bars():
+    from optopus.asset import AssetId, ETF
+    from optopus.common import AssetType, Currency
+    from optopus.computation import assets_directional_assumption, encode_direction
+    from optopus.indicators import IndicatorEngine
+
+    rng = np.random.default_rng(2)
+    assets = {}
+    for code, skip in (("SPY", ()), ("XLE", tuple(range(30, 42)))):
+        a = ETF(AssetId(code, AssetType.ETF, Currency.USDollar, None))
+        a.price_history = history(list(100 * np.exp(np.cumsum(rng.normal(0, 0.02, 120)))), skip=skip)
+        assets[code] = a
+
+    engine = IndicatorEngine()
+    directions = assets_directional_assumption(assets, engine)
+    xle = engine.update("XLE", assets["XLE"].price_history.values)
+    assert len(directions["XLE"]) == len(assets["XLE"].price_history.values) == 108
+    np.testing.assert_array_equal(
+        directions["XLE"], encode_direction(xle.series("fast_sma"), xle.series("slow_sma"))
+    )
+    assert engine.full_updates == 2
@@ -0,0 +1,59 @@
+import datetime
+import numpy as np
+from optopus.asset import Bar
+from optopus.indicators import IndicatorEngine, default_registry
+from optopus.parallel import ParallelIndicators
+
+SERIES_NAMES = default_registry().series_names()
+
+
+def bars(n, seed=0):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    start = datetime.date(2018, 1, 1)
+    return tuple(
+        Bar(count=1, open=c, high=c, low=c, close=float(c), average=c, volume=1,
+            time=start + datetime.timedelta(days=i))
+        for i, c in enumerate(closes)
+    )
+
+
+def test_ParallelIndicators_match_single_process():
+    histories = {f"A{i}": bars(250 + 10 * i, seed=i) for i in range(7)}
+    histories["EMPTY"] = ()
+    pool = ParallelIndicators(workers=2, min_assets=1)
+    try:
+        engine = IndicatorEngine(pool=pool)
+        single = IndicatorEngine()
+        parallel = engine.update_many({c: b[:-5] for c, b in histories.items()})
+        assert engine.full_updates == len(histories)
+        assert set(engine.timings) == {s.name for s in engine.registry}
+        for code, b in histories.items():
+            expected = single.update(code, b[:-5])
+            assert parallel[code].price_pct == expected.price_pct or np.isnan(expected.price_pct)
+            for name in SERIES_NAMES:
+                np.testing.assert_array_equal(parallel[code].series(name), expected.series(name))
+
+        # the indicators computed in the pool continue bar by bar
+        updated = engine.update_many(histories)
+        assert engine.full_updates == len(histories)
+        assert engine.bar_updates == 5 * (len(histories) - 1)
+        for code, b in histories.items():
+            expected = single.update(code, b)
+            for name in SERIES_NAMES:
+                np.testing.assert_allclose(
+                    updated[code].series(name), expected.series(name), rtol=1e-12, equal_nan=True
+                )
+    finally:
+        pool.close()
+
+
+def test_ParallelIndicators_threshold():
+    pool = ParallelIndicators(workers=4, min_assets=3)
+    assert not pool.enabled(2)
+    assert pool.enabled(3)
+    assert not ParallelIndicators(workers=1, min_assets=0).enabled(100)
+    engine = IndicatorEngine(pool=pool)
+    engine.update_many({"A": bars(50), "B": bars(60)})
+    # below the threshold no process was started
+    assert pool._executor is None
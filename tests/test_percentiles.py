@@ -0,0 +1,71 @@
+import datetime
+import numpy as np
+from optopus.asset import AssetId, Bar, ETF, History
+from optopus.common import AssetType, Currency
+from optopus.percentiles import HistoryPercentiles, SortedColumns
+
+
+def history(lows, highs=None):
+    highs = highs if highs else lows
+    start = datetime.date(2018, 1, 1)
+    return History(tuple(
+        Bar(count=1, open=l, high=h, low=l, close=l, average=l, volume=1,
+            time=start + datetime.timedelta(days=i))
+        for i, (l, h) in enumerate(zip(lows, highs))
+    ))
+
+
+def asset(code, prices, ivs, iv_highs=None):
+    a = ETF(AssetId(code, AssetType.ETF, Currency.USDollar, None))
+    a.price_history = history(prices)
+    a.iv_history = history(ivs, iv_highs)
+    return a
+
+
+def test_SortedColumns_count_below():
+    columns = SortedColumns()
+    columns.build({"A": np.array([1.0, 2.0, 3.0]), "B": np.array([-5.0, 10.0]), "C": np.array([])})
+    counts = columns.count_below(["B", "A", "C", "A"], np.array([0.0, 2.5, 1.0, 100.0]))
+    assert counts.tolist() == [1, 2, 0, 3]
+
+
+def test_HistoryPercentiles_match_definitions():
+    assets = {
+        "A": asset("A", [10.0, 12.0, 11.0, 13.0], [0.2, 0.3, 0.25, 0.4], [0.25, 0.5, 0.3, 0.45]),
+        "B": asset("B", [50.0, 40.0], [0.1, 0.2]),
+    }
+    p = HistoryPercentiles()
+    p.update(assets)
+    codes = ["A", "B"]
+    np.testing.assert_allclose(p.price_percentile(codes, np.array([12.5, 45.0])), [3 / 4, 1 / 2])
+    iv = p.iv(codes)
+    assert iv.tolist() == [0.4, 0.2]
+    np.testing.assert_allclose(p.iv_percentile(codes, iv), [3 / 4, 1 / 2])
+    np.testing.assert_allclose(p.iv_rank(codes, iv), [(0.4 - 0.2) / (0.5 - 0.2), 1.0])
+
+
+def test_HistoryPercentiles_refresh_only_changed_histories():
+    assets = {"A": asset("A", [1.0, 2.0], [0.1, 0.2]), "B": asset("B", [1.0], [0.1])}
+    p = HistoryPercentiles()
+    p.update(assets)
+    p.update(assets)
+    assert p.refreshes == 2
+    assets["B"].price_history = history([1.0, 3.0])
+    p.update(assets)
+    assert p.refreshes == 3
+    assert p.price_percentile(["B"], np.array([2.0])).tolist() == [0.5]
+
+
+def test_SortedColumns_ignores_nan():
+    columns = SortedColumns()
+    columns.build({"A": np.array([1.0, np.nan, 3.0]), "B": np.array([2.0, 4.0, 6.0])})
+    assert columns.lengths(["A", "B"]).tolist() == [2, 3]
+    assert columns.count_below(["B", "A"], np.array([5.0, 2.0])).tolist() == [2, 1]
+    assert columns.count_below(["A", "B"], np.array([np.nan, np.nan])).tolist() == [0, 0]
+
+
+def test_HistoryPercentiles_price_percentile_without_quote():
+    assets = {"A": asset("A", [10.0, 12.0, 11.0], [0.2, 0.3, 0.25])}
+    p = HistoryPercentiles()
+    p.update(assets)
+    assert p.price_percentile(["A"], np.array([np.nan])).tolist() == [0.0]
@@ -0,0 +1,104 @@
+import datetime
+import math
+import numpy as np
+from optopus.asset import AssetId
+from optopus.common import AssetType, Currency
+from optopus.option import Option, OptionId, RightType
+from optopus.option_chain import OptionChain
+from optopus.pricing import (
+    MAX_VOLATILITY, MIN_TIME, MIN_VOLATILITY, black_scholes, fill_missing_greeks,
+    implied_volatility, norm_cdf,
+)
+
+
+def test_norm_cdf_matches_erf():
+    x = np.linspace(-10, 10, 2001)
+    expected = [0.5 * math.erfc(-v / math.sqrt(2)) for v in x]
+    np.testing.assert_allclose(norm_cdf(x), expected, rtol=1e-13, atol=1e-16)
+
+
+def test_black_scholes_put_call_parity_and_greeks():
+    s, k, t, r, sigma = 100.0, 95.0, 0.25, 0.02, 0.3
+    call = black_scholes(True, s, k, t, sigma, r)
+    put = black_scholes(False, s, k, t, sigma, r)
+    assert np.isclose(call.price - put.price, s - k * math.exp(-r * t))
+    assert np.isclose(call.delta - put.delta, 1.0)
+    assert call.gamma == put.gamma
+    h = 1e-4
+    up = black_scholes(True, s + h, k, t, sigma, r).price
+    down = black_scholes(True, s - h, k, t, sigma, r).price
+    assert np.isclose(call.delta, (up - down) / (2 * h))
+    vega = (black_scholes(True, s, k, t, sigma + 0.01, r).price
+            - black_scholes(True, s, k, t, sigma - 0.01, r).price) / 2
+    assert np.isclose(call.vega, vega, rtol=1e-3)
+    theta = black_scholes(True, s, k, t - 1 / 365, sigma, r).price - call.price
+    assert np.isclose(call.theta, theta, rtol=1e-2)
+
+
+def test_implied_volatility_recovers_volatility():
+    rng = np.random.default_rng(0)
+    n = 10000
+    call = rng.random(n) < 0.5
+    s = rng.uniform(20, 500, n)
+    k = s * rng.uniform(0.7, 1.3, n)
+    t = rng.uniform(1, 365, n) / 365
+    sigma = rng.uniform(0.05, 1.5, n)
+    price = black_scholes(call, s, k, t, sigma).price
+    solved = implied_volatility(call, price, s, k, t)
+    # options without time value don't determine the volatility
+    priced = black_scholes(call, s, k, t, solved).price
+    ok = ~np.isnan(solved)
+    assert ok.mean() > 0.95
+    np.testing.assert_allclose(priced[ok], price[ok], rtol=1e-6, atol=1e-8)
+
+
+def test_implied_volatility_outside_bounds_is_nan():
+    assert np.isnan(implied_volatility(True, 0.5, 100.0, 90.0, 0.5))
+    assert np.isnan(implied_volatility(False, 200.0, 100.0, 90.0, 0.5))
+
+
+def test_implied_volatility_out_of_volatility_range_is_nan():
+    t = 30 / 365
+    highest = black_scholes(True, 100.0, 100.0, t, MAX_VOLATILITY).price
+    assert np.isnan(implied_volatility(True, 1.05 * highest, 100.0, 100.0, t))
+    assert np.isnan(implied_volatility(False, 0.15, 100.0, 80.0, MIN_TIME))
+    # struck at the forward, the lower bound is 0
+    k = 100.0 * math.exp(0.02 * t)
+    lowest = black_scholes(True, 100.0, k, t, MIN_VOLATILITY, 0.02).price
+    assert lowest > 0
+    assert np.isnan(implied_volatility(True, 0.5 * lowest, 100.0, k, t, 0.02))
+
+
+def option(strike, right, bid, ask, delta=None, iv=None):
+    id = OptionId(
+        underlying_id=AssetId("SPY", AssetType.ETF, Currency.USDollar, None),
+        asset_type=AssetType.Option,
+        expiration=datetime.date(2018, 10, 19),
+        strike=strike,
+        right=right,
+        multiplier="100",
+        contract=None,
+    )
+    return Option(id=id, high=None, low=None, close=None, bid=bid, bid_size=1, ask=ask,
+                  ask_size=1, last=None, last_size=None, option_price=None, volume=1,
+                  delta=delta, gamma=None if delta is None else 0.1, theta=None,
+                  vega=None if delta is None else 0.1, iv=iv, underlying_price=None,
+                  underlying_dividends=None, time=None)
+
+
+def test_fill_missing_greeks():
+    today = datetime.date(2018, 9, 19)
+    t = 30 / 365
+    mid = float(black_scholes(False, 100.0, 95.0, t, 0.25).price)
+    options = OptionChain.from_options([
+        option(95.0, RightType.Put, mid - 0.05, mid + 0.05),
+        option(100.0, RightType.Put, 2.0, 2.2, delta=-0.5, iv=0.2),
+        option(50.0, RightType.Put, None, None),
+    ])
+    filled = fill_missing_greeks(options, 100.0, today)
+    put = filled.option(95.0, RightType.Put)
+    assert np.isclose(put.iv, 0.25)
+    assert -0.5 < put.delta < 0
+    assert put.underlying_price == 100.0
+    assert filled.option(100.0, RightType.Put) == options.option(100.0, RightType.Put)
+    assert filled.option(50.0, RightType.Put).delta is None
@@ -0,0 +1,66 @@
+import numpy as np
+from optopus.computation import calc_beta, calc_correlation, calc_stdev
+from optopus.panel import PricePanel
+from optopus.rolling_moments import RollingMoments, UniverseMoments
+
+
+def closes(n_bars=400, seed=0):
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0, 0.01, n_bars)
+    columns = {"SPY": 100 * np.exp(np.cumsum(market))}
+    for i in range(1, 4):
+        returns = rng.uniform(0.5, 1.5) * market + rng.normal(0, 0.01, n_bars)
+        columns[f"A{i}"] = 50 * np.exp(np.cumsum(returns))
+    return columns
+
+
+def head(columns, n):
+    return PricePanel.from_columns({c: v[:n] for c, v in columns.items()})
+
+
+def assert_matches_calc(moments, panel):
+    for online, full in (
+        (moments.beta(), calc_beta(panel)),
+        (moments.correlation(), calc_correlation(panel)),
+        (moments.stdev(), calc_stdev(panel)),
+    ):
+        assert online.keys() == full.keys()
+        np.testing.assert_allclose(list(online.values()), list(full.values()), rtol=1e-9)
+
+
+def test_UniverseMoments_cold_matches_calc_functions():
+    panel = head(closes(), 400)
+    moments = UniverseMoments()
+    moments.update(panel)
+    assert_matches_calc(moments, panel)
+
+
+def test_UniverseMoments_appended_rows_match_calc_functions():
+    columns = closes()
+    moments = UniverseMoments()
+    moments.update(head(columns, 100))
+    for n in range(101, 401):
+        moments.update(head(columns, n))
+    assert moments.full_updates == 1
+    assert moments.row_updates == 300
+    assert_matches_calc(moments, head(columns, 400))
+
+
+def test_UniverseMoments_recomputes_changed_rows():
+    columns = closes()
+    moments = UniverseMoments()
+    moments.update(head(columns, 300))
+    columns["A1"][299] *= 1.1
+    moments.update(head(columns, 301))
+    assert moments.full_updates == 2
+    assert_matches_calc(moments, head(columns, 301))
+
+
+def test_RollingMoments_skips_incomplete_rows():
+    m = RollingMoments(2, 2, 0)
+    m.append(np.array([0.01, 0.02]))
+    m.append(np.array([np.nan, 0.03]))
+    m.append(np.array([0.03, 0.06]))
+    assert len(m) == 2
+    np.testing.assert_allclose(m.mean(), [0.02, 0.04])
+    np.testing.assert_allclose(m.beta(), [1.0, 2.0])
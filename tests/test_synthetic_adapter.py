@@ -0,0 +1,57 @@
+import datetime
+from optopus.data_manager import DataManager
+from optopus.option import RightType
+from optopus.synthetic_adapter import (
+    SyntheticDataAdapter,
+    monthly_expirations,
+    synthetic_watch_list,
+)
+
+
+def test_synthetic_watch_list():
+    watch_list = synthetic_watch_list(3)
+    assert [d.code for d in watch_list] == ["SPY", "SYN0001", "SYN0002"]
+
+
+def test_SyntheticDataAdapter_deterministic_histories():
+    dm = DataManager(SyntheticDataAdapter(), synthetic_watch_list(2), streaming=False)
+    dm.create_assets()
+    dm.update_assets()
+    dm.update_histories()
+    other = SyntheticDataAdapter()
+    a = dm.assets["SYN0001"]
+    assert a.price_history.values == other.get_price_history(a).values
+    assert len(a.iv_history.values) == len(a.price_history.values)
+    since = a.price_history.values[-3].time
+    assert other.get_price_history(a, since).values == a.price_history.values[-3:]
+
+
+def test_SyntheticDataAdapter_option_chain():
+    da = SyntheticDataAdapter()
+    dm = DataManager(da, synthetic_watch_list(1), streaming=False)
+    dm.create_assets()
+    dm.update_assets()
+    spy = dm.assets["SPY"]
+    expiration = da.get_option_parameters(spy).expirations[0]
+    chain = list(da.get_optionchain(spy, expiration))
+    assert chain[0].id.right == RightType.Put
+    assert chain[-1].id.right == RightType.Call
+    assert all(-1 < o.delta < 0 for o in chain if o.id.right == RightType.Put)
+    assert all(o.bid <= o.ask for o in chain)
+
+
+def test_SyntheticDataAdapter_fills_missing_greeks():
+    da = SyntheticDataAdapter(missing_greeks=0.5)
+    dm = DataManager(da, synthetic_watch_list(1), streaming=False)
+    dm.create_assets()
+    dm.update_assets()
+    spy = dm.assets["SPY"]
+    chain = da.get_optionchain(spy, da.get_option_parameters(spy).expirations[0])
+    assert all(o.delta is not None and o.iv is not None for o in chain)
+
+
+def test_monthly_expirations():
+    assert monthly_expirations(datetime.date(2018, 9, 21), 2) == (
+        datetime.date(2018, 10, 19),
+        datetime.date(2018, 11, 16),
+    )
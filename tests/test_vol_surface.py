@@ -0,0 +1,127 @@
+import datetime
+import numpy as np
+from optopus.asset import AssetId
+from optopus.common import AssetType, Currency
+from optopus.data_manager import DataManager
+from optopus.option import Option, OptionId, RightType
+from optopus.option_chain import OptionChain
+from optopus.pricing import black_scholes
+from optopus.synthetic_adapter import SyntheticDataAdapter, synthetic_watch_list
+from optopus.vol_surface import VolatilitySurface
+
+TODAY = datetime.date(2018, 9, 19)
+
+
+def chain(expiration, ivs, underlying_price=100.0):
+    options = []
+    for strike, iv in ivs.items():
+        for right in (RightType.Put, RightType.Call):
+            id = OptionId(
+                underlying_id=AssetId("SPY", AssetType.ETF, Currency.USDollar, None),
+                asset_type=AssetType.Option,
+                expiration=expiration,
+                strike=strike,
+                right=right,
+                multiplier="100",
+                contract=None,
+            )
+            options.append(Option(
+                id=id, high=None, low=None, close=None, bid=None, bid_size=None, ask=None,
+                ask_size=None, last=None, last_size=None, option_price=None, volume=None,
+                delta=None, gamma=None, theta=None, vega=None, iv=iv,
+                underlying_price=underlying_price, underlying_dividends=None, time=None,
+            ))
+    return OptionChain.from_options(options)
+
+
+def test_VolatilitySurface_smile_and_term_structure():
+    near = TODAY + datetime.timedelta(days=30)
+    far = TODAY + datetime.timedelta(days=120)
+    surface = VolatilitySurface("SPY", r=0.0)
+    surface.update(near, chain(near, {90.0: 0.3, 100.0: 0.2, 110.0: 0.25}), today=TODAY)
+    surface.update(far, chain(far, {90.0: 0.3, 100.0: 0.3, 110.0: 0.3}), today=TODAY)
+    assert surface.expirations == (near, far)
+
+    smile = surface.smile(near)
+    # linear in the log moneyness, flat outside the strikes
+    between = 0.3 - 0.1 * np.log(95 / 90) / np.log(100 / 90)
+    np.testing.assert_allclose(smile.iv([90.0, 95.0, 100.0, 200.0]), [0.3, between, 0.2, 0.25])
+    np.testing.assert_allclose(surface.iv(100.0, near, TODAY), 0.2)
+    np.testing.assert_allclose(surface.iv(100.0, 10 / 365), 0.2)
+    np.testing.assert_allclose(surface.iv(100.0, 400 / 365), 0.3)
+    # total variance is linear in time between the expirations
+    t = 75 / 365
+    w = 0.2 ** 2 * 30 / 365 + (0.3 ** 2 * 120 / 365 - 0.2 ** 2 * 30 / 365) / 2
+    np.testing.assert_allclose(surface.iv(100.0, t), np.sqrt(w / t))
+
+    surface.update(near, chain(near, {120.0: 0.4}), replace=False, today=TODAY)
+    assert surface.smile(near).strikes.tolist() == [90.0, 100.0, 110.0, 120.0]
+    surface.update(near, chain(near, {120.0: 0.4}), today=TODAY)
+    assert surface.smile(near).strikes.tolist() == [120.0]
+
+
+def test_VolatilitySurface_strike_for_delta_and_price():
+    expiration = TODAY + datetime.timedelta(days=45)
+    surface = VolatilitySurface("SPY")
+    surface.update(expiration, chain(expiration, {float(k): 0.25 for k in range(60, 141)}), today=TODAY)
+    t = 45 / 365
+    for delta in (-0.3, -0.16, 0.25):
+        strike = surface.strike_for_delta(delta, expiration)
+        assert abs(black_scholes(delta > 0, 100.0, strike, t, 0.25).delta - delta) < 1e-3
+    np.testing.assert_allclose(
+        surface.price(False, 95.0, t, 90.0), black_scholes(False, 90.0, 95.0, t, 0.25).price
+    )
+
+
+def test_VolatilitySurface_ttl():
+    now = [0.0]
+    surface = VolatilitySurface("SPY", clock=lambda: now[0])
+    expiration = TODAY + datetime.timedelta(days=30)
+    assert surface.is_stale(expiration, 60)
+    surface.update(expiration, chain(expiration, {100.0: 0.2}), today=TODAY)
+    now[0] = 30.0
+    assert not surface.is_stale(expiration, 60)
+    now[0] = 61.0
+    assert surface.is_stale(expiration, 60)
+
+
+def test_DataManager_volatility_surface_requests_stale_chains():
+    da = SyntheticDataAdapter()
+    dm = DataManager(da, synthetic_watch_list(1), streaming=False)
+    dm.create_assets()
+    dm.update_assets()
+    expirations = da.get_option_parameters(dm.assets["SPY"]).expirations[:2]
+    surface = dm.volatility_surface("SPY", expirations, ttl=3600)
+    assert surface.expirations == expirations
+    requests = da.requests
+    assert dm.volatility_surface("SPY", expirations, ttl=3600) is surface
+    assert da.requests == requests
+    dm.volatility_surface("SPY", expirations, ttl=-1)
+    assert da.requests > requests
+    price = dm.assets["SPY"].current.market_price
+    smile = surface.smile(expirations[0])
+    # the synthetic chains have a put skew
+    assert smile.iv(0.9 * price) > smile.iv(price)
+
+
+
+def test_DataManager_volatility_surface_empty_chain_waits_for_ttl():
+    da = SyntheticDataAdapter()
+    dm = DataManager(da, synthetic_watch_list(1), streaming=False)
+    dm.create_assets()
+    dm.update_assets()
+    expirations = da.get_option_parameters(dm.assets["SPY"]).expirations[:1]
+    requested = []
+
+    def get_optionchain(asset, expiration):
+        requested.append(expiration)
+        return OptionChain.from_options((), asset.id, expiration)
+
+    da.get_optionchain = get_optionchain
+    surface = dm.volatility_surface("SPY", expirations, ttl=3600)
+    assert requested == list(expirations)
+    assert surface.expirations == ()
+    dm.volatility_surface("SPY", expirations, ttl=3600)
+    assert requested == list(expirations)
+    dm.volatility_surface("SPY", expirations, ttl=-1)
+    assert requested == 2 * list(expirations)